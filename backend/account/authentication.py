@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import ClaimsUser
+
+User = get_user_model()
+
+# Поля пользователя, которые кладутся в токен при выдаче
+CLAIM_FIELDS = ('email', 'role', 'is_staff', 'is_superuser', 'is_active')
+CLAIMS_ISSUED_AT = 'claims_at'
+# Сколько секунд доверять claims без обращения к БД: столько же после
+# деактивации пользователь может проходить аутентификацию в других процессах
+CLAIMS_MAX_AGE = 300
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 1024
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh-токен с полями пользователя; access-токен копирует их при выпуске"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        token[CLAIMS_ISSUED_AT] = time.time()
+        return token
+
+
+class UserCache:
+    """
+    LRU строк пользователей в памяти процесса с TTL. Сохранение пользователя
+    сбрасывает его строку и отзывает claims, выданные раньше.
+    """
+
+    def __init__(self, size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.rows = OrderedDict()
+        self.revoked = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.rows.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.rows.pop(user_id, None)
+                return None
+            self.rows.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, values):
+        with self.lock:
+            self.rows[user_id] = (time.monotonic() + self.ttl, values)
+            self.rows.move_to_end(user_id)
+            while len(self.rows) > self.size:
+                self.rows.popitem(last=False)
+
+    def forget(self, user_id, revoke_claims=True):
+        now = time.time()
+        with self.lock:
+            self.rows.pop(user_id, None)
+            if revoke_claims:
+                self.revoked[user_id] = now
+                # Claims старше CLAIMS_MAX_AGE и так не принимаются
+                for key in [key for key, at in self.revoked.items() if at < now - CLAIMS_MAX_AGE]:
+                    del self.revoked[key]
+
+    def claims_revoked(self, user_id, issued_at):
+        with self.lock:
+            return issued_at <= self.revoked.get(user_id, 0)
+
+
+user_cache = UserCache()
+
+
+def build_user(values):
+    """
+    Пользователь из сохраненных значений без запроса к БД. Остальные поля
+    отложены (deferred) и подгрузятся при первом обращении. Экземпляр
+    ClaimsUser только для чтения: устаревшие claims не попадут в БД.
+    """
+    fields = [field.attname for field in ClaimsUser._meta.concrete_fields if field.attname in values]
+    return ClaimsUser.from_db(router.db_for_read(User), fields, [values[name] for name in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без SELECT пользователя на каждый запрос: свежие
+    claims из токена принимаются как есть, иначе строка берется из
+    LRU процесса и только при промахе — из БД.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        issued_at = validated_token.get(CLAIMS_ISSUED_AT)
+        if (
+            user_id is not None and issued_at is not None
+            and time.time() - issued_at < CLAIMS_MAX_AGE
+            and not user_cache.claims_revoked(user_id, issued_at)
+        ):
+            values = {'id': user_id, **{field: validated_token.get(field) for field in CLAIM_FIELDS}}
+        else:
+            values = user_cache.get(user_id)
+            if values is None:
+                user = super().get_user(validated_token)
+                values = {'id': user.pk, **{field: getattr(user, field) for field in CLAIM_FIELDS}}
+                user_cache.set(user.pk, values)
+                return user
+
+        if not values['is_active']:
+            raise AuthenticationFailed("Пользователь деактивирован", code='user_inactive')
+        return build_user(values)
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    """Схема API для ClaimsJWTAuthentication: заголовок тот же, что у JWTAuthentication"""
+    target_class = 'account.authentication.ClaimsJWTAuthentication'
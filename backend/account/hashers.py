@@ -0,0 +1,54 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+THREAD_NAME_PREFIX = 'password-hash'
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    argon2id с параметрами из settings.ARGON2_PARAMS. Хеши с другими
+    параметрами (и хеши PBKDF2) пересчитываются при следующем входе.
+
+    encode и verify выполняются в пуле хеширования, поэтому authenticate()
+    и create_user() в представлениях входа и регистрации ждут свободный
+    поток пула: одновременно считается не больше PASSWORD_HASH_WORKERS хешей.
+    """
+
+    def __init__(self):
+        params = getattr(settings, 'ARGON2_PARAMS', {})
+        self.time_cost = params.get('time_cost', self.time_cost)
+        self.memory_cost = params.get('memory_cost', self.memory_cost)
+        self.parallelism = params.get('parallelism', self.parallelism)
+
+    def encode(self, password, salt):
+        return in_pool(super().encode, password, salt)
+
+    def verify(self, password, encoded):
+        return in_pool(super().verify, password, encoded)
+
+
+def _create_executor():
+    # argon2 отпускает GIL, поэтому потоки пула считают хеши параллельно,
+    # а их число ограничивает нагрузку на CPU при всплеске входов
+    global _executor
+    _executor = ThreadPoolExecutor(
+        max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', None),
+        thread_name_prefix=THREAD_NAME_PREFIX,
+    )
+
+
+_create_executor()
+# Потоки не переживают fork (воркеры gunicorn, процессы импорта пользователей):
+# дочернему процессу нужен свой пул, иначе задачи в нем никто не выполнит
+os.register_at_fork(after_in_child=_create_executor)
+
+
+def in_pool(func, *args):
+    """Выполняет func в пуле и ждет результата; в потоке самого пула — сразу"""
+    if threading.current_thread().name.startswith(THREAD_NAME_PREFIX):
+        return func(*args)
+    return _executor.submit(func, *args).result()
@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from account.importer import DUPLICATE_MODES, UserImporter, load_checkpoint, save_checkpoint
+from common.importing import FORMATS, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенос пользователей из CSV/JSONL пакетами bulk_create. Повторный запуск "
+        "продолжает с последнего сохраненного пакета"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу с пользователями")
+        parser.add_argument('--format', choices=FORMATS, help="Формат файла; по умолчанию по расширению")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--on-duplicate', choices=DUPLICATE_MODES, default='skip',
+                            help="Существующий email: пропустить строку или дополнить пользователя")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Процессов для хеширования открытых паролей; 0 — хешировать в этом процессе")
+        parser.add_argument('--checkpoint', help="Файл прогресса; по умолчанию <path>.progress")
+        parser.add_argument('--restart', action='store_true', help="Начать сначала, не учитывая прогресс")
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        if fmt is None:
+            raise CommandError("Поддерживаются файлы CSV и JSONL.")
+        checkpoint = options['checkpoint'] or f"{options['path']}.progress"
+        resume = None if options['restart'] else load_checkpoint(checkpoint)
+        if resume:
+            self.stdout.write(f"Продолжение со строки {resume['rows'] + 1}")
+
+        def progress(stats, errors):
+            for error in errors:
+                self.stderr.write(f"Строка {error['row']}: {error['errors']}")
+            save_checkpoint(checkpoint, stats)
+            self.stdout.write(self.format_stats(stats))
+
+        importer = UserImporter(options['batch_size'], options['on_duplicate'], options['workers'], progress)
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            stats = importer.run(read_rows(lines, fmt), resume)
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(self.format_stats(stats)))
+
+    @staticmethod
+    def format_stats(stats):
+        return (
+            f"Строк: {stats['rows']}, создано: {stats['created']}, обновлено: {stats['updated']}, "
+            f"пропущено: {stats['skipped']}, ошибок: {stats['errors']}"
+        )
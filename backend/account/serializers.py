@@ -1,11 +1,7 @@
+from django.contrib.auth.hashers import identify_hasher
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
-
-from .models import User
-
-from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from .authentication import ClaimsRefreshToken
 from .models import User
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -28,7 +24,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = User.objects.create_user(**validated_data)
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         self._access = str(refresh.access_token)
         self._refresh = str(refresh)
         return user
@@ -58,9 +54,37 @@ class LoginSerializer(serializers.Serializer):
         if not user.is_active:
             raise serializers.ValidationError("Пользователь деактивирован")
             
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         return {
             'user': user.email,
             'access': str(refresh.access_token),
             'refresh': str(refresh),
-        }
\ No newline at end of file
+        }
+
+
+class UserImportSerializer(serializers.Serializer):
+    """Строка переноса пользователей: открытый пароль или готовый хеш"""
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=150, required=False)
+    last_name = serializers.CharField(max_length=150, required=False)
+    phone = serializers.CharField(max_length=20, required=False)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, required=False)
+    is_active = serializers.BooleanField(required=False)
+    password = serializers.CharField(required=False, trim_whitespace=False)
+    password_hash = serializers.CharField(required=False)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_password_hash(self, value):
+        # Хеш должен разбираться одним из PASSWORD_HASHERS
+        try:
+            identify_hasher(value).decode(value)
+        except ValueError:
+            raise serializers.ValidationError("Неподдерживаемый формат хеша пароля.")
+        return value
+
+    def validate(self, data):
+        if 'password' in data and 'password_hash' in data:
+            raise serializers.ValidationError("Укажите либо password, либо password_hash.")
+        return data
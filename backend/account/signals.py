@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.images import watch_image_fields
+
+from .authentication import CLAIM_FIELDS, user_cache
+
+User = get_user_model()
+
+watch_image_fields(User, 'avatar')
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user(sender, instance, update_fields=None, **kwargs):
+    # Claims отзываются, только если могли измениться поля из токена
+    revoke = update_fields is None or not set(update_fields).isdisjoint(CLAIM_FIELDS)
+    user_cache.forget(instance.pk, revoke_claims=revoke)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    user_cache.forget(instance.pk)
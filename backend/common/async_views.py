@@ -0,0 +1,156 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import classonlymethod
+from django.utils.http import http_date
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.response import Response
+
+from .cache import PublicCacheMixin
+from .facets import FacetMixin
+from .values import ValuesListMixin
+from .conditional import ConditionalGetMixin
+
+WRITE_ACTIONS = {
+    'list': {'post': 'create'},
+    'retrieve': {'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+}
+
+
+class AsyncReadView(View):
+    """
+    Асинхронные list/retrieve поверх DRF-viewset для ASGI. Queryset, фильтры,
+    сортировка, пагинация, сериализатор, права и кэш берутся из viewset,
+    строки читаются через async ORM, поэтому медленный клиент не держит поток.
+
+    Анонимные GET/HEAD обслуживаются асинхронно; запросы с Authorization
+    и все изменяющие методы передаются синхронному viewset. Кэш читается
+    и пишется через async-методы (aget/aset), чтобы Redis или файловый
+    кэш не блокировали цикл событий.
+    """
+    viewset = None
+    action = 'list'
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        actions = {'get': self.action, **WRITE_ACTIONS[self.action]}
+        self.sync_view = self.viewset.as_view(actions)
+
+    async def get(self, request, *args, **kwargs):
+        if 'HTTP_AUTHORIZATION' in request.META:
+            return await self.delegate(request, *args, **kwargs)
+
+        # Без заголовка Authorization аутентификация не обращается к БД
+        view = self.viewset(action_map={'get': self.action, 'head': self.action}, args=args, kwargs=kwargs, format_kwarg=None, headers={})
+        view.request = view.initialize_request(request, *args, **kwargs)
+        try:
+            view.initial(view.request, *args, **kwargs)
+            response = await self.respond(view)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return self.render(view, response)
+
+    async def head(self, request, *args, **kwargs):
+        response = await self.get(request, *args, **kwargs)
+        # Заголовки как у GET, без тела
+        if not response.streaming:
+            response['Content-Length'] = str(len(response.content))
+            response.content = b''
+        return response
+
+    async def post(self, request, *args, **kwargs):
+        return await self.delegate(request, *args, **kwargs)
+
+    put = patch = delete = options = post
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    async def respond(self, view):
+        queryset = view.filter_queryset(view.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+            queryset = queryset.filter(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+
+        cache_key = entry = None
+        if isinstance(view, PublicCacheMixin) and view.is_cacheable(view.request):
+            cache_key = await view.aget_cache_key(view.request)
+            entry = await cache.aget(cache_key)
+
+        etag = last_modified = None
+        if isinstance(view, ConditionalGetMixin):
+            # Попадание в кэш несет свои валидаторы: запрос к БД не нужен
+            if entry is not None and entry['validators'] is not None:
+                etag, last_modified = entry['validators']
+            else:
+                etag, last_modified = await view.aget_validators(view.request, queryset)
+            view.response_validators = (etag, last_modified)
+            not_modified = get_conditional_response(view.request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        if entry is not None:
+            data = entry['data']
+        else:
+            data = await (self.read_object(view, queryset) if self.action == 'retrieve' else self.read_list(view, queryset))
+            if cache_key is not None:
+                await cache.aset(cache_key, view.make_cache_entry(data), view.cache_timeout)
+        data = await self.add_facets(view, queryset, data)
+
+        response = Response(data)
+        if etag is not None:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    async def read_list(self, view, queryset):
+        paginator = view.paginator
+        if paginator is None:
+            return view.get_serializer([obj async for obj in queryset], many=True).data
+        values_serializer = None
+        if isinstance(view, ValuesListMixin):
+            queryset = view.values_queryset(queryset)
+            values_serializer = view.values_serializer
+        page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        if values_serializer is not None:
+            data = await values_serializer.ato_representation(page)
+        else:
+            data = view.get_serializer(page, many=True).data
+        return paginator.get_paginated_response(data).data
+
+    async def add_facets(self, view, queryset, data):
+        if self.action != 'list' or not isinstance(view, FacetMixin) or not isinstance(data, dict):
+            return data
+        if not view.wants_facets(view.request):
+            return data
+        key = await view.aget_facets_key(view.request)
+        facets = await cache.aget(key)
+        if facets is None:
+            facets = await view.acount_facets(queryset)
+            await cache.aset(key, facets, view.facet_timeout)
+        return {**data, 'facets': facets}
+
+    async def read_object(self, view, queryset):
+        try:
+            obj = await queryset.aget()
+        except queryset.model.DoesNotExist:
+            raise Http404
+        view.check_object_permissions(view.request, obj)
+        return view.get_serializer(obj).data
+
+    def render(self, view, response):
+        """Рендерит ответ DRF сразу, без перехода в поток для TemplateResponse"""
+        if not isinstance(response, Response):
+            return response
+        response = view.finalize_response(view.request, response)
+        rendered = HttpResponse(response.rendered_content, status=response.status_code)
+        for name, value in response.items():
+            rendered[name] = value
+        return rendered
@@ -0,0 +1,103 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import PublicCacheMixin, normalize_query
+from .facets import FacetMixin
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified для list/retrieve. Совпавший If-None-Match или
+    If-Modified-Since получает 304 до сериализации.
+
+    Для страницы keyset-пагинации валидаторы строятся по id и updated_at
+    ее строк (плюс следующей, от которой зависит ссылка next): это тот же
+    индексный запрос на page_size + 1 строк, без COUNT по всему фильтру.
+    Для retrieve и для списка со счетчиками (?facets=1), которые и так
+    обходят весь фильтр, берутся max(updated_at) и число строк queryset.
+
+    С PublicCacheMixin валидаторы хранятся в записи общего кэша рядом с
+    ответом: попадание и его 304 обходятся без запросов к БД.
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_cached_validators(self, request):
+        """(ETag, Last-Modified) из записи общего кэша или None при промахе"""
+        if isinstance(self, PublicCacheMixin):
+            entry = self.get_cache_entry(request)[1]
+            if entry is not None:
+                return entry['validators']
+        return None
+
+    def get_validators(self, request, queryset):
+        page = self.get_validator_page(request, queryset)
+        if page is not None:
+            return self.make_page_validators(request, list(page))
+        return self.make_set_validators(request, queryset.aggregate(**self.get_validator_aggregates()))
+
+    async def aget_validators(self, request, queryset):
+        page = self.get_validator_page(request, queryset)
+        if page is not None:
+            return self.make_page_validators(request, [row async for row in page])
+        return self.make_set_validators(request, await queryset.aaggregate(**self.get_validator_aggregates()))
+
+    def get_validator_page(self, request, queryset):
+        """(id, updated_at) строк страницы или None, если валидаторы считаются по всему queryset"""
+        paginator = self.paginator if self.action == 'list' else None
+        if not hasattr(paginator, 'page_queryset'):
+            return None
+        if isinstance(self, FacetMixin) and self.wants_facets(request):
+            return None
+        return paginator.page_queryset(queryset, request, self).values_list('pk', self.last_modified_field)
+
+    def get_validator_aggregates(self):
+        return {'last_modified': Max(self.last_modified_field), 'count': Count('pk')}
+
+    def make_page_validators(self, request, rows):
+        fingerprint = ','.join(f'{pk}@{modified.isoformat()}' for pk, modified in rows)
+        return self.make_validators(request, fingerprint, max((modified for _, modified in rows), default=None))
+
+    def make_set_validators(self, request, stats):
+        return self.make_validators(request, str(stats['count']), stats['last_modified'])
+
+    def make_validators(self, request, fingerprint, last_modified):
+        raw = '|'.join([
+            request.path,
+            normalize_query(request.query_params),
+            fingerprint,
+            last_modified.isoformat() if last_modified else '',
+        ])
+        etag = f'W/"{hashlib.md5(raw.encode("utf-8")).hexdigest()}"'
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = self.get_cached_validators(request)
+        if validators is None:
+            validators = self.get_validators(request, self.get_validator_queryset())
+        etag, last_modified = self.response_validators = validators
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
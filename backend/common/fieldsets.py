@@ -0,0 +1,87 @@
+from rest_framework import permissions, serializers
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=a,b — в ответе только перечисленные поля, ?omit=a,b — все,
+    кроме перечисленных. Список по умолчанию отдает компактную проекцию
+    Meta.list_fields сериализатора. Столбцы модели, которые не нужны
+    выбранным полям, не читаются из БД (defer).
+
+    Какие столбцы нужны полю, определяется по его source; полям с
+    source='*' (SerializerMethodField) столбцы задает Meta.field_sources,
+    без этого queryset читается целиком.
+    """
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def get_field_names(self):
+        """Поля ответа или None, если нужны все"""
+        if hasattr(self, '_field_names'):
+            return self._field_names
+        self._field_names = None
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        meta = getattr(self.get_serializer_class(), 'Meta', None)
+        readable = [name for name, field in self.get_declared_fields().items() if not field.write_only]
+
+        names = self.parse_names(self.fields_param, readable)
+        if names is None and self.action == 'list':
+            names = getattr(meta, 'list_fields', None)
+        omit = self.parse_names(self.omit_param, readable)
+        if names is None and omit is None:
+            return None
+        self._field_names = [
+            name for name in (names or readable) if name in readable and name not in (omit or ())
+        ]
+        return self._field_names
+
+    def get_declared_fields(self):
+        if not hasattr(self, '_declared_fields'):
+            self._declared_fields = self.get_serializer_class()().fields
+        return self._declared_fields
+
+    def parse_names(self, param, readable):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in readable]
+        if unknown:
+            raise serializers.ValidationError({param: [f"Неизвестные поля: {', '.join(unknown)}."]})
+        return names
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        names = self.get_field_names()
+        if names is not None:
+            child = getattr(serializer, 'child', serializer)
+            for name in [name for name in child.fields if name not in names]:
+                child.fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        names = self.get_field_names()
+        if names is None:
+            return queryset
+        deferred = self.get_deferred_fields(queryset, names)
+        return queryset.defer(*deferred) if deferred else queryset
+
+    def get_deferred_fields(self, queryset, names):
+        sources = getattr(getattr(self.get_serializer_class(), 'Meta', None), 'field_sources', {})
+        fields = self.get_declared_fields()
+
+        needed = {field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)}
+        for name in names:
+            if name in sources:
+                needed.update(sources[name])
+            elif fields[name].source == '*':
+                return []
+            else:
+                needed.add(fields[name].source_attrs[0])
+        # Внешние ключи не откладываются: по ним идет select_related
+        return [
+            field.name for field in queryset.model._meta.concrete_fields
+            if not field.primary_key and not field.is_relation and field.name not in needed
+        ]
@@ -0,0 +1,86 @@
+from django_filters.constants import EMPTY_VALUES
+from django_filters.rest_framework import FilterSet
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte', 'range')
+
+
+class PlannedFilterSet(FilterSet):
+    """
+    Фильтры, набор которых проверяется по индексам до выполнения запроса.
+
+    indexed_fields — поля, с которых индекс может начать поиск (ведущее
+    поле индекса); остальные фильтры проверяются уже на найденных строках.
+    Запрос, где все фильтры приходятся на неиндексированные поля, означал
+    бы полное сканирование таблицы и отклоняется с 400. Без фильтров
+    список идет по индексу сортировки с LIMIT и допускается, если для
+    ключей ?ordering= есть индекс (indexed_ordering); сортировка по другим
+    полям модели требует сужающего фильтра.
+    """
+    indexed_fields = ()
+    indexed_ordering = ()
+    # Параметры других фильтров, которые тоже ищут по индексу (поиск, near)
+    indexed_params = ()
+
+    @classmethod
+    def get_range_field(cls, query_params):
+        """
+        Индексированное поле, ограниченное в запросе диапазоном. Если
+        сортировать по нему же, один индекс обслуживает и условие, и ORDER BY
+        с LIMIT; иначе БД может пройти весь индекс сортировки.
+        """
+        for name, filter in cls.base_filters.items():
+            if filter.field_name in cls.indexed_fields and filter.lookup_expr in RANGE_LOOKUPS and query_params.get(name):
+                return filter.field_name
+        return None
+
+    def get_leading_fields(self):
+        """Поля, по которым базовый queryset уже сужен индексом"""
+        return set()
+
+    def get_used_fields(self):
+        return {
+            self.filters[name].field_name
+            for name, value in self.form.cleaned_data.items()
+            if value not in EMPTY_VALUES
+        }
+
+    def get_unindexed_ordering(self):
+        """Поля модели из ?ordering= без индекса; вычисляемые ключи проверяет сам OrderingFilter"""
+        model_fields = set()
+        for field in self._meta.model._meta.concrete_fields:
+            model_fields.update((field.name, field.attname))
+        terms = self.data.get(api_settings.ORDERING_PARAM, '').split(',')
+        requested = {term.strip().lstrip('-') for term in terms}
+        return sorted((requested & model_fields) - set(self.indexed_ordering))
+
+    def get_plan(self):
+        """
+        Ведущее поле запроса: поле базового queryset или фильтра, 'ordering'
+        без фильтров; None, если подходящего индекса нет.
+        """
+        used = self.get_used_fields()
+        leading = self.get_leading_fields() | {
+            param for param in self.indexed_params if self.data.get(param)
+        }
+        if leading:
+            return sorted(leading)[0]
+        if not used:
+            return None if self.get_unindexed_ordering() else 'ordering'
+        return next((field for field in self.indexed_fields if field in used), None)
+
+    def filter_queryset(self, queryset):
+        if self.get_plan() is None:
+            unindexed = self.get_unindexed_ordering()
+            if unindexed and not self.get_used_fields():
+                raise serializers.ValidationError({api_settings.ORDERING_PARAM: [
+                    f"Сортировка по полям {', '.join(unindexed)} без фильтра требует полного просмотра таблицы. "
+                    f"Сортируйте по {', '.join(self.indexed_ordering)} или добавьте фильтр."
+                ]})
+            fields = ', '.join(name for name, filter in self.filters.items() if filter.field_name in self.indexed_fields)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                f"Фильтры без индексированного поля требуют полного просмотра таблицы. "
+                f"Добавьте фильтр по одному из полей: {fields}."
+            ]})
+        return super().filter_queryset(queryset)
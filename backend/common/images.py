@@ -0,0 +1,186 @@
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.http import FileResponse, Http404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from .storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'variants'
+# Расширение -> формат Pillow и параметры сохранения
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Варианты лежат в MEDIA_ROOT под фиксированными именами, производными от имени оригинала
+variant_storage = FileSystemStorage(allow_overwrite=True)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 1),
+    thread_name_prefix='image-variants',
+)
+# Фоновая задача и запрос к отсутствующему варианту не строят его одновременно
+_locks = [threading.Lock() for _ in range(64)]
+# Каталоги upload_to полей из watch_image_fields: только в них лежат оригиналы вариантов
+_upload_dirs = set()
+
+
+def variant_name(name, variant, ext='webp'):
+    return f'{VARIANTS_DIR}/{name}/{variant}.{ext}'
+
+
+def is_variant_source(name):
+    """Оригинал с именем по содержимому прямо в каталоге upload_to наблюдаемого поля"""
+    if name.startswith(f'{VARIANTS_DIR}/') or not is_content_addressed(name):
+        return False
+    return posixpath.dirname(posixpath.dirname(name)) in _upload_dirs
+
+
+def parse_variant_name(path):
+    """
+    (оригинал, вариант, расширение) по пути внутри VARIANTS_DIR или None.
+    Варианты вариантов и файлы вне каталогов загрузок не строятся: путь
+    доступен без авторизации, и каждая сборка стоит CPU и места на диске.
+    """
+    name, _, filename = path.rpartition('/')
+    variant, _, ext = filename.partition('.')
+    if variant not in settings.IMAGE_VARIANTS or ext not in FORMATS or not is_variant_source(name):
+        return None
+    return name, variant, ext
+
+
+def render(image, spec, ext):
+    size = tuple(spec['size'])
+    if spec.get('crop'):
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+    fmt, options = FORMATS[ext]
+    output = io.BytesIO()
+    image.save(output, fmt, **options)
+    return output.getvalue()
+
+
+def build_variants(name, only=None, storage=default_storage):
+    """
+    Создает недостающие варианты оригинала (все или перечисленные в only
+    как пары (вариант, расширение)); оригинал читается один раз.
+    """
+    wanted = only or [(variant, ext) for variant in settings.IMAGE_VARIANTS for ext in FORMATS]
+    with _locks[hash(name) % len(_locks)]:
+        missing = [(variant, ext) for variant, ext in wanted if not variant_storage.exists(variant_name(name, variant, ext))]
+        if not missing:
+            return []
+        with storage.open(name) as original:
+            image = Image.open(original)
+            image = ImageOps.exif_transpose(image).convert('RGB')
+        for variant, ext in missing:
+            content = render(image, settings.IMAGE_VARIANTS[variant], ext)
+            variant_storage.save(variant_name(name, variant, ext), ContentFile(content))
+    return missing
+
+
+def _build_in_background(name):
+    try:
+        build_variants(name)
+    except Exception:
+        # Вариант будет создан при первом запросе (serve_variant)
+        logger.exception("Не удалось создать варианты изображения %s", name)
+
+
+def schedule_variants(name):
+    _executor.submit(_build_in_background, name)
+
+
+def watch_image_fields(model, *fields):
+    """Варианты новых загрузок строятся в фоне после коммита транзакции"""
+
+    def mark_uploads(sender, instance, **kwargs):
+        # До сохранения поля новый файл еще не записан в хранилище
+        instance._new_image_fields = [
+            field for field in fields
+            if getattr(instance, field) and not getattr(instance, field)._committed
+        ]
+
+    def schedule_uploads(sender, instance, **kwargs):
+        for field in instance.__dict__.pop('_new_image_fields', ()):
+            name = getattr(instance, field).name
+            transaction.on_commit(lambda name=name: schedule_variants(name))
+
+    for field in fields:
+        upload_to = model._meta.get_field(field).upload_to
+        if isinstance(upload_to, str):
+            _upload_dirs.add(upload_to.strip('/'))
+
+    uid = f'image-variants-{model._meta.label}'
+    pre_save.connect(mark_uploads, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(schedule_uploads, sender=model, weak=False, dispatch_uid=uid)
+
+
+def serve_variant(request, path):
+    """
+    Отдает вариант, при отсутствии создает его. В продакшене веб-сервер
+    отдает готовые файлы из MEDIA_ROOT сам и передает сюда только промахи.
+    """
+    parsed = parse_variant_name(path)
+    if parsed is None:
+        raise Http404
+    name, variant, ext = parsed
+    target = variant_name(name, variant, ext)
+    if not variant_storage.exists(target):
+        if not default_storage.exists(name):
+            raise Http404
+        try:
+            build_variants(name, only=[(variant, ext)])
+        except (OSError, Image.DecompressionBombError):
+            raise Http404
+    response = FileResponse(variant_storage.open(target), content_type=f'image/{FORMATS[ext][0].lower()}')
+    # Имя оригинала по содержимому: вариант под этим путем уже не изменится
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def delete_variants(name):
+    directory = f'{VARIANTS_DIR}/{name}'
+    if not variant_storage.exists(directory):
+        return
+    for filename in variant_storage.listdir(directory)[1]:
+        variant_storage.delete(f'{directory}/{filename}')
+    variant_storage.delete(directory)
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.Field):
+    """
+    Карта URL вариантов изображения в WebP: {"thumb": ..., "card": ..., "full": ...}.
+    По тому же пути с расширением .jpg лежит JPEG для клиентов без WebP.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for variant in settings.IMAGE_VARIANTS:
+            url = value.storage.url(variant_name(value.name, variant))
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+        return urls
@@ -0,0 +1,38 @@
+import codecs
+import csv
+import json
+import os
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(name, fmt=None):
+    """Формат файла импорта: явно заданный или по расширению"""
+    fmt = (fmt or os.path.splitext(name)[1].lstrip('.')).lower()
+    if fmt == 'json':
+        fmt = 'jsonl'
+    return fmt if fmt in FORMATS else None
+
+
+def decode_lines(upload):
+    """Построчное чтение загруженного файла без загрузки в память"""
+    return codecs.iterdecode(upload, 'utf-8-sig')
+
+
+def read_rows(lines, fmt):
+    """
+    Строки файла по одной. Пустые значения CSV отбрасываются, чтобы
+    сработали значения по умолчанию; битый JSON отдается как ValueError.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(lines):
+            yield {key: value for key, value in row.items() if key and value not in ('', None)}
+        return
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValueError(f"Некорректный JSON: {exc}")
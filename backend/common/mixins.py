@@ -0,0 +1,13 @@
+class EagerLoadingMixin:
+    """
+    Применяет к queryset select_related/prefetch_related, объявленные
+    сериализатором в setup_eager_loading, чтобы число запросов на страницу
+    не зависело от ее размера.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
@@ -0,0 +1,37 @@
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Значения, которые orjson пишет иначе, чем
+    encoder_class (Decimal, даты и время, timedelta, ленивые строки),
+    передаются в encoder_class.default, поэтому ответ совпадает с
+    JSONRenderer побайтно. Отступы, ensure_ascii и отсутствие orjson
+    обрабатывает JSONRenderer.
+
+    Отличия: float в экспоненциальной записи короче (1e-05 -> 0.00001,
+    1e+16 -> 1e16), NaN и бесконечность пишутся как null.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=(
+                orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            ))
+        except orjson.JSONEncodeError:
+            # Целые больше 64 бит, глубокая вложенность: ответ или ошибка как у JSONRenderer
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как JSONRenderer: U+2028 и U+2029 экранируются для совместимости с JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.views.static import serve
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CONTENT_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{64}(?:\.[0-9a-z]+)?$')
+
+
+def is_content_addressed(name):
+    return CONTENT_NAME_RE.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файлы называются по SHA-256 содержимого внутри каталога upload_to:
+    imgs/tours/3f/3fa9...e1.jpg. Повторная загрузка того же файла
+    получает то же имя и не записывается, поэтому по имени файл не
+    меняется и его можно кэшировать бессрочно. Вместо записи у файла
+    обновляется время изменения: для collect_orphan_media он снова свежий.
+
+    Файлы не удаляются вместе со строками; ссылки на них считает и
+    сирот удаляет manage.py collect_orphan_media.
+    """
+
+    def __init__(self, **kwargs):
+        # Одновременная загрузка одинаковых файлов пишет одни и те же байты
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+        name = self.content_name(name, content)
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(f'Имя файла "{name}" длиннее {max_length} символов.')
+        try:
+            # Строка с повторной загрузкой еще не сохранена: без этого сборка
+            # сирот могла бы удалить файл по старому mtime
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            name = self._save(name, content)
+        return name.replace('\\', '/')
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        ext = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], f'{digest}{ext}')
+
+
+def serve_media(request, path):
+    """Загруженные файлы в режиме DEBUG; в продакшене их отдает веб-сервер"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -0,0 +1,273 @@
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils.duration import duration_string
+from rest_framework import permissions, relations, serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+# Поля без переопределенного to_representation сводятся к встроенной функции
+SIMPLE_CONVERTERS = {
+    serializers.IntegerField.to_representation: int,
+    serializers.CharField.to_representation: str,
+    serializers.FloatField.to_representation: float,
+    serializers.DurationField.to_representation: duration_string,
+}
+
+
+def compile_decimal(field):
+    if (
+        not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        or field.localize or field.normalize_output or field.decimal_places is None
+    ):
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def compile_datetime(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() == ISO_8601 or zone is None:
+        return field.to_representation
+
+    def convert(value):
+        # Значения из БД при USE_TZ уже с зоной; остальное — как в DRF
+        if getattr(value, 'tzinfo', None) is None:
+            return field.to_representation(value)
+        return value.astimezone(zone).strftime(output_format)
+    return convert
+
+
+def compile_converter(field):
+    """Функция «значение -> представление», равная field.to_representation для значений не None"""
+    method = type(field).to_representation
+    if method in SIMPLE_CONVERTERS:
+        return SIMPLE_CONVERTERS[method]
+    if method is serializers.DecimalField.to_representation:
+        return compile_decimal(field)
+    if method is serializers.DateTimeField.to_representation:
+        return compile_datetime(field)
+    return field.to_representation
+
+
+def resolve_path(model, path):
+    """Модельное поле в конце пути source через прямые связи или None"""
+    field = None
+    for position, attr in enumerate(path):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        if position < len(path) - 1:
+            if not field.is_relation:
+                return None
+            model = field.related_model
+    return field
+
+
+def identity(value):
+    return value
+
+
+def nested_lookups(select_related, prefix=''):
+    return [
+        lookup
+        for name, nested in select_related.items()
+        for lookup in [f'{prefix}{name}', *nested_lookups(nested, f'{prefix}{name}__')]
+    ]
+
+
+class ValuesSerializer:
+    """
+    Чтение списка без экземпляров моделей и полей DRF на каждую строку:
+    queryset превращается в values_list() с нужными столбцами, а для каждого
+    поля сериализатора заранее собирается конвертер, повторяющий его
+    to_representation. Результат совпадает с serializer.data.
+
+    compile() возвращает None, если какое-то поле так не собрать
+    (source='*' без Meta.field_sources, свойство модели, обратная связь);
+    тогда список сериализуется обычным путем.
+    """
+
+    def __init__(self, queryset, plan, related):
+        self.queryset = queryset
+        self.plan = plan
+        self.related = related
+        self.builder = self.make_builder(plan)
+
+    @classmethod
+    def compile(cls, serializer, queryset):
+        model = queryset.model
+        annotations = queryset.query.annotations
+        sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+        select_related = queryset.query.select_related if isinstance(queryset.query.select_related, dict) else {}
+        columns = {model._meta.pk.name: None}
+        # Столбцы сортировки нужны пагинации для курсора
+        columns.update((field.lstrip('-'), None) for field in queryset.query.order_by if isinstance(field, str))
+
+        plan, related = [], {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in sources:
+                    return None
+                columns.update(dict.fromkeys(sources[name]))
+                plan.append((name, None, getattr(serializer, field.method_name), False))
+                continue
+            if field.source == '*':
+                return None
+
+            path = field.source_attrs
+            column = '__'.join(path)
+            model_field = None if column in annotations else resolve_path(model, path)
+            if column not in annotations and model_field is None:
+                if len(path) > 1 or hasattr(model, path[0]) or field.required:
+                    return None
+                # Как в DRF: необязательное поле без атрибута (аннотации нет) пропускается
+                continue
+
+            if isinstance(field, relations.RelatedField):
+                if model_field is None or not (model_field.many_to_one or model_field.one_to_one):
+                    return None
+                if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+                    # values_list отдает по связи сам ключ
+                    convert = identity
+                else:
+                    # Представление строится по объекту: объекты страницы читаются одним запросом
+                    nested = select_related.get(path[0], {}) if len(path) == 1 else {}
+                    related[name] = (model_field.related_model, nested_lookups(nested), field.to_representation)
+                    convert = None
+            elif isinstance(model_field, models.FileField):
+                convert = cls.file_converter(field, model_field)
+            else:
+                convert = compile_converter(field)
+            columns[column] = None
+            # NOT NULL столбец самой модели не бывает None, проверка не нужна
+            nullable = model_field is None or len(path) > 1 or model_field.null
+            plan.append((name, column, convert, nullable))
+
+        names = list(columns)
+        index = {column: position for position, column in enumerate(names)}
+        plan = [
+            (name, None if column is None else index[column], convert, nullable)
+            for name, column, convert, nullable in plan
+        ]
+        return cls(queryset.values_list(*names, named=True), plan, related)
+
+    @staticmethod
+    def file_converter(field, model_field):
+        # Поле DRF получает FieldFile, как при чтении атрибута экземпляра;
+        # у многих строк файл один и тот же (или пустой), поэтому результат запоминается
+        results = {}
+
+        def convert(name):
+            if name not in results:
+                results[name] = field.to_representation(model_field.attr_class(None, model_field, name))
+            return results[name]
+        return convert
+
+    @staticmethod
+    def make_builder(plan):
+        """
+        Собирает функцию rows -> список словарей с одним литералом словаря на
+        строку: без цикла по полям и без вызовов для полей, отдаваемых как есть.
+        """
+        items, args = [], ['rows']
+        for number, (name, position, convert, nullable) in enumerate(plan):
+            arg = f'convert_{number}'
+            args.append(arg)
+            if position is None:
+                value = f'{arg}(row)'
+            elif convert is identity:
+                value = f'row[{position}]'
+            elif nullable:
+                value = f'None if row[{position}] is None else {arg}(row[{position}])'
+            else:
+                value = f'{arg}(row[{position}])'
+            items.append(f'{name!r}: {value}')
+        namespace = {}
+        exec(f"def build({', '.join(args)}):\n    return [{{{', '.join(items)}}} for row in rows]\n", namespace)
+        return namespace['build']
+
+    def related_keys(self, rows):
+        keys = {}
+        for name, position, _, _ in self.plan:
+            if name in self.related:
+                keys[name] = {row[position] for row in rows if row[position] is not None}
+        return keys
+
+    def related_queryset(self, name):
+        related_model, lookups, _ = self.related[name]
+        queryset = related_model._base_manager.all()
+        return queryset.select_related(*lookups) if lookups else queryset
+
+    def build(self, rows, objects):
+        converters = []
+        for name, _, convert, _ in self.plan:
+            if name in self.related:
+                to_representation = self.related[name][2]
+                convert = {pk: to_representation(obj) for pk, obj in objects[name].items()}.__getitem__
+            converters.append(convert)
+        return self.builder(rows, *converters)
+
+    def to_representation(self, rows):
+        objects = {
+            name: self.related_queryset(name).in_bulk(keys)
+            for name, keys in self.related_keys(rows).items()
+        }
+        return self.build(rows, objects)
+
+    async def ato_representation(self, rows):
+        objects = {
+            name: await self.related_queryset(name).ain_bulk(keys)
+            for name, keys in self.related_keys(rows).items()
+        }
+        return self.build(rows, objects)
+
+
+class ValuesPage:
+    """Замена serializer(page, many=True) для ListModelMixin.list: отдает только data"""
+
+    def __init__(self, serializer, rows):
+        self.serializer = serializer
+        self.rows = rows
+
+    @property
+    def data(self):
+        return self.serializer.to_representation(self.rows)
+
+
+class ValuesListMixin:
+    """
+    Страница списка читается через ValuesSerializer, если сериализатор
+    поддается компиляции; иначе — обычным путем через экземпляры моделей.
+    """
+
+    def values_queryset(self, queryset):
+        self.values_serializer = None
+        if self.action != 'list' or self.paginator is None or self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        self.values_serializer = ValuesSerializer.compile(super().get_serializer(), queryset)
+        return queryset if self.values_serializer is None else self.values_serializer.queryset
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(self.values_queryset(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        if getattr(self, 'values_serializer', None) is not None and args and kwargs.get('many'):
+            return ValuesPage(self.values_serializer, args[0])
+        return super().get_serializer(*args, **kwargs)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -72,16 +73,33 @@ DATABASES = {
     }
 }
 
+# Cache
+# Для нескольких воркеров используйте общий бэкенд, например
+# django.core.cache.backends.redis.RedisCache или FileBasedCache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nomado',
+    }
+}
+
 #REST
 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        'rest_framework.renderers.JSONRenderer',
+        'common.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'common.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'common.pagination.KeysetPagination',
     'DATETIME_FORMAT': "%Y-%m-%dT%H:%M:%S.%fZ",
     'DEFAULT_TIME_ZONE': 'Asia/Bishkek',
 }
@@ -153,6 +171,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Хеширование паролей: argon2id с параметрами ARGON2_PARAMS (замер: manage.py bench_login).
+# Хеши PBKDF2 проверяются и пересчитываются в argon2 при следующем входе.
+PASSWORD_HASHERS = [
+    'account.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+ARGON2_PARAMS = {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}
+# Потоков пула хеширования: больше хешей одновременно не считается
+PASSWORD_HASH_WORKERS = os.cpu_count() or 1
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -171,6 +200,26 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Загрузки именуются по хешу содержимого (common.storage): одинаковые файлы хранятся
+# один раз, а файлы под MEDIA_URL можно отдавать с Cache-Control: immutable.
+STORAGES = {
+    'default': {'BACKEND': 'common.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Варианты изображений (common.images): рамка в пикселях, crop — обрезка до ее пропорций.
+# Каждый вариант сохраняется в WebP и JPEG.
+IMAGE_VARIANTS = {
+    'thumb': {'size': (160, 160), 'crop': True},
+    'card': {'size': (640, 400), 'crop': True},
+    'full': {'size': (1600, 1600)},
+}
+# Потоков для фоновой генерации вариантов после загрузки
+IMAGE_VARIANT_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
+from common.images import VARIANTS_DIR, serve_variant
+from common.storage import serve_media
+
+MEDIA_PREFIX = settings.MEDIA_URL.lstrip('/')
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -12,5 +18,10 @@ urlpatterns = [
         path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
         path('auth/', include('account.urls')),
         path('tour/', include('tour.urls')),
-    ]))
+    ])),
+    # Веб-сервер отдает готовые варианты сам, сюда приходят только отсутствующие
+    re_path(rf'^{MEDIA_PREFIX}{VARIANTS_DIR}/(?P<path>.+)$', serve_variant),
 ]
+
+if settings.DEBUG:
+    urlpatterns.append(re_path(rf'^{MEDIA_PREFIX}(?P<path>.+)$', serve_media))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Tour, TourCategory, Location, Booking, Review, Favorite
+from .models import Tour, TourCategory, Location, Booking, Review, Favorite, TourInventory
 
 @admin.register(Tour)
 class TourAdmin(admin.ModelAdmin):
@@ -16,6 +16,11 @@ class LocationAdmin(admin.ModelAdmin):
     list_display = ('country', 'city')
     ordering = ('country', 'city',)
     
+@admin.register(TourInventory)
+class TourInventoryAdmin(admin.ModelAdmin):
+    list_display = ('tour', 'date', 'booked', 'capacity')
+    ordering = ('date',)
+
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ('user', 'tour')
@@ -0,0 +1,58 @@
+import django_filters
+
+from common.filters import PlannedFilterSet
+
+from .models import Tour, Booking
+
+RANGE_FILTERS = ['gte', 'lte', 'range']
+
+
+class TourFilter(PlannedFilterSet):
+    """
+    Фильтры туров. Связи фильтруются по id без проверочного запроса к БД,
+    поэтому фильтр строится и в асинхронном представлении.
+    """
+    category = django_filters.NumberFilter(field_name='category_id')
+    location = django_filters.NumberFilter(field_name='location_id')
+    guide = django_filters.NumberFilter(field_name='guide_id')
+
+    # Индексы по внешним ключам и частичные tour_active_*_idx
+    indexed_fields = ('id', 'category_id', 'location_id', 'guide_id', 'price', 'start_datetime', 'created_at', 'avg_rating')
+    indexed_ordering = ('id', 'price', 'start_datetime', 'created_at', 'avg_rating')
+    indexed_params = ('search', 'near')
+
+    class Meta:
+        model = Tour
+        fields = {
+            'id': ['exact'],
+            'price': ['exact', *RANGE_FILTERS],
+            'start_datetime': RANGE_FILTERS,
+            'created_at': RANGE_FILTERS,
+            'avg_rating': ['gte'],
+            # Проверяются на строках, найденных по индексу
+            'end_datetime': ['lte'],
+            'duration': ['exact', 'gte', 'lte'],
+            'max_people': ['gte'],
+            'is_active': ['exact'],
+        }
+
+
+class BookingFilter(PlannedFilterSet):
+    tour = django_filters.NumberFilter(field_name='tour_id')
+
+    indexed_fields = ('id', 'tour_id', 'created_at')
+    indexed_ordering = ('id', 'created_at')
+
+    class Meta:
+        model = Booking
+        fields = {
+            'id': ['exact'],
+            'created_at': RANGE_FILTERS,
+            'booking_date': ['exact', *RANGE_FILTERS],
+            'status': ['exact'],
+        }
+
+    def get_leading_fields(self):
+        # Список обычного пользователя уже ограничен индексом booking_user_created_idx
+        user = getattr(self.request, 'user', None)
+        return set() if user is not None and user.is_superuser else {'user'}
@@ -0,0 +1,129 @@
+import math
+
+from django.db.models import F, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+EARTH_RADIUS_KM = 6371.0
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 500
+# Сколько клеток допускается в покрытии круга: меньше клеток — крупнее клетки
+MAX_CELLS = 16
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Биты чередуются: четные делят долготу, нечетные широту
+        target, bounds = (lon, lon_range) if even else (lat, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Высота и ширина клетки geohash в градусах"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def covering_cells(lat, lon, radius_km):
+    """Клетки geohash, покрывающие квадрат со стороной 2 * radius_km вокруг точки"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlon = min(180.0, dlat / max(math.cos(math.radians(lat)), 1e-6))
+    lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        columns = round(360 / width)
+        rows = range(int((lat_min + 90) // height), min(int((lat_max + 90) // height), round(180 / height) - 1) + 1)
+        first, last = int((lon - dlon + 180) // width), int((lon + dlon + 180) // width)
+        # Через антимеридиан номера колонок переходят на другой край
+        cols = {col % columns for col in range(first, min(last, first + columns - 1) + 1)}
+        if len(rows) * len(cols) <= MAX_CELLS:
+            break
+    return sorted({
+        encode_geohash(-90 + (row + 0.5) * height, -180 + (col + 0.5) * width, precision)
+        for row in rows for col in cols
+    })
+
+
+def prefix_range(prefix, field):
+    """Условие «field начинается с prefix» диапазоном, который идет по индексу"""
+    condition = Q(**{f'{field}__gte': prefix})
+    for position in range(len(prefix) - 1, -1, -1):
+        index = GEOHASH_ALPHABET.index(prefix[position])
+        if index + 1 < len(GEOHASH_ALPHABET):
+            return condition & Q(**{f'{field}__lt': prefix[:position] + GEOHASH_ALPHABET[index + 1]})
+    return condition
+
+
+def distance_km(lat, lon, lat_field, lon_field):
+    """Расстояние по большому кругу (гаверсинус) от точки до координат строки"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = Radians(F(lat_field)), Radians(F(lon_field))
+    a = (
+        Power(Sin((lat2 - Value(lat1)) / Value(2.0)), 2)
+        + Value(math.cos(lat1)) * Cos(lat2) * Power(Sin((lon2 - Value(lon1)) / Value(2.0)), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+
+
+class TourProximityFilter(BaseFilterBackend):
+    """
+    ?near=lat,lon&radius=км — туры в радиусе от точки. Локации отбираются
+    по клеткам geohash (диапазоны по индексу), затем точно по расстоянию;
+    туры получают аннотацию distance в километрах.
+    """
+    near_param = 'near'
+    radius_param = 'radius'
+
+    @classmethod
+    def get_point(cls, request):
+        near = request.query_params.get(cls.near_param)
+        if not near:
+            return None
+        try:
+            lat, lon = (float(value) for value in near.split(','))
+        except ValueError:
+            raise serializers.ValidationError({cls.near_param: ["Ожидается near=широта,долгота."]})
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise serializers.ValidationError({cls.near_param: ["Координаты вне допустимого диапазона."]})
+        try:
+            radius = float(request.query_params.get(cls.radius_param, DEFAULT_RADIUS_KM))
+        except ValueError:
+            radius = -1
+        if not 0 < radius <= MAX_RADIUS_KM:
+            raise serializers.ValidationError({cls.radius_param: [f"Радиус от 0 до {MAX_RADIUS_KM} км."]})
+        return lat, lon, radius
+
+    def filter_queryset(self, request, queryset, view):
+        point = self.get_point(request)
+        if point is None:
+            return queryset
+        lat, lon, radius = point
+        locations = queryset.model._meta.get_field('location').related_model.objects
+
+        cells = Q()
+        for prefix in covering_cells(lat, lon, radius):
+            cells |= prefix_range(prefix, 'geohash')
+        return (
+            queryset.filter(location__in=locations.filter(cells).values('id'))
+            .annotate(distance=distance_km(lat, lon, 'location__latitude', 'location__longitude'))
+            .filter(distance__lte=radius)
+        )
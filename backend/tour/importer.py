@@ -0,0 +1,109 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from common.cache import bump_version
+
+from .models import Tour, TourCategory, Location
+from .search import build_document, index_tours
+from .serializers import TourImportSerializer
+
+class TourImporter:
+    """
+    Импорт туров гида пакетами bulk_create. Категории и локации ищутся
+    один раз на пакет и кэшируются на весь импорт; недостающие локации
+    создаются, неизвестные категории дают ошибку строки.
+    """
+
+    def __init__(self, guide, batch_size=1000):
+        self.guide = guide
+        self.batch_size = batch_size
+        self.categories = {}
+        self.locations = {}
+        self.created = 0
+        self.errors = []
+        self.created_locations = False
+
+    def run(self, rows):
+        # Один экземпляр на весь импорт: поля сериализатора копируются один раз
+        validator = TourImportSerializer()
+        batch = []
+        for number, row in enumerate(rows, 1):
+            if isinstance(row, Exception):
+                self.errors.append({'row': number, 'errors': {'non_field_errors': [str(row)]}})
+                continue
+            if not isinstance(row, dict):
+                self.errors.append({'row': number, 'errors': {'non_field_errors': ["Ожидался объект."]}})
+                continue
+            try:
+                data = validator.run_validation(row)
+            except serializers.ValidationError as exc:
+                self.errors.append({'row': number, 'errors': serializers.as_serializer_error(exc)})
+                continue
+            batch.append((number, data))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+
+        # bulk_create не отправляет post_save
+        if self.created:
+            bump_version(Tour)
+        if self.created_locations:
+            bump_version(Location)
+        return {'created': self.created, 'errors': self.errors}
+
+    def flush(self, batch):
+        self.resolve_categories({data['category'] for _, data in batch})
+        self.resolve_locations({(data['country'], data['city']) for _, data in batch})
+
+        tours = []
+        for number, data in batch:
+            category = self.categories[data.pop('category')]
+            if category is None:
+                self.errors.append({'row': number, 'errors': {'category': ["Категория не найдена."]}})
+                continue
+            location = self.locations[(data.pop('country'), data.pop('city'))]
+            tour = Tour(guide=self.guide, category=category, location=location, **data)
+            tour.available_slots = tour.max_people
+            tour.search_document = build_document(tour)
+            tours.append(tour)
+
+        with transaction.atomic():
+            Tour.objects.bulk_create(tours)
+            index_tours((tour.pk, tour.search_document) for tour in tours)
+        self.created += len(tours)
+
+    def resolve_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        self.categories.update({category.name: category for category in TourCategory.objects.filter(name__in=missing)})
+        for name in missing:
+            self.categories.setdefault(name, None)
+
+    def resolve_locations(self, keys):
+        missing = keys - self.locations.keys()
+        if not missing:
+            return
+        self.locations.update(self.fetch_locations(missing))
+        new = missing - self.locations.keys()
+        if new:
+            Location.objects.bulk_create(
+                [Location(country=country, city=city) for country, city in sorted(new)],
+                ignore_conflicts=True,
+            )
+            self.locations.update(self.fetch_locations(new))
+            self.created_locations = True
+
+    @staticmethod
+    def fetch_locations(keys):
+        queryset = Location.objects.filter(
+            country__in={country for country, _ in keys},
+            city__in={city for _, city in keys},
+        )
+        return {
+            (location.country, location.city): location
+            for location in queryset
+            if (location.country, location.city) in keys
+        }
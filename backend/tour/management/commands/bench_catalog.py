@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import resolve
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает запросы/с чтения каталога: синхронный viewset на пуле потоков "
+        "(как WSGI-воркер) и асинхронное представление в одном цикле событий (ASGI)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/tour/list/')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=8, help="Потоков синхронного воркера")
+        parser.add_argument('--concurrency', type=int, default=200, help="Одновременных клиентов ASGI")
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help="Сколько секунд медленный клиент держит соединение")
+        parser.add_argument('--host', default=None, help="По умолчанию первый из ALLOWED_HOSTS")
+        parser.add_argument('--cache', action='store_true', help="Не отключать кэш ответов")
+
+    def handle(self, *args, **options):
+        options['host'] = options['host'] or next(iter(settings.ALLOWED_HOSTS), 'localhost').lstrip('.')
+        match = resolve(options['url'].split('?')[0])
+        initkwargs = match.func.view_initkwargs
+        sync_view = initkwargs['viewset'].as_view({'get': initkwargs['action']})
+        async_view = match.func
+
+        caches = None if options['cache'] else {
+            'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        }
+        with override_settings(**({'CACHES': caches} if caches else {})):
+            sync_rps = self.run_sync(sync_view, match, options)
+            async_rps = asyncio.run(self.run_async(async_view, match, options))
+
+        self.stdout.write(f"WSGI ({options['threads']} потоков): {sync_rps:.1f} запросов/с")
+        self.stdout.write(f"ASGI ({options['concurrency']} клиентов): {async_rps:.1f} запросов/с")
+        self.stdout.write(self.style.SUCCESS(f"Ускорение: x{async_rps / sync_rps:.2f}"))
+
+    @staticmethod
+    def build(factory, options):
+        request = factory.get(options['url'])
+        request.META['HTTP_HOST'] = options['host']
+        return request
+
+    def run_sync(self, view, match, options):
+        factory = RequestFactory()
+        delay = options['client_delay']
+
+        def serve(_):
+            time.sleep(delay)
+            response = view(self.build(factory, options), **match.kwargs)
+            response.render()
+            assert response.status_code == 200, response.status_code
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(serve, range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - started)
+
+    async def run_async(self, view, match, options):
+        factory = AsyncRequestFactory()
+        delay = options['client_delay']
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def serve():
+            async with slots:
+                await asyncio.sleep(delay)
+                response = await view(self.build(factory, options), **match.kwargs)
+                assert response.status_code == 200, response.status_code
+
+        started = time.perf_counter()
+        await asyncio.gather(*(serve() for _ in range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - started)
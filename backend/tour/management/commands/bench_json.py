@@ -0,0 +1,57 @@
+import io
+
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from common.parsers import FastJSONParser
+from common.renderers import FastJSONRenderer
+from common.values import ValuesSerializer
+from tour.models import Tour, Booking
+from tour.serializers import TourSerializer, BookingSerializer
+
+from .bench_serializers import Command as BenchSerializersCommand
+
+
+class Command(BenchSerializersCommand):
+    help = (
+        "Сравнивает JSONRenderer/JSONParser с FastJSONRenderer/FastJSONParser на "
+        "странице списка туров и бронирований. Недостающие строки создаются во "
+        "временной транзакции и откатываются"
+    )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        request = Request(RequestFactory().get('/api/tour/list/'))
+        with transaction.atomic():
+            self.fill(rows)
+            for serializer_class, queryset in (
+                (TourSerializer, Tour.objects.filter(is_active=True).order_by('-created_at', '-id')[:rows]),
+                (BookingSerializer, BookingSerializer.setup_eager_loading(Booking.objects.order_by('-created_at', '-id'))[:rows]),
+            ):
+                # Те же данные, что отдает список: строки values() и обертка пагинации
+                values = ValuesSerializer.compile(serializer_class(context={'request': request}), queryset)
+                data = {'next': None, 'previous': None, 'results': values.to_representation(values.queryset)}
+                self.compare(serializer_class.__name__, data, options['repeat'])
+            transaction.set_rollback(True)
+
+    def compare(self, name, data, repeat):
+        expected, json_render = self.measure(lambda: JSONRenderer().render(data), repeat)
+        actual, fast_render = self.measure(lambda: FastJSONRenderer().render(data), repeat)
+        if expected != actual:
+            self.stderr.write(f"{name}: результаты различаются")
+            return
+        parsed, json_parse = self.measure(lambda: JSONParser().parse(io.BytesIO(expected)), repeat)
+        fast_parsed, fast_parse = self.measure(lambda: FastJSONParser().parse(io.BytesIO(expected)), repeat)
+        if parsed != fast_parsed:
+            self.stderr.write(f"{name}: разбор различается")
+            return
+
+        self.stdout.write(f"{name}, {len(data['results'])} строк, {len(expected) / 1024:.0f} КБ (рендеринг + разбор):")
+        self.stdout.write(f"  JSONRenderer/JSONParser:         {json_render * 1000:.1f} + {json_parse * 1000:.1f} мс")
+        self.stdout.write(f"  FastJSONRenderer/FastJSONParser: {fast_render * 1000:.1f} + {fast_parse * 1000:.1f} мс")
+        self.stdout.write(self.style.SUCCESS(
+            f"  Ускорение рендеринга: x{json_render / fast_render:.1f}, разбора: x{json_parse / fast_parse:.1f}"
+        ))
@@ -0,0 +1,99 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from account.models import User
+from common.values import ValuesSerializer
+from tour.models import Tour, TourCategory, Location, Booking
+from tour.serializers import TourSerializer, BookingSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сериализацию списка туров и бронирований: ModelSerializer по "
+        "экземплярам моделей и ValuesSerializer по строкам values_list(). "
+        "Недостающие строки создаются во временной транзакции и откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3, help="Лучший из нескольких замеров")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        request = Request(RequestFactory().get('/api/tour/list/'))
+        with transaction.atomic():
+            self.fill(rows)
+            for serializer_class, queryset in (
+                (TourSerializer, Tour.objects.filter(is_active=True).order_by('-created_at', '-id')[:rows]),
+                (BookingSerializer, BookingSerializer.setup_eager_loading(Booking.objects.order_by('-created_at', '-id'))[:rows]),
+            ):
+                self.compare(serializer_class, queryset, request, options['repeat'])
+            transaction.set_rollback(True)
+
+    def compare(self, serializer_class, queryset, request, repeat):
+        context = {'request': request}
+        values = ValuesSerializer.compile(serializer_class(context=context), queryset)
+        instances, model_fetch = self.measure(lambda: list(queryset.all()), repeat)
+        expected, model_serialize = self.measure(
+            lambda: serializer_class(instances, many=True, context=context).data, repeat
+        )
+        rows, values_fetch = self.measure(lambda: list(values.queryset.all()), repeat)
+        # Компиляция входит в замер: в представлении она идет на каждый запрос
+        actual, values_serialize = self.measure(
+            lambda: ValuesSerializer.compile(serializer_class(context=context), queryset).to_representation(rows), repeat
+        )
+        name = serializer_class.__name__
+        if [dict(item) for item in expected] != actual:
+            self.stderr.write(f"{name}: результаты различаются")
+            return
+
+        self.stdout.write(f"{name}, {len(actual)} строк (чтение из БД + сериализация):")
+        self.stdout.write(f"  ModelSerializer:  {model_fetch * 1000:.0f} + {model_serialize * 1000:.0f} мс")
+        self.stdout.write(f"  ValuesSerializer: {values_fetch * 1000:.0f} + {values_serialize * 1000:.0f} мс")
+        self.stdout.write(self.style.SUCCESS(
+            f"  Ускорение сериализации: x{model_serialize / values_serialize:.1f}, "
+            f"всего: x{(model_fetch + model_serialize) / (values_fetch + values_serialize):.1f}"
+        ))
+
+    @staticmethod
+    def measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
+
+    def fill(self, rows):
+        missing = rows - Tour.objects.filter(is_active=True).count()
+        if missing <= 0 and Booking.objects.count() >= rows:
+            return
+        guide, _ = User.objects.get_or_create(
+            email='bench-guide@example.com', defaults={'first_name': 'Гид', 'last_name': 'Замер', 'role': 'provider'}
+        )
+        category, _ = TourCategory.objects.get_or_create(name='Замер')
+        location, _ = Location.objects.get_or_create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        # bulk_create без save(): поиск и места на даты для замера не нужны
+        Tour.objects.bulk_create([
+            Tour(
+                category=category, title=f'Тур {i}', description='Описание ' * 50, location=location, guide=guide,
+                price=100 + i % 500, duration=datetime.timedelta(hours=1 + i % 10),
+                start_datetime=now + datetime.timedelta(hours=i), end_datetime=now + datetime.timedelta(hours=i + 5),
+                max_people=10, available_slots=10,
+            )
+            for i in range(max(missing, 0))
+        ], batch_size=1000)
+        # Как в живой таблице: на один тур приходится много бронирований
+        tours = list(Tour.objects.values_list('id', flat=True)[:max(rows // 50, 1)])
+        Booking.objects.bulk_create([
+            Booking(user=guide, tour_id=tours[i % len(tours)], number_of_people=1 + i % 5, booking_date=now.date())
+            for i in range(max(rows - Booking.objects.count(), 0))
+        ], batch_size=1000)
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from common.images import build_variants
+from tour.models import Location, Tour
+
+User = get_user_model()
+
+IMAGE_FIELDS = ((Tour, 'image'), (Location, 'image'), (User, 'avatar'))
+
+
+class Command(BaseCommand):
+    help = "Создает недостающие варианты для уже загруженных изображений туров, локаций и аватаров"
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        for model, field in IMAGE_FIELDS:
+            names = (
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True).distinct().iterator()
+            )
+            for name in names:
+                try:
+                    created += len(build_variants(name))
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f"{name}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Создано вариантов: {created}, ошибок: {failed}"))
@@ -0,0 +1,80 @@
+import datetime
+import posixpath
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import FileField
+from django.utils import timezone
+
+from common.images import VARIANTS_DIR, delete_variants
+from common.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет загруженные файлы, на которые не ссылается ни одна строка. Файлы "
+        "проверяются пакетами: ссылки на пакет считаются одним запросом на каждое файловое поле"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help="Не трогать файлы моложе: их строка могла еще не сохраниться")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, что будет удалено")
+
+    def handle(self, *args, **options):
+        self.fields = [
+            (model, field.name)
+            for model in apps.get_models()
+            for field in model._meta.concrete_fields
+            if isinstance(field, FileField)
+        ]
+        self.cutoff = timezone.now() - datetime.timedelta(hours=options['grace_hours'])
+        self.dry_run = options['dry_run']
+
+        checked = deleted = 0
+        batch = []
+        for name in self.walk(''):
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                deleted += self.collect(batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            deleted += self.collect(batch)
+            checked += len(batch)
+
+        verb = "К удалению" if self.dry_run else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"Проверено файлов: {checked}. {verb}: {deleted}"))
+
+    def walk(self, directory):
+        """Имена по содержимому; старые загрузки с исходными именами не трогаем"""
+        directories, files = default_storage.listdir(directory)
+        for filename in files:
+            name = posixpath.join(directory, filename)
+            if is_content_addressed(name):
+                yield name
+        for child in directories:
+            if directory or child != VARIANTS_DIR:
+                yield from self.walk(posixpath.join(directory, child))
+
+    def collect(self, batch):
+        referenced = set()
+        for model, field in self.fields:
+            referenced.update(
+                model._default_manager.filter(**{f'{field}__in': batch}).values_list(field, flat=True)
+            )
+        orphans = 0
+        for name in batch:
+            # mtime читается прямо перед удалением: повторная загрузка того же
+            # файла обновляет его, пока ссылающаяся строка еще не сохранена
+            if name in referenced or default_storage.get_modified_time(name) >= self.cutoff:
+                continue
+            orphans += 1
+            if self.dry_run:
+                self.stdout.write(name)
+                continue
+            default_storage.delete(name)
+            delete_variants(name)
+        return orphans
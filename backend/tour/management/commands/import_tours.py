@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from common.importing import FORMATS, detect_format, read_rows
+from tour.importer import TourImporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Импорт туров гида из CSV/JSONL-файла пакетами bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу импорта")
+        parser.add_argument('--guide', required=True, help="Email гида, которому принадлежат туры")
+        parser.add_argument('--format', choices=FORMATS, help="Формат файла; по умолчанию по расширению")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        guide = User.objects.filter(email=options['guide']).first()
+        if guide is None:
+            raise CommandError(f"Пользователь {options['guide']} не найден.")
+        fmt = detect_format(options['path'], options['format'])
+        if fmt is None:
+            raise CommandError("Поддерживаются файлы CSV и JSONL.")
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            report = TourImporter(guide, options['batch_size']).run(read_rows(lines, fmt))
+
+        for error in report['errors']:
+            self.stderr.write(f"Строка {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано туров: {report['created']}, ошибок: {len(report['errors'])}"
+        ))
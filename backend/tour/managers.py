@@ -0,0 +1,75 @@
+import datetime
+
+from django.db import models
+
+
+class TourInventoryManager(models.Manager):
+    def remaining(self, tour, date):
+        """Свободные места тура на дату одним индексным поиском"""
+        row = self.filter(tour=tour, date=date).values('capacity', 'booked').first()
+        if row is None:
+            return tour.max_people
+        return row['capacity'] - row['booked']
+
+    def claim(self, tour, date, count):
+        """Атомарно занимает места на дату; False, если мест не хватает"""
+        self.get_or_create(tour=tour, date=date, defaults={'capacity': tour.max_people})
+        claimed = self.filter(
+            tour=tour,
+            date=date,
+            booked__lte=models.F('capacity') - count,
+        ).update(booked=models.F('booked') + count)
+        return claimed == 1
+
+    def claim_many(self, items):
+        """
+        Занимает места сразу для нескольких (tour, date, count) в порядке
+        (tour_id, date), чтобы параллельные оформления блокировали строки
+        одинаково. Возвращает ключи (tour_id, date), где мест не хватило.
+        """
+        totals = {}
+        tours = {}
+        for tour, date, count in items:
+            totals[(tour.pk, date)] = totals.get((tour.pk, date), 0) + count
+            tours[tour.pk] = tour
+        keys = sorted(totals)
+
+        self.bulk_create(
+            [self.model(tour_id=tour_id, date=date, capacity=tours[tour_id].max_people) for tour_id, date in keys],
+            ignore_conflicts=True,
+        )
+        failed = []
+        for tour_id, date in keys:
+            count = totals[(tour_id, date)]
+            claimed = self.filter(
+                tour_id=tour_id,
+                date=date,
+                booked__lte=models.F('capacity') - count,
+            ).update(booked=models.F('booked') + count)
+            if not claimed:
+                failed.append((tour_id, date))
+        return failed
+
+    def calendar(self, tours, first, last):
+        """
+        Места туров по дням с first по last одним запросом по индексу (tour, date).
+        Дня без строки еще никто не бронировал: свободна вся вместимость тура.
+        """
+        rows = {
+            (tour_id, date): (capacity, booked)
+            for tour_id, date, capacity, booked in self.filter(
+                tour__in=tours, date__range=(first, last),
+            ).values_list('tour_id', 'date', 'capacity', 'booked')
+        }
+        days = [first + datetime.timedelta(days=offset) for offset in range((last - first).days + 1)]
+        calendars = {}
+        for tour in tours:
+            calendars[tour.pk] = []
+            for day in days:
+                capacity, booked = rows.get((tour.pk, day), (tour.max_people, 0))
+                calendars[tour.pk].append({'date': day, 'capacity': capacity, 'remaining': max(capacity - booked, 0)})
+        return calendars
+
+    def release(self, tour, date, count):
+        """Возвращает места на дату в продажу"""
+        self.filter(tour=tour, date=date).update(booked=models.F('booked') - count)
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 06:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_inventory(apps, schema_editor):
+    Booking = apps.get_model('tour', 'Booking')
+    TourInventory = apps.get_model('tour', 'TourInventory')
+    totals = (
+        Booking.objects.filter(status='confirmed')
+        .values('tour_id', 'tour__max_people', 'booking_date')
+        .annotate(total=models.Sum('number_of_people'))
+    )
+    TourInventory.objects.bulk_create([
+        TourInventory(
+            tour_id=row['tour_id'],
+            date=row['booking_date'],
+            capacity=row['tour__max_people'],
+            booked=row['total'],
+        )
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('capacity', models.PositiveIntegerField(verbose_name='Всего мест')),
+                ('booked', models.PositiveIntegerField(default=0, verbose_name='Подтверждено мест')),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='tour.tour')),
+            ],
+            options={
+                'verbose_name': 'Места на дату',
+                'verbose_name_plural': 'Места на даты',
+                'unique_together': {('tour', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_inventory, migrations.RunPython.noop),
+    ]
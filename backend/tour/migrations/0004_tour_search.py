@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-18 06:12
+
+import re
+
+import snowballstemmer
+from django.db import migrations, models
+
+# Копия логики tour.search на момент миграции: модуль может меняться,
+# а историческая миграция должна строить тот же индекс
+FTS_TABLE = 'tour_search'
+GIN_INDEX_NAME = 'tour_search_gin_idx'
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+STEMMER = snowballstemmer.stemmer('russian')
+
+
+def stem_words(text):
+    return [STEMMER.stemWord(word) for word in WORD_RE.findall(text.lower())]
+
+
+def build_document(tour):
+    parts = [
+        tour.title,
+        tour.description,
+        tour.location.city,
+        tour.location.country,
+        tour.category.name,
+        tour.guide.first_name,
+    ]
+    return '\n'.join(part for part in parts if part)
+
+
+def gin_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(SearchVector('search_document', config='russian'), name=GIN_INDEX_NAME)
+
+
+def create_search_index(apps, schema_editor):
+    Tour = apps.get_model('tour', 'Tour')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.add_index(Tour, gin_index())
+
+    for tour in Tour.objects.select_related('category', 'location', 'guide').iterator():
+        document = build_document(tour)
+        Tour.objects.filter(pk=tour.pk).update(search_document=document)
+        if vendor == 'sqlite':
+            schema_editor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [tour.pk, ' '.join(stem_words(document))],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    Tour = apps.get_model('tour', 'Tour')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(Tour, gin_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
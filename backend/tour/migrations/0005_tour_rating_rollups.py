@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-18 06:17
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_rating_rollups(apps, schema_editor):
+    Tour = apps.get_model('tour', 'Tour')
+    Review = apps.get_model('tour', 'Review')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    rollups = {}
+    for row in Review.objects.values('tour_id', 'rating').annotate(total=models.Count('id')):
+        tour = rollups.setdefault(row['tour_id'], {'review_count': 0, 'rating_sum': 0})
+        tour['review_count'] += row['total']
+        tour['rating_sum'] += row['rating'] * row['total']
+        tour[f"rating_{row['rating']}_count"] = row['total']
+    for tour_id, values in rollups.items():
+        values['avg_rating'] = (Decimal(values['rating_sum']) / values['review_count']).quantize(Decimal('0.01'))
+        Tour.objects.filter(pk=tour_id).update(**values)
+
+    guides = (
+        Tour.objects.filter(review_count__gt=0)
+        .values('guide_id')
+        .annotate(rating_sum=models.Sum('rating_sum'), review_count=models.Sum('review_count'))
+    )
+    for row in guides:
+        rating = (Decimal(row['rating_sum']) / row['review_count']).quantize(Decimal('0.01'))
+        User.objects.filter(pk=row['guide_id']).update(rating=rating)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour', '0004_tour_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['avg_rating', 'id'], name='tour_active_rating_idx'),
+        ),
+        migrations.RunPython(fill_rating_rollups, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,15 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from common.cache import bump_version
+
+from .geo import encode_geohash
+from .managers import TourInventoryManager
+from .ratings import apply_review, refresh_guide_rating
+from .search import TOUR_DOCUMENT_FIELDS, build_document, document_source, index_tour
 
 User = get_user_model()
 
@@ -20,7 +28,27 @@ class Location(models.Model):
     country = models.CharField(max_length=100, verbose_name="Страна")
     city = models.CharField(max_length=100, verbose_name="Город")
     image = models.ImageField(upload_to='imgs/locations/', blank=True, null=True, verbose_name="Изображение")
-    
+    latitude = models.FloatField(
+        null=True, blank=True, verbose_name="Широта",
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, verbose_name="Долгота",
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+    # Geohash координат: поиск рядом с точкой идет диапазонами по этому индексу
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Локация"
         verbose_name_plural = "Локации"
@@ -53,14 +81,58 @@ class Tour(models.Model):
     available_slots = models.PositiveIntegerField()
 
     is_active = models.BooleanField(default=True)
+    search_document = models.TextField(blank=True, editable=False)
+
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Места на датах (TourInventory) пересчитываются, только если max_people изменился
+        instance._saved_max_people = instance.__dict__.get('max_people')
+        instance._document_source = document_source(instance)
+        return instance
+
+    def document_outdated(self, update_fields=None):
+        """Нужно ли пересобрать поисковый документ: изменилось ли сохраняемое поле из документа"""
+        if update_fields is not None:
+            names = {name.removesuffix('_id') for name in update_fields}
+            if not names & set(TOUR_DOCUMENT_FIELDS):
+                return False
+        return not self.search_document or document_source(self) != getattr(self, '_document_source', None)
+
     def save(self, *args, **kwargs):
-        if not self.pk:
+        is_new = not self.pk
+        if is_new:
             self.available_slots = self.max_people
+        update_fields = kwargs.get('update_fields')
+        capacity_changed = (
+            not is_new and self.max_people != getattr(self, '_saved_max_people', None)
+            and (update_fields is None or 'max_people' in update_fields)
+        )
+        reindex = self.document_outdated(update_fields)
+        if reindex:
+            self.search_document = build_document(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
         super().save(*args, **kwargs)
+        if reindex:
+            index_tour(self.pk, self.search_document)
+            self._document_source = document_source(self)
+        if update_fields is None or 'max_people' in update_fields:
+            self._saved_max_people = self.max_people
+        if capacity_changed:
+            self.inventory.exclude(capacity=self.max_people).update(capacity=self.max_people)
     
     def clean(self):
         if self.start_datetime >= self.end_datetime:
@@ -69,10 +141,34 @@ class Tour(models.Model):
     class Meta:
         verbose_name = "Тур"
         verbose_name_plural = "Туры"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True), name='tour_active_created_idx'),
+            models.Index(fields=['start_datetime', 'id'], condition=models.Q(is_active=True), name='tour_active_start_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True), name='tour_active_price_idx'),
+            models.Index(fields=['avg_rating', 'id'], condition=models.Q(is_active=True), name='tour_active_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} — {self.location}"
-    
+
+
+class TourInventory(models.Model):
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='inventory')
+    date = models.DateField(verbose_name="Дата")
+    capacity = models.PositiveIntegerField(verbose_name="Всего мест")
+    booked = models.PositiveIntegerField(default=0, verbose_name="Подтверждено мест")
+
+    objects = TourInventoryManager()
+
+    class Meta:
+        verbose_name = "Места на дату"
+        verbose_name_plural = "Места на даты"
+        unique_together = ('tour', 'date')
+
+    def __str__(self):
+        return f"{self.tour.title} {self.date}: {self.booked}/{self.capacity}"
+
+
 class Booking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bookings", help_text="Пользователь, который забронировал тур.")
     tour = models.ForeignKey('Tour', on_delete=models.CASCADE, related_name="bookings", help_text="Забронированный тур.")
@@ -90,17 +186,60 @@ class Booking(models.Model):
     class Meta:
         verbose_name = "Бронирование"
         verbose_name_plural = "Бронирования"
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            models.Index(fields=['tour', 'status'], name='booking_tour_status_idx'),
+        ]
 
     def __str__(self):
         return f"Бронирование {self.id} - {self.user.first_name} на тур {self.tour.title}"
 
+    # Статус меняется условным UPDATE по строке в БД, а не по загруженному
+    # экземпляру: из параллельных запросов переход выполнит один, и места
+    # займутся или освободятся ровно один раз
+
+    def transition(self, source, target):
+        updated = Booking.objects.filter(pk=self.pk, status=source).update(status=target, updated_at=timezone.now())
+        return updated == 1
+
+    def held_seats(self):
+        """Тур, дата и места из строки в БД: после UPDATE она заблокирована"""
+        tour_id, date, count = (
+            Booking.objects.filter(pk=self.pk).values_list('tour_id', 'booking_date', 'number_of_people').get()
+        )
+        tour = self.tour if tour_id == self.tour_id else Tour.objects.get(pk=tour_id)
+        return tour, date, count
+
     def confirm_booking(self):
+        """
+        Занимает места на дату бронирования. False, если мест не хватает или
+        бронирование уже подтверждено (тогда status == 'confirmed').
+        """
+        with transaction.atomic():
+            source = next((status for status in ('pending', 'cancelled') if self.transition(status, 'confirmed')), None)
+            if source is None:
+                self.status = 'confirmed'
+                return False
+            if not TourInventory.objects.claim(*self.held_seats()):
+                self.transition('confirmed', source)
+                self.status = source
+                return False
+        bump_version(Booking)
         self.status = 'confirmed'
-        self.save()
+        return True
 
     def cancel_booking(self):
+        """Отменяет бронирование, подтвержденное освобождает места; False, если оно уже отменено"""
+        with transaction.atomic():
+            if self.transition('confirmed', 'cancelled'):
+                TourInventory.objects.release(*self.held_seats())
+            elif not self.transition('pending', 'cancelled'):
+                self.status = 'cancelled'
+                return False
+        bump_version(Booking)
         self.status = 'cancelled'
-        self.save()
+        return True
 
 class Review(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -116,9 +255,30 @@ class Review(models.Model):
     class Meta:
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
+        indexes = [
+            models.Index(fields=['tour', 'created_at', 'id'], name='review_tour_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.user} on {self.tour}"
+
+    def save(self, *args, **kwargs):
+        """Сохраняет отзыв и обновляет сводку рейтинга тура и гида в той же транзакции"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Review.objects.filter(pk=self.pk).values('tour_id', 'rating').first()
+            super().save(*args, **kwargs)
+            if previous == {'tour_id': self.tour_id, 'rating': self.rating}:
+                return
+            tour_ids = {self.tour_id}
+            if previous:
+                apply_review(previous['tour_id'], previous['rating'], -1)
+                tour_ids.add(previous['tour_id'])
+            apply_review(self.tour_id, self.rating, 1)
+            for guide_id in Tour.objects.filter(pk__in=tour_ids).values_list('guide_id', flat=True).distinct():
+                refresh_guide_rating(guide_id)
     
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
@@ -131,6 +291,9 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = "Избранное"
         verbose_name_plural = "Избранные"
+        indexes = [
+            models.Index(fields=['user', 'added_at', 'id'], name='favorite_user_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} -> {self.tour}"
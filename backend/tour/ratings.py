@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.utils import timezone
+
+User = get_user_model()
+
+HISTOGRAM_FIELDS = {rating: f'rating_{rating}_count' for rating in range(1, 6)}
+
+
+def _average(total, count):
+    return Case(
+        When(**{f'{count}__gt': 0}, then=ExpressionWrapper(
+            F(total) * Value(1.0) / F(count), output_field=DecimalField(max_digits=3, decimal_places=2)
+        )),
+        default=Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def apply_review(tour_id, rating, delta):
+    """Учитывает (delta=1) или снимает (delta=-1) оценку в сводке тура"""
+    from .models import Tour
+
+    tours = Tour.objects.filter(pk=tour_id)
+    tours.update(**{
+        'review_count': F('review_count') + delta,
+        'rating_sum': F('rating_sum') + delta * rating,
+        HISTOGRAM_FIELDS[rating]: F(HISTOGRAM_FIELDS[rating]) + delta,
+        'updated_at': timezone.now(),
+    })
+    tours.update(avg_rating=_average('rating_sum', 'review_count'))
+
+
+def refresh_guide_rating(guide_id):
+    """Пересчитывает User.rating гида по сводкам его туров, без обхода отзывов"""
+    from .models import Tour
+
+    totals = Tour.objects.filter(guide_id=guide_id).aggregate(
+        rating_sum=Sum('rating_sum'), review_count=Sum('review_count')
+    )
+    rating = Decimal('0')
+    if totals['review_count']:
+        rating = (Decimal(totals['rating_sum']) / totals['review_count']).quantize(Decimal('0.01'))
+    User.objects.filter(pk=guide_id).update(rating=rating)
@@ -0,0 +1,139 @@
+import functools
+import re
+
+import snowballstemmer
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+FTS_TABLE = 'tour_search'
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_stemmer = snowballstemmer.stemmer('russian')
+
+
+@functools.lru_cache(maxsize=50000)
+def stem_word(word):
+    return _stemmer.stemWord(word)
+
+
+def stem_words(text):
+    """Слова текста в нижнем регистре, приведенные к основе русским стеммером"""
+    return [stem_word(word) for word in WORD_RE.findall(text.lower())]
+
+
+# Поля пользователя, попадающие в документ туров гида
+GUIDE_DOCUMENT_FIELDS = {'first_name'}
+
+# Поля тура, из которых собирается документ; связанные записи сравниваются по id
+TOUR_DOCUMENT_FIELDS = ('title', 'description', 'location', 'category', 'guide')
+DOCUMENT_RELATIONS = ('location', 'category', 'guide')
+
+
+def document_source(tour):
+    """Значения полей тура, от которых зависит документ (без подгрузки отложенных полей)"""
+    return tuple(tour.__dict__.get(tour._meta.get_field(name).attname) for name in TOUR_DOCUMENT_FIELDS)
+
+
+def load_relations(tour):
+    """Подгружает незагруженные связанные записи одним запросом с select_related"""
+    fields = [tour._meta.get_field(name) for name in DOCUMENT_RELATIONS]
+    missing = [field for field in fields if not field.is_cached(tour)]
+    if not missing or tour.pk is None:
+        return
+    loaded = (
+        type(tour)._base_manager.select_related(*(field.name for field in missing))
+        .filter(pk=tour.pk).first()
+    )
+    for field in missing:
+        # Связь, измененная в памяти, подгрузится обычным обращением к полю
+        if loaded is not None and getattr(loaded, field.attname) == getattr(tour, field.attname):
+            field.set_cached_value(tour, field.get_cached_value(loaded))
+
+
+def build_document(tour):
+    """Текст для полнотекстового индекса: поля тура и связанных записей"""
+    load_relations(tour)
+    parts = [
+        tour.title,
+        tour.description,
+        tour.location.city,
+        tour.location.country,
+        tour.category.name,
+        tour.guide.first_name,
+    ]
+    return '\n'.join(part for part in parts if part)
+
+
+def index_tour(tour_id, document):
+    """Обновляет строку FTS5-индекса SQLite; в PostgreSQL индекс строится по колонке"""
+    index_tours([(tour_id, document)])
+
+
+def index_tours(documents):
+    """Пакетная индексация пар (tour_id, document), например после bulk_create"""
+    if connection.vendor != 'sqlite':
+        return
+    rows = [(tour_id, ' '.join(stem_words(document))) for tour_id, document in documents]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(tour_id,) for tour_id, _ in rows])
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)', rows)
+
+
+def unindex_tour(tour_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [tour_id])
+
+
+def refresh_documents(queryset):
+    """Пересобирает поисковые документы туров после изменения связанных записей"""
+    from .models import Tour
+
+    tours = list(queryset.select_related(*DOCUMENT_RELATIONS))
+    for tour in tours:
+        tour.search_document = build_document(tour)
+    Tour.objects.bulk_update(tours, ['search_document'], batch_size=500)
+    index_tours((tour.pk, tour.search_document) for tour in tours)
+
+
+def search_tours(queryset, text):
+    """
+    Фильтрует туры по полнотекстовому запросу и аннотирует search_rank
+    (больше — релевантнее): FTS5 с bm25 в SQLite, tsvector с ts_rank в PostgreSQL.
+    """
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('search_document', config='russian')
+        query = SearchQuery(text, config='russian')
+        return (
+            queryset.alias(search_vector=vector)
+            .filter(search_vector=query)
+            .annotate(search_rank=SearchRank(vector, query))
+        )
+
+    words = stem_words(text)
+    if not words:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+    match = ' AND '.join(f'"{word}"*' for word in words)
+    table = queryset.model._meta.db_table
+    rank = RawSQL(
+        f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "{table}"."id"',
+        [match],
+    )
+    matched = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    return queryset.filter(id__in=matched).annotate(search_rank=rank)
+
+
+class TourSearchFilter(SearchFilter):
+    """?search= по полнотекстовому индексу туров вместо LIKE по связанным таблицам"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_tours(queryset, ' '.join(terms))
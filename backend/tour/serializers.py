@@ -1,7 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
 from rest_framework import serializers
-from .models import Tour, TourCategory, Location, Booking, Review, Favorite
+
+from common.cache import bump_version
+from common.images import ImageVariantsField
+from .models import Tour, TourCategory, Location, Booking, Review, Favorite, TourInventory
+from .ratings import HISTOGRAM_FIELDS
 
 User = get_user_model()
 
@@ -11,9 +16,11 @@ class TourCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 class LocationSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Location
-        fields = ['id', 'country', 'city', 'image']
+        fields = ['id', 'country', 'city', 'latitude', 'longitude', 'image', 'image_variants']
 
 class BookingSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
@@ -36,19 +43,148 @@ class BookingSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         read_only_fields = ['id', 'user', 'tour', 'status', 'created_at', 'updated_at']
+        list_fields = ['id', 'tour', 'number_of_people', 'booking_date', 'status']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # str(user) — email, str(tour) — название и локация
+        return queryset.select_related('user', 'tour__location')
+
+    def validate(self, data):
+        instance = self.instance
+        tour = data.get('tour', instance.tour if instance else None)
+        booking_date = data.get('booking_date', instance.booking_date if instance else None)
+        number_of_people = data.get('number_of_people', instance.number_of_people if instance else None)
+
+        if not number_of_people:
+            raise serializers.ValidationError("Количество человек должно быть больше нуля.")
+
+        remaining = TourInventory.objects.remaining(tour, booking_date)
+        if (
+            instance and instance.status == 'confirmed'
+            and instance.tour_id == tour.pk and instance.booking_date == booking_date
+        ):
+            remaining += instance.number_of_people
+        if number_of_people > remaining:
+            raise serializers.ValidationError(f"Недостаточно мест на выбранную дату. Доступно: {remaining}")
+        return data
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            # Статус и места читаются под блокировкой строки: параллельная отмена ждет.
+            # save() пишет все поля, поэтому статус берется из БД, а не из экземпляра
+            current = Booking.objects.select_for_update().only(
+                'status', 'tour', 'booking_date', 'number_of_people'
+            ).get(pk=instance.pk)
+            instance.status = current.status
+            if current.status != 'confirmed':
+                return super().update(instance, validated_data)
+            TourInventory.objects.release(current.tour_id, current.booking_date, current.number_of_people)
+            instance = super().update(instance, validated_data)
+            if not TourInventory.objects.claim(instance.tour, instance.booking_date, instance.number_of_people):
+                raise serializers.ValidationError("Недостаточно мест на выбранную дату.")
+        return instance
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    tour_id = serializers.IntegerField()
+    booking_date = serializers.DateField()
+    number_of_people = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """
+    Корзина из нескольких бронирований. Места занимаются в одной транзакции:
+    если хотя бы одной позиции не хватает мест, не создается ни одна бронь.
+    """
+    items = CheckoutItemSerializer(many=True, allow_empty=False, max_length=50)
+
+    def validate_items(self, items):
+        tours = Tour.objects.filter(is_active=True).select_related('location').in_bulk(
+            {item['tour_id'] for item in items}
+        )
+        errors = []
+        for item in items:
+            item['tour'] = tours.get(item['tour_id'])
+            errors.append({} if item['tour'] else {'tour_id': ["Тур не найден."]})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        items = validated_data['items']
+        with transaction.atomic():
+            failed = set(TourInventory.objects.claim_many(
+                (item['tour'], item['booking_date'], item['number_of_people']) for item in items
+            ))
+            if failed:
+                raise serializers.ValidationError({'items': [
+                    {'number_of_people': ["Недостаточно мест на выбранную дату."]}
+                    if (item['tour'].pk, item['booking_date']) in failed else {}
+                    for item in items
+                ]})
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    user=validated_data['user'],
+                    tour=item['tour'],
+                    booking_date=item['booking_date'],
+                    number_of_people=item['number_of_people'],
+                    status='confirmed',
+                )
+                for item in items
+            ])
+        # bulk_create не отправляет post_save
+        bump_version(Booking)
+        return bookings
+
 
 
 
+class TourImportSerializer(serializers.Serializer):
+    """Строка файла импорта; категория и локация задаются названиями"""
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField()
+    category = serializers.CharField(max_length=100)
+    country = serializers.CharField(max_length=100)
+    city = serializers.CharField(max_length=100)
+    language = serializers.CharField(max_length=100, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    duration = serializers.DurationField()
+    start_datetime = serializers.DateTimeField()
+    end_datetime = serializers.DateTimeField()
+    max_people = serializers.IntegerField(min_value=1, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if data['start_datetime'] >= data['end_datetime']:
+            raise serializers.ValidationError("Дата окончания должна быть позже даты начала")
+        return data
+
 
 class TourSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+    rating_histogram = serializers.SerializerMethodField()
+    # Только в выдаче с ?near=: расстояние до точки в километрах
+    distance = serializers.FloatField(read_only=True)
+
     class Meta:
         model = Tour
         fields = [
             'id', 'title', 'description', 'price', 'duration',
-            'category', 'location', 'guide', 'image', 'start_datetime',
-            'end_datetime', 'max_people', 'available_slots'
+            'category', 'location', 'guide', 'image', 'image_variants', 'start_datetime',
+            'end_datetime', 'max_people',
+            'avg_rating', 'review_count', 'rating_histogram', 'distance'
+        ]
+        read_only_fields = ('guide', 'avg_rating', 'review_count')
+        # Карточка в списке: без описания и гистограммы оценок
+        list_fields = [
+            'id', 'title', 'price', 'duration', 'category', 'location', 'image_variants',
+            'start_datetime', 'avg_rating', 'review_count', 'distance'
         ]
-        read_only_fields = ('guide', 'available_slots')
+        field_sources = {'rating_histogram': list(HISTOGRAM_FIELDS.values())}
+
+    def get_rating_histogram(self, obj):
+        return {str(rating): getattr(obj, field) for rating, field in HISTOGRAM_FIELDS.items()}
     
     def get_bookings(self, obj):
         related_bookings = obj.bookings.all()  
@@ -74,6 +210,11 @@ class ReviewSerializer(serializers.ModelSerializer):
             'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+        field_sources = {'tour': ['tour']}
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('user', 'tour')
 
     def get_tour(self, obj):
         return obj.tour.title if obj.tour else None
@@ -107,6 +248,11 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ['id', 'user', 'tour', 'tour_id', 'added_at']
         read_only_fields = ['id', 'user', 'added_at']
+        field_sources = {'tour': ['tour']}
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('user', 'tour')
 
     def get_tour(self, obj):
         return {
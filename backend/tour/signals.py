@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from common.cache import bump_version
+from common.images import watch_image_fields
+
+from .models import Tour, TourCategory, Location, Booking, Review
+from .ratings import apply_review, refresh_guide_rating
+from .search import GUIDE_DOCUMENT_FIELDS, refresh_documents, unindex_tour
+
+User = get_user_model()
+
+watch_image_fields(Tour, 'image')
+watch_image_fields(Location, 'image')
+
+
+@receiver(post_delete, sender=Tour)
+def remove_tour_from_search(sender, instance, **kwargs):
+    unindex_tour(instance.pk)
+
+
+@receiver(pre_delete, sender=Booking)
+def release_booking_seats(sender, instance, **kwargs):
+    """Удаление бронирования, в том числе каскадом от тура или пользователя, освобождает места"""
+    instance.cancel_booking()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_rating(sender, instance, **kwargs):
+    # Срабатывает и при каскадном удалении, внутри транзакции удаления
+    apply_review(instance.tour_id, instance.rating, -1)
+    guide_id = Tour.objects.filter(pk=instance.tour_id).values_list('guide_id', flat=True).first()
+    if guide_id:
+        refresh_guide_rating(guide_id)
+
+
+@receiver(post_delete, sender=Tour)
+def refresh_guide_after_tour_delete(sender, instance, **kwargs):
+    refresh_guide_rating(instance.guide_id)
+
+
+@receiver(post_save, sender=TourCategory)
+@receiver(post_save, sender=Location)
+def refresh_related_tours(sender, instance, created, **kwargs):
+    if not created:
+        refresh_documents(instance.tours.all())
+
+
+@receiver(post_save, sender=User)
+def refresh_guide_tours(sender, instance, created, update_fields=None, **kwargs):
+    # Вход (last_login) и перехеширование пароля документы не меняют
+    if update_fields is not None and not GUIDE_DOCUMENT_FIELDS & set(update_fields):
+        return
+    if not created and instance.role == 'provider':
+        refresh_documents(instance.tours.all())
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+@receiver(post_save, sender=TourCategory)
+@receiver(post_delete, sender=TourCategory)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_version(sender)
@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.core.files.storage import default_storage
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from account.models import User
+from common.images import build_variants, variant_name, variant_storage
+from common.parsers import FastJSONParser
+from common.renderers import FastJSONRenderer
+from common.storage import serve_media
+from common.values import ValuesSerializer
+from .geo import encode_geohash
+from .models import Tour, TourCategory, Location, Booking, Review, Favorite, TourInventory
+from .serializers import TourSerializer
+from .views import TourViewSet
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсор проходит список вперед и назад без пропусков и повторов"""
+    url = '/api/tour/list/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        for price in (300, 100, 200, 100, 100, 200, 50):
+            Tour.objects.create(
+                category=category, title=f'Тур {price}', description='Описание', location=location,
+                guide=cls.user, price=price, duration=datetime.timedelta(hours=3),
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            page = self.get(url)
+            pages.append([tour['id'] for tour in page['results']])
+            url = page[link]
+        return pages
+
+    def test_round_trip(self):
+        expected = list(Tour.objects.order_by('price', 'id').values_list('id', flat=True))
+        forward = self.walk(f'{self.url}?ordering=price&page_size=2', 'next')
+        self.assertEqual([len(page) for page in forward], [2, 2, 2, 1])
+        # Равные цены идут по id: строки с одинаковым ключом не теряются и не повторяются
+        self.assertEqual(sum(forward, []), expected)
+
+        last = self.get(f'{self.url}?ordering=price&page_size=2')
+        while last['next']:
+            last = self.get(last['next'])
+        self.assertEqual(self.walk(last['previous'], 'previous'), forward[-2::-1])
+        self.assertIsNone(self.get(f'{self.url}?ordering=price&page_size=2')['previous'])
+
+    def test_descending(self):
+        expected = list(Tour.objects.order_by('-price', '-id').values_list('id', flat=True))
+        self.assertEqual(sum(self.walk(f'{self.url}?ordering=-price&page_size=3', 'next'), []), expected)
+
+    def test_invalid_cursor(self):
+        # Не base64, не тот размер ключа, значение не того типа, нет ключа v
+        for cursor in ('not-base64', 'eyJ2IjogWzFdfQ==', 'eyJ2IjogWyJ4IiwgMV19', 'eyJ4IjogMX0='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'{self.url}?ordering=price&cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Неверный курсор'})
+
+
+@skipUnless(connection.vendor == 'sqlite', "План запроса проверяется через EXPLAIN QUERY PLAN SQLite")
+class QueryPlanTests(TestCase):
+    """Основной запрос каждого списка должен идти по индексу, без полного сканирования"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        for i in range(30):
+            tour = Tour.objects.create(
+                category=category, title=f'Тур {i}', description='Описание', location=location,
+                guide=cls.user, price=100 + i, duration=datetime.timedelta(hours=3),
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1), is_active=i % 3 != 0,
+            )
+            Booking.objects.create(user=cls.user, tour=tour, number_of_people=1, booking_date=now.date())
+            Review.objects.create(user=cls.user, tour=tour, rating=5)
+            Favorite.objects.create(user=cls.user, tour=tour)
+        cls.tour = tour
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def main_query_plan(self, url, table):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        sql, params = next(
+            (sql, params) for sql, params in statements
+            if sql.startswith('SELECT') and f'FROM "{table}"' in sql
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexed(self, url, table):
+        plan = self.main_query_plan(url, table)
+        full_scans = [step for step in plan if step.split()[:2] == ['SCAN', table] and 'INDEX' not in step]
+        self.assertFalse(full_scans, f'{url}: {plan}')
+        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], f'{url}: {plan}')
+
+    def test_tour_list(self):
+        for ordering in ('-created_at', 'created_at', 'start_datetime', '-start_datetime', 'price', '-price', '-avg_rating'):
+            with self.subTest(ordering=ordering):
+                self.assertIndexed(f'/api/tour/list/?ordering={ordering}', 'tour_tour')
+
+    def test_booking_list(self):
+        self.assertIndexed('/api/tour/bookings/', 'tour_booking')
+
+    def test_review_list(self):
+        self.assertIndexed('/api/tour/reviews/', 'tour_review')
+        self.assertIndexed(f'/api/tour/reviews/?tour={self.tour.pk}', 'tour_review')
+
+    def test_favorite_list(self):
+        self.assertIndexed('/api/tour/favorites/', 'tour_favorite')
+
+
+class ListQueryCountTests(TestCase):
+    """Число запросов на страницу списка не зависит от ее размера"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        category = TourCategory.objects.create(name='Поход')
+        now = timezone.now()
+        for i in range(20):
+            location = Location.objects.create(country='Кыргызстан', city=f'Город {i}')
+            tour = Tour.objects.create(
+                category=category, title=f'Тур {i}', description='Описание', location=location,
+                guide=cls.user, price=100, duration=datetime.timedelta(hours=3),
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+            )
+            Booking.objects.create(user=cls.user, tour=tour, number_of_people=1, booking_date=now.date())
+            Review.objects.create(user=cls.user, tour=tour, rating=4)
+            Favorite.objects.create(user=cls.user, tour=tour)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+
+    def test_constant_queries(self):
+        for url in ('/api/tour/bookings/', '/api/tour/reviews/', '/api/tour/favorites/', '/api/tour/list/'):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(f'{url}?page_size=2'),
+                    self.count_queries(f'{url}?page_size=20'),
+                )
+
+
+class SearchTests(TestCase):
+    """
+    Полнотекстовый ?search=. Ожидания одинаковы для FTS5 в SQLite и
+    tsvector в PostgreSQL: слова запроса не являются префиксами других
+    слов корпуса и не входят в стоп-слова.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Айбек', last_name='Тест', role='provider')
+        cls.category = TourCategory.objects.create(name='Активный отдых')
+        karakol = Location.objects.create(country='Кыргызстан', city='Каракол')
+        bishkek = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        cls.tours = {}
+        for key, title, description, location in (
+            ('lake', 'Поход к озеру', 'Двухдневный поход через перевал к горному озеру', karakol),
+            ('city', 'Экскурсия', 'Прогулка по центру, затем поход в музей', bishkek),
+            ('river', 'Сплав', 'Рафтинг для начинающих на реке', karakol),
+        ):
+            cls.tours[key] = Tour.objects.create(
+                category=cls.category, title=title, description=description, location=location,
+                guide=cls.guide, price=100, duration=datetime.timedelta(hours=3),
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+            ).pk
+
+    def search(self, text):
+        response = self.client.get('/api/tour/list/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        names = {pk: key for key, pk in self.tours.items()}
+        return [names[tour['id']] for tour in response.json()['results']]
+
+    def test_stemming(self):
+        for text, expected in (
+            ('походы', {'lake', 'city'}),
+            ('озера', {'lake'}),
+            ('сплавы реки', {'river'}),
+            ('музеи Бишкека', {'city'}),
+            ('поход сплав', set()),
+            ('!!!', set()),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(set(self.search(text)), expected)
+
+    def test_ranking(self):
+        # В документе озера «поход» встречается дважды
+        self.assertEqual(self.search('поход'), ['lake', 'city'])
+
+    def test_related_fields(self):
+        self.assertEqual(set(self.search('Айбек')), set(self.tours))
+        self.assertEqual(set(self.search('Каракол')), {'lake', 'river'})
+        self.category.name = 'Треккинг'
+        self.category.save()
+        self.assertEqual(set(self.search('треккинг')), set(self.tours))
+
+    def test_guide_save(self):
+        with mock.patch('tour.signals.refresh_documents') as refresh:
+            self.guide.last_login = timezone.now()
+            self.guide.save(update_fields=['last_login'])
+            self.guide.set_password('new-pass')
+            self.guide.save(update_fields=['password'])
+            self.assertFalse(refresh.called)
+            self.guide.first_name = 'Нурлан'
+            self.guide.save(update_fields=['first_name'])
+            self.assertTrue(refresh.called)
+        self.guide.save()
+        self.assertEqual(set(self.search('Нурлан')), set(self.tours))
+
+    def test_save_reindexes_only_changed_document(self):
+        tour = Tour.objects.get(pk=self.tours['lake'])
+        tour.price = 150
+        with CaptureQueriesContext(connection) as queries:
+            tour.save()
+            tour.save(update_fields=['price'])
+        self.assertEqual(len(queries), 2)
+        self.assertFalse([query for query in queries if 'tour_search' in query['sql']])
+
+        # Связанные записи для документа подгружаются одним запросом
+        tour = Tour.objects.get(pk=self.tours['lake'])
+        tour.title = 'Восхождение'
+        with CaptureQueriesContext(connection) as queries:
+            tour.save(update_fields=['title'])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('SELECT')]), 1)
+        self.assertEqual(self.search('восхождение'), ['lake'])
+        self.assertIn('Каракол', Tour.objects.get(pk=tour.pk).search_document)
+
+    def test_refresh_documents_batch(self):
+        now = timezone.now()
+        location = Location.objects.create(country='Кыргызстан', city='Нарын')
+        for i in range(5):
+            Tour.objects.create(
+                category=self.category, title=f'Тур {i}', description='', location=location,
+                guide=self.guide, price=100, duration=datetime.timedelta(hours=3),
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+            )
+        location.city = 'Кочкор'
+        with CaptureQueriesContext(connection) as queries:
+            location.save()
+        self.assertLessEqual(len(queries), 6)
+        response = self.client.get('/api/tour/list/', {'search': 'Кочкор'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag и Last-Modified синхронного viewset, 304 для неизменившегося ответа"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        cls.category = TourCategory.objects.create(name='Поход')
+        cls.location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        cls.tours = [cls.create_tour(i) for i in range(4)]
+
+    @classmethod
+    def create_tour(cls, i):
+        now = timezone.now()
+        return Tour.objects.create(
+            category=cls.category, title=f'Тур {i}', description='Описание', location=cls.location,
+            guide=cls.guide, price=100 + i, duration=datetime.timedelta(hours=3),
+            start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.guide)
+
+    def get(self, url, **headers):
+        # С Authorization запрос обслуживает синхронный viewset
+        return self.client.get(url, HTTP_AUTHORIZATION='Bearer test', **headers)
+
+    def test_list(self):
+        url = '/api/tour/list/?page_size=2'
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Валидаторы страницы не зависят от строк за ее пределами
+        Tour.objects.filter(pk=self.tours[0].pk).delete()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.tours[3].title = 'Изменен'
+        self.tours[3].save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+
+        self.create_tour(4)
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_retrieve(self):
+        url = f'/api/tour/list/{self.tours[0].pk}/'
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.tours[0].save()
+        self.assertNotEqual(self.get(url, HTTP_IF_NONE_MATCH=etag)['ETag'], etag)
+
+    def test_no_count(self):
+        for url, counted in (('/api/tour/list/?page_size=2', False), ('/api/tour/list/?page_size=2&facets=1', True)):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.get(url).status_code, 200)
+                validators = queries.captured_queries[0]['sql']
+                self.assertEqual('COUNT(' in validators, counted, validators)
+
+
+class PublicCacheTests(TestCase):
+    """Общий кэш только для анонимных ответов, сброс по версиям моделей"""
+    prefix = '/api/tour/list/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        cls.category = TourCategory.objects.create(name='Поход')
+        now = timezone.now()
+        cls.tour = Tour.objects.create(
+            category=cls.category, title='Тур', description='Описание',
+            location=Location.objects.create(country='Кыргызстан', city='Бишкек'), guide=cls.user, price=100,
+            duration=datetime.timedelta(hours=3), start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = f'{self.prefix}{self.tour.pk}/'
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.user)
+
+    def retitle(self, title):
+        # update() не отправляет сигналов: версия модели не меняется
+        Tour.objects.filter(pk=self.tour.pk).update(title=title)
+
+    def title(self, response):
+        self.assertEqual(response.status_code, 200)
+        return response.json()['title']
+
+    def sync_retrieve(self, user=None):
+        request = APIRequestFactory().get(self.url)
+        if user is not None:
+            force_authenticate(request, user)
+        return TourViewSet.as_view({'get': 'retrieve'})(request, pk=self.tour.pk).data['title']
+
+    def test_hit_and_version_bump(self):
+        self.assertEqual(self.title(self.client.get(self.url)), 'Тур')
+        self.retitle('Изменен')
+        self.assertEqual(self.title(self.client.get(self.url)), 'Тур')
+        # Синхронный viewset читает ту же запись кэша
+        self.assertEqual(self.sync_retrieve(), 'Тур')
+        Tour.objects.get(pk=self.tour.pk).save()
+        self.assertEqual(self.title(self.client.get(self.url)), 'Изменен')
+        self.retitle('Снова')
+        self.category.save()
+        self.assertEqual(self.title(self.client.get(self.url)), 'Снова')
+
+    def test_authenticated_bypass(self):
+        self.client.get(self.url)
+        self.retitle('Для пользователя')
+        # Ни с Authorization (синхронный viewset), ни без него ответ не берется из кэша
+        self.assertEqual(self.title(self.authenticated.get(self.url, HTTP_AUTHORIZATION='Bearer test')), 'Для пользователя')
+        self.assertEqual(self.title(self.authenticated.get(self.url)), 'Для пользователя')
+        self.assertEqual(self.sync_retrieve(self.user), 'Для пользователя')
+
+        # И не попадает в него
+        cache.clear()
+        self.authenticated.get(self.url, HTTP_AUTHORIZATION='Bearer test')
+        self.authenticated.get(self.url)
+        self.sync_retrieve(self.user)
+        self.retitle('Общее')
+        self.assertEqual(self.title(self.client.get(self.url)), 'Общее')
+
+    def test_headers(self):
+        miss, hit = self.client.get(self.url), self.client.get(self.url)
+        authenticated = self.authenticated.get(self.url, HTTP_AUTHORIZATION='Bearer test')
+        self.assertIn('Authorization', miss['Vary'])
+        self.assertEqual(
+            {name: value for name, value in hit.items() if name != 'Date'},
+            {name: value for name, value in miss.items() if name != 'Date'},
+        )
+        self.assertEqual(authenticated['Vary'], miss['Vary'])
+
+    def test_hit_without_queries(self):
+        for url, actions, kwargs in (
+            (self.prefix, {'get': 'list'}, {}),
+            (self.url, {'get': 'retrieve'}, {'pk': self.tour.pk}),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as miss_queries:
+                    miss = self.client.get(url)
+                self.assertTrue(miss_queries.captured_queries)
+
+                # Валидаторы берутся из записи кэша и в async, и в синхронном viewset
+                with self.assertNumQueries(0):
+                    hit = self.client.get(url)
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=miss['ETag']).status_code, 304)
+                    request = APIRequestFactory().get(url, HTTP_IF_NONE_MATCH=miss['ETag'])
+                    self.assertEqual(TourViewSet.as_view(actions)(request, **kwargs).status_code, 304)
+                self.assertEqual((hit['ETag'], hit['Last-Modified']), (miss['ETag'], miss['Last-Modified']))
+
+
+class AsyncCatalogTests(TestCase):
+    """Асинхронное чтение каталога отдает то же, что синхронный viewset"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        cls.category = TourCategory.objects.create(name='Поход')
+        cls.location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        for i in range(5):
+            cls.tour = Tour.objects.create(
+                category=cls.category, title=f'Тур {i}', description='Описание', location=cls.location,
+                guide=cls.guide, price=100 + i, duration=datetime.timedelta(hours=3),
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+            )
+
+    def sync_get(self, url):
+        # С Authorization запрос обслуживает синхронный viewset
+        client = APIClient()
+        client.force_authenticate(self.guide)
+        return client.get(url, HTTP_AUTHORIZATION='JWT test')
+
+    async def test_same_payload(self):
+        urls = [
+            '/api/tour/list/?ordering=price&page_size=2',
+            f'/api/tour/list/?category={self.category.pk}&search=тур',
+            f'/api/tour/list/{self.tour.pk}/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                expected = await sync_to_async(self.sync_get)(url)
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_errors(self):
+        self.assertEqual((await self.async_client.get('/api/tour/list/0/')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/tour/list/?cursor=bad')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/tour/categories/')).status_code, 401)
+
+    async def test_not_modified(self):
+        response = await self.async_client.get('/api/tour/list/')
+        response = await self.async_client.get('/api/tour/list/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_cache_off_event_loop(self):
+        await cache.aclear()
+        on_loop = []
+
+        def off_loop(method):
+            def wrapper(cache, *args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(method.__name__)
+                except RuntimeError:
+                    pass
+                return method(cache, *args, **kwargs)
+            return wrapper
+
+        backend = type(caches['default'])
+        patches = {name: off_loop(getattr(backend, name)) for name in ('get', 'set', 'add', 'get_many')}
+        with mock.patch.multiple(backend, **patches):
+            for url in ('/api/tour/list/', '/api/tour/list/?facets=1', '/api/tour/list/?facets=1'):
+                self.assertEqual((await self.async_client.get(url)).status_code, 200)
+        self.assertEqual(on_loop, [])
+
+    async def test_head(self):
+        view = resolve('/api/tour/list/').func
+        get = await view(AsyncRequestFactory().get('/api/tour/list/'))
+        head = await view(AsyncRequestFactory().head('/api/tour/list/'))
+        self.assertEqual(head.status_code, 200)
+        self.assertEqual(head.content, b'')
+        self.assertEqual(head['Content-Length'], str(len(get.content)))
+        self.assertEqual(head['ETag'], get['ETag'])
+
+    def test_writes_stay_sync(self):
+        client = APIClient()
+        client.force_authenticate(self.guide)
+        response = client.patch(f'/api/tour/list/{self.tour.pk}/', {'price': '150.00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(APIClient().get(f'/api/tour/list/{self.tour.pk}/').json()['price'], '150.00')
+
+
+class RatingSummaryTests(TestCase):
+    """Сводка рейтинга тура и User.rating гида следуют за созданием, изменением и удалением отзывов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        cls.category = TourCategory.objects.create(name='Поход')
+        cls.location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        cls.first, cls.second = cls.create_tour('Первый'), cls.create_tour('Второй')
+        cls.users = [
+            User.objects.create_user(f'user{i}@example.com', 'pass', first_name='Иван', last_name='Тестов')
+            for i in range(3)
+        ]
+
+    @classmethod
+    def create_tour(cls, title):
+        now = timezone.now()
+        return Tour.objects.create(
+            category=cls.category, title=title, description='Описание', location=cls.location,
+            guide=cls.guide, price=100, duration=datetime.timedelta(hours=3),
+            start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+        )
+
+    def review(self, user, tour, rating):
+        return Review.objects.create(user=user, tour=tour, rating=rating)
+
+    def assertSummary(self, tour, ratings):
+        tour.refresh_from_db()
+        self.assertEqual(tour.review_count, len(ratings))
+        self.assertEqual(tour.rating_sum, sum(ratings))
+        for rating in range(1, 6):
+            self.assertEqual(getattr(tour, f'rating_{rating}_count'), ratings.count(rating), rating)
+        expected = Decimal(sum(ratings)) / len(ratings) if ratings else Decimal(0)
+        self.assertEqual(tour.avg_rating, expected.quantize(Decimal('0.01')))
+
+    def assertGuideRating(self, expected):
+        self.guide.refresh_from_db()
+        self.assertEqual(self.guide.rating, Decimal(expected))
+
+    def test_create(self):
+        self.review(self.users[0], self.first, 5)
+        self.review(self.users[1], self.first, 4)
+        self.review(self.users[2], self.first, 4)
+        self.assertSummary(self.first, [5, 4, 4])
+        self.assertSummary(self.second, [])
+        self.assertGuideRating('4.33')
+
+    def test_change_rating(self):
+        review = self.review(self.users[0], self.first, 5)
+        self.review(self.users[1], self.first, 3)
+        review.rating = 1
+        review.save()
+        self.assertSummary(self.first, [1, 3])
+        self.assertGuideRating('2.00')
+
+        # Повторное сохранение без изменений сводку не трогает
+        review.comment = 'Комментарий'
+        review.save()
+        self.assertSummary(self.first, [1, 3])
+
+    def test_move_to_another_tour(self):
+        review = self.review(self.users[0], self.first, 5)
+        review.tour = self.second
+        review.save()
+        self.assertSummary(self.first, [])
+        self.assertSummary(self.second, [5])
+        self.assertGuideRating('5.00')
+
+    def test_delete(self):
+        review = self.review(self.users[0], self.first, 2)
+        self.review(self.users[1], self.first, 4)
+        review.delete()
+        self.assertSummary(self.first, [4])
+        self.assertGuideRating('4.00')
+
+    def test_cascade_from_user(self):
+        # Каскад вызывает post_delete на каждый отзыв: снимает оценку и пересчитывает гида
+        self.review(self.users[0], self.first, 1)
+        self.review(self.users[0], self.second, 2)
+        self.review(self.users[1], self.first, 5)
+        self.users[0].delete()
+        self.assertSummary(self.first, [5])
+        self.assertSummary(self.second, [])
+        self.assertGuideRating('5.00')
+
+    def test_cascade_from_tour(self):
+        self.review(self.users[0], self.first, 1)
+        self.review(self.users[1], self.second, 4)
+        self.first.delete()
+        self.assertSummary(self.second, [4])
+        self.assertGuideRating('4.00')
+
+        self.second.delete()
+        self.assertGuideRating('0')
+
+
+class InventoryTests(TestCase):
+    """Подтверждение, отмена и удаление меняют места на дату ровно один раз"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        now = timezone.now()
+        cls.date = now.date()
+        cls.tour = Tour.objects.create(
+            category=TourCategory.objects.create(name='Поход'), title='Тур', description='Описание',
+            location=Location.objects.create(country='Кыргызстан', city='Бишкек'), guide=cls.user, price=100,
+            duration=datetime.timedelta(hours=3), max_people=5,
+            start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+        )
+
+    def book(self, number_of_people, user=None, date=None):
+        return Booking.objects.create(
+            user=user or self.user, tour=self.tour, booking_date=date or self.date, number_of_people=number_of_people,
+        )
+
+    def booked(self, date=None):
+        return TourInventory.objects.filter(tour=self.tour, date=date or self.date).values_list('booked', flat=True).first()
+
+    def test_stale_confirm_and_cancel(self):
+        booking = self.book(3)
+        # Оба экземпляра загружены до перехода, как в двух параллельных запросах
+        first, second = Booking.objects.get(pk=booking.pk), Booking.objects.get(pk=booking.pk)
+        self.assertTrue(first.confirm_booking())
+        self.assertFalse(second.confirm_booking())
+        self.assertEqual(second.status, 'confirmed')
+        self.assertEqual(self.booked(), 3)
+
+        first, second = Booking.objects.get(pk=booking.pk), Booking.objects.get(pk=booking.pk)
+        self.assertTrue(first.cancel_booking())
+        self.assertFalse(second.cancel_booking())
+        self.assertEqual(self.booked(), 0)
+        self.assertTrue(second.confirm_booking())
+        self.assertEqual(self.booked(), 3)
+
+    def test_sold_out(self):
+        self.book(4).confirm_booking()
+        booking = self.book(2)
+        self.assertFalse(booking.confirm_booking())
+        self.assertEqual(booking.status, 'pending')
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'pending')
+        self.assertEqual(self.booked(), 4)
+
+    def test_views(self):
+        booking = self.book(2)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/tour/bookings/{booking.pk}'
+        self.assertEqual(client.post(f'{url}/confirm/').status_code, 200)
+        self.assertEqual(client.post(f'{url}/confirm/').data, {"detail": "Это бронирование уже подтверждено."})
+        tomorrow = self.date + datetime.timedelta(days=1)
+        response = client.patch(f'{url}/', {'booking_date': tomorrow.isoformat(), 'number_of_people': 4}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((self.booked(), self.booked(tomorrow)), (0, 4))
+        self.assertEqual(client.post(f'{url}/cancel/').status_code, 200)
+        self.assertEqual(client.post(f'{url}/cancel/').status_code, 400)
+        self.assertEqual(self.booked(tomorrow), 0)
+
+    def test_stale_update(self):
+        booking = self.book(2)
+        booking.confirm_booking()
+        Booking.objects.get(pk=booking.pk).cancel_booking()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('tour.views.BookingViewSet.get_object', return_value=booking):
+            response = client.patch(f'/api/tour/bookings/{booking.pk}/', {'number_of_people': 4}, format='json')
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(self.booked(), 0)
+
+    def test_cascade_delete(self):
+        other = User.objects.create_user('other@example.com', 'pass', first_name='Петр', last_name='Тестов')
+        self.book(1).confirm_booking()
+        self.book(2, user=other).confirm_booking()
+        self.book(1, user=other)
+        self.assertEqual(self.booked(), 3)
+        other.delete()
+        self.assertEqual(self.booked(), 1)
+        self.assertEqual(self.client.get(f'/api/tour/list/{self.tour.pk}/calendar/').status_code, 200)
+
+    def test_capacity_follows_max_people(self):
+        self.book(2).confirm_booking()
+        tour = Tour.objects.get(pk=self.tour.pk)
+        tour.title = 'Новое название'
+        with CaptureQueriesContext(connection) as queries:
+            tour.save()
+        self.assertFalse([query for query in queries if 'tour_tourinventory' in query['sql']])
+
+        tour.max_people = 8
+        tour.save(update_fields=['title'])
+        self.assertEqual(TourInventory.objects.get(tour=tour).capacity, 5)
+        tour.save()
+        self.assertEqual(TourInventory.objects.get(tour=tour).capacity, 8)
+
+        # Места тура отдает календарь по датам, а не статичное поле тура
+        self.assertNotIn('available_slots', self.client.get(f'/api/tour/list/{tour.pk}/').json())
+
+
+class InventoryConcurrencyTests(TransactionTestCase):
+    """Параллельные подтверждения и отмены из разных соединений, как из нескольких воркеров gunicorn"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Общая база SQLite в памяти блокирует таблицу вместо ожидания записи")
+
+    def run_concurrently(self, method, booking, workers=4):
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def run():
+            try:
+                instance = Booking.objects.get(pk=booking.pk)
+                barrier.wait()
+                results.append(getattr(instance, method)())
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(results)
+
+    def test_concurrent_confirm_and_cancel(self):
+        user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        now = timezone.now()
+        tour = Tour.objects.create(
+            category=TourCategory.objects.create(name='Поход'), title='Тур', description='Описание',
+            location=Location.objects.create(country='Кыргызстан', city='Бишкек'), guide=user, price=100,
+            duration=datetime.timedelta(hours=3), max_people=10,
+            start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+        )
+        booking = Booking.objects.create(user=user, tour=tour, booking_date=now.date(), number_of_people=6)
+        inventory = TourInventory.objects.filter(tour=tour, date=now.date())
+
+        self.assertEqual(self.run_concurrently('confirm_booking', booking), [False, False, False, True])
+        self.assertEqual(inventory.get().booked, 6)
+        self.assertEqual(self.run_concurrently('cancel_booking', booking), [False, False, False, True])
+        self.assertEqual(inventory.get().booked, 0)
+
+
+class CheckoutTests(TestCase):
+    """Корзина оформляется целиком или не оформляется вовсе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        cls.date = now.date().isoformat()
+        cls.tours = [
+            Tour.objects.create(
+                category=category, title=f'Тур {i}', description='Описание', location=location,
+                guide=cls.user, price=100, duration=datetime.timedelta(hours=3), max_people=3,
+                start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, *people):
+        items = [
+            {'tour_id': tour.pk, 'booking_date': self.date, 'number_of_people': count}
+            for tour, count in zip(self.tours, people)
+        ]
+        return self.client.post('/api/tour/bookings/checkout/', {'items': items}, format='json')
+
+    def test_checkout(self):
+        response = self.checkout(2, 3, 1)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(Booking.objects.filter(status='confirmed').count(), 3)
+        self.assertEqual(
+            sorted(TourInventory.objects.values_list('booked', flat=True)), [1, 2, 3]
+        )
+
+    def test_sold_out_item_rolls_back(self):
+        response = self.checkout(2, 4, 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('number_of_people', response.data['items'][1])
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(TourInventory.objects.filter(booked__gt=0).exists())
+
+    def test_unknown_tour(self):
+        response = self.client.post('/api/tour/bookings/checkout/', {'items': [
+            {'tour_id': 0, 'booking_date': self.date, 'number_of_people': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tour_id', response.data['items'][0])
+
+
+class TourImportTests(TestCase):
+    """Импорт туров пакетами с отчетом об ошибках по строкам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        TourCategory.objects.create(name='Поход')
+        Location.objects.create(country='Кыргызстан', city='Бишкек')
+
+    def rows(self, count, **overrides):
+        return [
+            dict({
+                'title': f'Горный тур {i}', 'description': 'Озеро и перевал', 'category': 'Поход',
+                'country': 'Кыргызстан', 'city': 'Бишкек' if i % 2 else 'Каракол', 'price': '100.00',
+                'duration': '03:00:00', 'start_datetime': '2026-07-01T08:00:00Z',
+                'end_datetime': '2026-07-01T11:00:00Z', 'max_people': '8',
+            }, **overrides)
+            for i in range(count)
+        ]
+
+    def upload(self, rows):
+        header = list(rows[0])
+        lines = [','.join(header)] + [','.join(row[key] for key in header) for row in rows]
+        client = APIClient()
+        client.force_authenticate(self.guide)
+        upload = SimpleUploadedFile('tours.csv', '\n'.join(lines).encode('utf-8'), content_type='text/csv')
+        return client.post('/api/tour/list/import/', {'file': upload}, format='multipart')
+
+    def test_csv_upload(self):
+        rows = self.rows(5)
+        rows[1]['price'] = 'дорого'
+        rows[3]['category'] = 'Неизвестная'
+        response = self.upload(rows)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertEqual(Tour.objects.filter(guide=self.guide, available_slots=8).count(), 3)
+        self.assertEqual(Location.objects.filter(city='Каракол').count(), 1)
+
+        response = APIClient().get('/api/tour/list/?search=перевал')
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_queries_per_batch(self):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        self.upload(self.rows(2))  # создает новую локацию
+        with connection.execute_wrapper(capture):
+            self.upload(self.rows(2))
+        small = len(statements)
+        statements.clear()
+        with connection.execute_wrapper(capture):
+            self.upload(self.rows(20))
+        self.assertEqual(len(statements), small)
+
+    def test_command_jsonl(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8') as feed:
+            for row in self.rows(3):
+                feed.write(json.dumps(row, ensure_ascii=False) + '\n')
+            feed.write('{битая строка\n')
+            feed.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_tours', feed.name, guide=self.guide.email, stdout=out, stderr=err)
+        self.assertIn('Создано туров: 3, ошибок: 1', out.getvalue())
+        self.assertIn('Строка 4', err.getvalue())
+
+
+class ImageVariantTests(TestCase):
+    """Варианты изображений: фоновая генерация после загрузки и по запросу"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        photo = BytesIO()
+        Image.new('RGB', (2400, 1600), (40, 120, 200)).save(photo, 'JPEG')
+        with mock.patch('common.images.schedule_variants') as schedule, self.captureOnCommitCallbacks(execute=True):
+            now = timezone.now()
+            self.tour = Tour.objects.create(
+                category=TourCategory.objects.create(name='Поход'), title='Тур', description='Описание',
+                location=Location.objects.create(country='Кыргызстан', city='Бишкек'), guide=guide, price=100,
+                duration=datetime.timedelta(hours=3), start_datetime=now, end_datetime=now + datetime.timedelta(days=1),
+                available_slots=10, image=SimpleUploadedFile('photo.jpg', photo.getvalue(), content_type='image/jpeg'),
+            )
+        self.schedule = schedule
+
+    def test_upload_schedules_variants(self):
+        self.schedule.assert_called_once_with(self.tour.image.name)
+        self.tour.title = 'Новое название'
+        with mock.patch('common.images.schedule_variants') as schedule, self.captureOnCommitCallbacks(execute=True):
+            self.tour.save()
+        schedule.assert_not_called()
+
+    def test_variants(self):
+        variants = APIClient().get('/api/tour/list/').json()['results'][0]['image_variants']
+        self.assertEqual(set(variants), {'thumb', 'card', 'full'})
+
+        response = self.client.get(variants['card'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        card = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(card.size, (640, 400))
+
+        response = self.client.get(variants['full'].replace('.webp', '.jpg'))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (1600, 1067))
+        self.assertEqual(self.client.get(variants['card'].replace('card', 'huge')).status_code, 404)
+
+    def test_rejects_foreign_sources(self):
+        name = self.tour.image.name
+        build_variants(name)
+        full = variant_name(name, 'full')
+        for path in (
+            variant_name(full, 'thumb'),
+            variant_name(variant_name(full, 'full'), 'thumb'),
+            variant_name(name.replace('imgs/tours/', 'imgs/other/'), 'thumb'),
+            variant_name(name.replace('imgs/tours/', 'imgs/tours/nested/'), 'thumb'),
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(f'/media/{path}').status_code, 404)
+        self.assertFalse(variant_storage.exists(f'variants/{full}'))
+
+
+class MediaStorageTests(TestCase):
+    """Имена файлов по содержимому, дедупликация и сборка сирот"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        self.category = TourCategory.objects.create(name='Поход')
+        self.location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+
+    def create_tour(self, color):
+        photo = BytesIO()
+        Image.new('RGB', (320, 200), color).save(photo, 'JPEG')
+        now = timezone.now()
+        with mock.patch('common.images.schedule_variants'):
+            return Tour.objects.create(
+                category=self.category, title='Тур', description='Описание', location=self.location,
+                guide=self.guide, price=100, duration=datetime.timedelta(hours=3), start_datetime=now,
+                end_datetime=now + datetime.timedelta(days=1), available_slots=10,
+                image=SimpleUploadedFile('IMG_0001.JPG', photo.getvalue(), content_type='image/jpeg'),
+            )
+
+    def test_deduplicates_uploads(self):
+        first, second, other = self.create_tour('red'), self.create_tour('red'), self.create_tour('blue')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(first.image.name, r'^imgs/tours/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$')
+        directories = default_storage.listdir('imgs/tours')[0]
+        self.assertEqual(sum(len(default_storage.listdir(f'imgs/tours/{directory}')[1]) for directory in directories), 2)
+
+        response = serve_media(RequestFactory().get('/'), first.image.name)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_collect_orphans(self):
+        shared, orphan = self.create_tour('red'), self.create_tour('blue')
+        self.create_tour('red')
+        build_variants(orphan.image.name)
+        shared.delete()
+        orphan.delete()
+
+        stdout = StringIO()
+        call_command('collect_orphan_media', grace_hours=0, batch_size=1, stdout=stdout)
+        self.assertIn('Проверено файлов: 2. Удалено: 1', stdout.getvalue())
+        self.assertTrue(default_storage.exists(shared.image.name))
+        self.assertFalse(default_storage.exists(orphan.image.name))
+        self.assertFalse(variant_storage.exists(variant_name(orphan.image.name, 'card')))
+
+        # Только что загруженный файл мог еще не попасть в строку
+        recent = self.create_tour('green')
+        recent.delete()
+        call_command('collect_orphan_media', stdout=stdout)
+        self.assertTrue(default_storage.exists(recent.image.name))
+
+    def test_reupload_refreshes_orphan(self):
+        orphan = self.create_tour('red')
+        orphan.delete()
+        path = default_storage.path(orphan.image.name)
+        week_ago = (timezone.now() - datetime.timedelta(days=7)).timestamp()
+        os.utime(path, (week_ago, week_ago))
+
+        # Тот же файл загружают снова, строка с ним еще не сохранена
+        with open(path, 'rb') as photo:
+            name = default_storage.save('imgs/tours/IMG_0002.JPG', photo)
+        self.assertEqual(name, orphan.image.name)
+        self.assertGreater(os.path.getmtime(path), week_ago)
+
+        stdout = StringIO()
+        call_command('collect_orphan_media', stdout=stdout)
+        self.assertIn('Удалено: 0', stdout.getvalue())
+        self.assertTrue(default_storage.exists(name))
+
+
+class ProximityTests(TestCase):
+    """Туры рядом с точкой: отбор по клеткам geohash и сортировка по расстоянию"""
+
+    @classmethod
+    def setUpTestData(cls):
+        guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        category = TourCategory.objects.create(name='Поход')
+        now = timezone.now()
+        cls.tours = {}
+        for city, lat, lon in (
+            ('Бишкек', 42.8746, 74.5698), ('Алматы', 43.2389, 76.8897),
+            ('Чолпон-Ата', 42.6490, 77.0826), ('Каракол', 42.4907, 78.3936), ('Ош', 40.5283, 72.7985),
+        ):
+            location = Location.objects.create(country='Кыргызстан', city=city, latitude=lat, longitude=lon)
+            cls.tours[city] = Tour.objects.create(
+                category=category, title=f'Тур {city}', description='Описание', location=location, guide=guide,
+                price=100, duration=datetime.timedelta(hours=3), start_datetime=now,
+                end_datetime=now + datetime.timedelta(days=1),
+            )
+        Location.objects.create(country='Кыргызстан', city='Без координат')
+
+    def near(self, query):
+        response = APIClient().get(f'/api/tour/list/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(tour['title'], tour['distance']) for tour in response.json()['results']]
+
+    def test_near(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(Location.objects.get(city='Бишкек').geohash, encode_geohash(42.8746, 74.5698))
+        results = self.near('near=42.8746,74.5698&radius=250')
+        self.assertEqual([title for title, _ in results], ['Тур Бишкек', 'Тур Алматы', 'Тур Чолпон-Ата'])
+        self.assertAlmostEqual(results[0][1], 0, places=3)
+        self.assertAlmostEqual(results[1][1], 192.78, places=2)
+
+        results = self.near('near=42.8746,74.5698&radius=250&ordering=-distance&page_size=1')
+        self.assertEqual(results, [('Тур Чолпон-Ата', results[0][1])])
+        self.assertEqual(len(self.near('near=42.8746,74.5698&radius=5')), 1)
+
+    def test_distance_requires_near(self):
+        response = APIClient().get('/api/tour/list/?ordering=distance')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('distance', response.json()['results'][0])
+        for query in ('near=42.8', 'near=95,10', 'near=42.8,74.5&radius=5000', 'near=42.8,74.5&radius=x'):
+            with self.subTest(query=query):
+                self.assertEqual(APIClient().get(f'/api/tour/list/?{query}').status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', "План запроса проверяется через EXPLAIN QUERY PLAN SQLite")
+    def test_index_plan(self):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            self.near('near=42.8746,74.5698&radius=50')
+        sql, params = next((sql, params) for sql, params in statements if 'FROM "tour_tour"' in sql)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertFalse([step for step in plan if step.startswith(('SCAN tour_location', 'SCAN tour_tour'))], plan)
+        self.assertTrue([step for step in plan if 'tour_location' in step and 'geohash' in step], plan)
+
+
+class CalendarTests(TestCase):
+    """Календарь свободных мест по дням месяца"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        cls.tours = [
+            Tour.objects.create(
+                category=category, title=f'Тур {i}', description='Описание', location=location, guide=cls.guide,
+                price=100, duration=datetime.timedelta(hours=3), start_datetime=now,
+                end_datetime=now + datetime.timedelta(days=1), max_people=10,
+            )
+            for i in range(2)
+        ]
+
+    def book(self, tour, day, people, confirm=True):
+        booking = Booking.objects.create(user=self.guide, tour=tour, number_of_people=people, booking_date=datetime.date(2026, 7, day))
+        if confirm:
+            self.assertTrue(booking.confirm_booking())
+        return booking
+
+    def test_tour_calendar(self):
+        tour = self.tours[0]
+        self.book(tour, 1, 3)
+        self.book(tour, 1, 2)
+        booking = self.book(tour, 31, 10)
+        self.book(tour, 2, 4, confirm=False)
+
+        client = APIClient()
+        with self.assertNumQueries(2):
+            response = client.get(f'/api/tour/list/{tour.pk}/calendar/?month=2026-07')
+        self.assertEqual(response.status_code, 200)
+        days = response.json()['days']
+        self.assertEqual(len(days), 31)
+        self.assertEqual(days[0], {'date': '2026-07-01', 'capacity': 10, 'remaining': 5})
+        self.assertEqual(days[1]['remaining'], 10)
+        self.assertEqual(days[30]['remaining'], 0)
+
+        with self.assertNumQueries(0):
+            client.get(f'/api/tour/list/{tour.pk}/calendar/?month=2026-07')
+        booking.cancel_booking()
+        response = client.get(f'/api/tour/list/{tour.pk}/calendar/?month=2026-07')
+        self.assertEqual(response.json()['days'][30]['remaining'], 10)
+
+        self.assertEqual(client.get(f'/api/tour/list/{tour.pk}/calendar/?month=2026-13').status_code, 400)
+        self.assertEqual(len(client.get(f'/api/tour/list/{tour.pk}/calendar/?month=2026-02').json()['days']), 28)
+
+    def test_tours_calendar(self):
+        self.book(self.tours[1], 15, 6)
+        ids = ','.join(str(tour.pk) for tour in self.tours)
+        with self.assertNumQueries(2):
+            response = APIClient().get(f'/api/tour/list/calendar/?month=2026-07&tours={ids}')
+        calendars = response.json()['tours']
+        self.assertEqual(set(calendars), {str(tour.pk) for tour in self.tours})
+        self.assertEqual(calendars[str(self.tours[1].pk)][14]['remaining'], 4)
+        self.assertEqual(calendars[str(self.tours[0].pk)][14]['remaining'], 10)
+        self.assertEqual(APIClient().get('/api/tour/list/calendar/?tours=x').status_code, 400)
+
+
+class FacetTests(TestCase):
+    """Счетчики по категориям, локациям, цене и длительности для текущего фильтра"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        hiking, rafting = TourCategory.objects.create(name='Поход'), TourCategory.objects.create(name='Рафтинг')
+        bishkek = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        almaty = Location.objects.create(country='Казахстан', city='Алматы')
+        now = timezone.now()
+        for category, location, price, hours in (
+            (hiking, bishkek, 40, 3), (hiking, bishkek, 150, 5), (hiking, almaty, 600, 30), (rafting, almaty, 90, 1),
+        ):
+            Tour.objects.create(
+                category=category, title=f'Тур {price}', description='Описание', location=location, guide=cls.guide,
+                price=price, duration=datetime.timedelta(hours=hours), start_datetime=now,
+                end_datetime=now + datetime.timedelta(days=1),
+            )
+        cls.bishkek, cls.almaty, cls.rafting = bishkek, almaty, rafting
+
+    def test_facets(self):
+        facets = APIClient().get('/api/tour/list/?facets=1&page_size=1').json()['facets']
+        self.assertEqual([(row['name'], row['count']) for row in facets['category']], [('Поход', 3), ('Рафтинг', 1)])
+        self.assertEqual([(row['city'], row['count']) for row in facets['location']], [('Бишкек', 2), ('Алматы', 2)])
+        self.assertEqual([row['count'] for row in facets['price']], [1, 1, 1, 0, 1])
+        self.assertEqual(facets['price'][0], {'min': None, 'max': 50, 'count': 1})
+        self.assertEqual(facets['duration'][1], {'min': '02:00:00', 'max': '04:00:00', 'count': 1})
+        self.assertEqual([row['count'] for row in facets['duration']], [1, 1, 1, 0, 1])
+
+        # Счетчики считаются по тому же фильтру, что и список
+        facets = APIClient().get(f'/api/tour/list/?facets=1&location={self.bishkek.pk}').json()['facets']
+        self.assertEqual([(row['name'], row['count']) for row in facets['category']], [('Поход', 2)])
+        self.assertNotIn('facets', APIClient().get('/api/tour/list/').json())
+
+    def test_cached_per_filter(self):
+        client = APIClient()
+        client.force_authenticate(self.guide)
+        url = f'/api/tour/list/?facets=1&location={self.almaty.pk}'
+        first = client.get(url).json()['facets']
+        # Другая страница и сортировка того же фильтра берут счетчики из кэша
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'{url}&ordering=price&page_size=1')
+        self.assertEqual(response.json()['facets'], first)
+        self.assertFalse([query for query in queries if 'COUNT' in query['sql'] and 'GROUP BY' in query['sql']])
+        self.assertEqual(APIClient().get(url).json()['facets'], first)
+
+        Tour.objects.create(
+            category=self.rafting, title='Новый', description='Описание',
+            location=self.almaty, guide=self.guide, price=300, duration=datetime.timedelta(hours=2),
+            start_datetime=timezone.now(), end_datetime=timezone.now(),
+        )
+        counts = {row['name']: row['count'] for row in client.get(url).json()['facets']['category']}
+        self.assertEqual(counts, {'Поход': 1, 'Рафтинг': 2})
+
+
+class FilterPlannerTests(TestCase):
+    """Фильтры принимаются, только если запрос может пойти по индексу"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        cls.admin = User.objects.create_superuser('admin@example.com', 'pass', first_name='Админ', last_name='Тест')
+        cls.category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        for i in range(10):
+            cls.tour = Tour.objects.create(
+                category=cls.category, title=f'Тур {i}', description='Описание', location=location, guide=cls.guide,
+                price=50 * i, duration=datetime.timedelta(hours=i), start_datetime=now + datetime.timedelta(days=i),
+                end_datetime=now + datetime.timedelta(days=i + 1),
+            )
+        Booking.objects.create(user=cls.guide, tour=cls.tour, number_of_people=1, booking_date=now.date())
+
+    def get(self, url, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client.get(url)
+
+    def test_ranges(self):
+        response = self.get('/api/tour/list/?price__gte=100&price__lte=200')
+        self.assertEqual([tour['price'] for tour in response.json()['results']], ['100.00', '150.00', '200.00'])
+        now = timezone.now()
+        start, end = (
+            (now + delta).isoformat().replace('+00:00', 'Z')
+            for delta in (datetime.timedelta(days=7, hours=1), datetime.timedelta(days=30))
+        )
+        response = self.get(f'/api/tour/list/?start_datetime__range={start},{end}&ordering=-price')
+        self.assertEqual([tour['price'] for tour in response.json()['results']], ['450.00', '400.00'])
+        self.assertEqual(self.get('/api/tour/list/?price__gte=дорого').status_code, 400)
+
+    def test_unindexed_combinations(self):
+        response = self.get('/api/tour/list/?duration__gte=05:00:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.json())
+        for query in (
+            f'duration__gte=05:00:00&category={self.category.pk}',
+            'duration__gte=05:00:00&search=тур',
+            'max_people__gte=5&price__lte=100',
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.get(f'/api/tour/list/?{query}').status_code, 200)
+
+        # Список пользователя уже сужен индексом по user, весь список — нет
+        self.assertEqual(self.get('/api/tour/bookings/?status=pending', self.guide).status_code, 200)
+        self.assertEqual(self.get('/api/tour/bookings/?status=pending', self.admin).status_code, 400)
+        response = self.get(f'/api/tour/bookings/?status=pending&tour={self.tour.pk}', self.admin)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_unindexed_ordering(self):
+        for ordering in ('duration', '-max_people', 'review_count', 'end_datetime,id'):
+            with self.subTest(ordering=ordering):
+                response = self.get(f'/api/tour/list/?ordering={ordering}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ordering', response.json())
+        # Индексированные ключи, вычисляемые поля и сужающий фильтр допускаются
+        for query in (
+            'ordering=-price,id',
+            'ordering=distance',
+            f'ordering=duration&category={self.category.pk}',
+            'ordering=max_people&price__lte=100',
+            'ordering=review_count&search=тур',
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.get(f'/api/tour/list/?{query}').status_code, 200)
+
+        self.assertEqual(self.get('/api/tour/bookings/?ordering=booking_date', self.guide).status_code, 200)
+        self.assertEqual(self.get('/api/tour/bookings/?ordering=booking_date', self.admin).status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', "План запроса проверяется через EXPLAIN QUERY PLAN SQLite")
+    def test_range_uses_its_index(self):
+        # Без ?ordering= диапазон сортируется по своему индексу: ни полного обхода, ни сортировки
+        for query, index in (
+            ('price__gte=100', 'tour_active_price_idx'),
+            ('start_datetime__gte=2020-01-01T00:00:00Z', 'tour_active_start_idx'),
+            ('avg_rating__gte=4', 'tour_active_rating_idx'),
+        ):
+            with self.subTest(query=query), CaptureQueriesContext(connection) as queries:
+                self.get(f'/api/tour/list/?{query}')
+                sql = next(query['sql'] for query in queries if 'FROM "tour_tour"' in query['sql'] and 'LIMIT' in query['sql'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = [row[-1] for row in cursor.fetchall()]
+                self.assertEqual(plan, [plan[0]])
+                self.assertTrue(plan[0].startswith(f'SEARCH tour_tour USING INDEX {index}'), plan)
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields=/?omit= задают и поля ответа, и читаемые столбцы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек')
+        now = timezone.now()
+        for i in range(3):
+            cls.tour = Tour.objects.create(
+                category=category, title=f'Тур {i}', description='Длинное описание', location=location,
+                guide=cls.guide, price=100 + i, duration=datetime.timedelta(hours=3), start_datetime=now,
+                end_datetime=now + datetime.timedelta(days=1),
+            )
+        Booking.objects.create(user=cls.guide, tour=cls.tour, number_of_people=2, booking_date=now.date())
+        Review.objects.create(user=cls.guide, tour=cls.tour, rating=5, comment='Отлично')
+
+    def get(self, url):
+        client = APIClient()
+        client.force_authenticate(self.guide)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), ' '.join(query['sql'] for query in queries)
+
+    def test_list_card(self):
+        data, sql = self.get('/api/tour/list/')
+        self.assertNotIn('description', data['results'][0])
+        self.assertIn('image_variants', data['results'][0])
+        self.assertNotIn('"tour_tour"."description"', sql)
+        self.assertNotIn('rating_5_count', sql)
+
+        data, sql = self.get(f'/api/tour/list/{self.tour.pk}/')
+        self.assertEqual(data['description'], 'Длинное описание')
+        self.assertIn('rating_histogram', data)
+
+    def test_fields_and_omit(self):
+        data, sql = self.get('/api/tour/list/?fields=id,title,rating_histogram&ordering=-price')
+        self.assertEqual(list(data['results'][0]), ['id', 'title', 'rating_histogram'])
+        self.assertEqual(data['results'][0]['title'], 'Тур 2')
+        self.assertIn('rating_5_count', sql)
+        self.assertNotIn('"tour_tour"."duration"', sql)
+
+        data, _ = self.get(f'/api/tour/list/{self.tour.pk}/?omit=description,rating_histogram')
+        self.assertNotIn('description', data)
+        self.assertIn('max_people', data)
+
+        data, sql = self.get('/api/tour/reviews/?fields=id,rating')
+        self.assertEqual(data['results'], [{'id': data['results'][0]['id'], 'rating': 5}])
+        self.assertNotIn('comment', sql)
+        data, _ = self.get('/api/tour/bookings/')
+        self.assertEqual(set(data['results'][0]), {'id', 'tour', 'number_of_people', 'booking_date', 'status'})
+
+        for url in ('/api/tour/list/?fields=id,secret', '/api/tour/favorites/?omit=tour_id'):
+            with self.subTest(url=url):
+                client = APIClient()
+                client.force_authenticate(self.guide)
+                self.assertEqual(client.get(url).status_code, 400)
+
+    async def test_async_list(self):
+        # Отложенные столбцы в async-представлении не должны дочитываться по одному
+        response = await self.async_client.get('/api/tour/list/?fields=title,price&ordering=start_datetime')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0], {'title': 'Тур 0', 'price': '100.00'})
+
+
+class ValuesSerializerTests(TestCase):
+    """Быстрый путь списков отдает те же байты, что и ModelSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = User.objects.create_user('guide@example.com', 'pass', first_name='Гид', last_name='Тест', role='provider')
+        category = TourCategory.objects.create(name='Поход')
+        location = Location.objects.create(country='Кыргызстан', city='Бишкек', latitude=42.8746, longitude=74.5698)
+        now = timezone.now().replace(microsecond=123456)
+        for i in range(5):
+            tour = Tour.objects.create(
+                category=category, title=f'Тур {i}', description='Описание тура', location=location,
+                guide=cls.guide, price='99.5', duration=datetime.timedelta(hours=i, minutes=30),
+                start_datetime=now + datetime.timedelta(days=i), end_datetime=now + datetime.timedelta(days=i + 1),
+            )
+            Booking.objects.create(user=cls.guide, tour=tour, number_of_people=i + 1, booking_date=now.date())
+        Tour.objects.filter(pk=tour.pk).update(image='imgs/tours/ab/photo.jpg', avg_rating='4.5', rating_5_count=2)
+
+    def fetch(self, url, fast):
+        client = APIClient()
+        client.force_authenticate(self.guide)
+        if fast:
+            with mock.patch.object(ValuesSerializer, 'build', autospec=True, side_effect=ValuesSerializer.build) as build:
+                response = client.get(url)
+            self.assertTrue(build.called, url)
+        else:
+            with mock.patch.object(ValuesSerializer, 'compile', return_value=None):
+                response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def test_same_bytes(self):
+        all_tour_fields = ','.join(name for name, field in TourSerializer().fields.items() if not field.write_only)
+        urls = [
+            '/api/tour/list/',
+            f'/api/tour/list/?fields={all_tour_fields}&ordering=-id&page_size=2',
+            '/api/tour/list/?near=42.8746,74.5698&radius=10&omit=description',
+            '/api/tour/list/?search=тур&fields=id,title,rating_histogram',
+            '/api/tour/bookings/',
+            '/api/tour/bookings/?fields=id,user,tour,booking_date,created_at,updated_at&ordering=booking_date',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.fetch(url, fast=True), self.fetch(url, fast=False))
+
+    async def test_async_list(self):
+        response = await self.async_client.get('/api/tour/list/?page_size=2')
+        expected = await sync_to_async(self.fetch)('/api/tour/list/?page_size=2', fast=False)
+        self.assertEqual(response.content, expected)
+        # Курсор из значений строки values_list ведет на следующую страницу
+        response = await self.async_client.get(response.json()['next'])
+        self.assertEqual([tour['title'] for tour in response.json()['results']], ['Тур 2', 'Тур 1'])
+
+
+class FastJSONTests(TestCase):
+    """FastJSONRenderer и FastJSONParser совпадают с JSONRenderer и JSONParser"""
+    payload = {
+        'price': Decimal('99.50'),
+        'start': datetime.datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2025, 1, 2),
+        'time': datetime.time(3, 4, 5),
+        'duration': datetime.timedelta(hours=2, minutes=30),
+        'detail': gettext_lazy('Not found.'),
+        'text': 'Тур\u2028по\u2029горам "в" \\ \n\x00',
+        'counts': {1: 2, None: 3},
+        'items': (1, 2.5, None, True),
+    }
+
+    def test_same_bytes(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        indent = 'application/json; indent=2'
+        self.assertEqual(FastJSONRenderer().render(self.payload, indent), JSONRenderer().render(self.payload, indent))
+        with mock.patch('common.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+
+    def test_parse(self):
+        for body in (b'{"title": "\xd0\xa2\xd1\x83\xd1\x80", "price": 99.5, "tags": [1, null]}', b'[1e400]', b'18446744073709551615'):
+            with self.subTest(body=body):
+                self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        for body in (b'{"price": NaN}', b'{"title": }'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    JSONParser().parse(BytesIO(body))
+                with self.assertRaises(ParseError) as actual:
+                    FastJSONParser().parse(BytesIO(body))
+                self.assertEqual(str(actual.exception), str(expected.exception))
@@ -1,4 +1,7 @@
+from django.urls import re_path
 from rest_framework.routers import DefaultRouter
+
+from common.async_views import AsyncReadView
 from .views import TourViewSet, TourCategoryViewSet, LocationViewSet, BookingViewSet, ReviewViewSet, FavoriteViewSet
 
 router = DefaultRouter()
@@ -9,4 +12,12 @@ router.register(r'bookings', BookingViewSet, basename='bookings')
 router.register(r'reviews', ReviewViewSet, basename='reviews')
 router.register(r'favorites', FavoriteViewSet, basename='favorites')
 
-urlpatterns = router.urls
+# Чтение каталога — асинхронно, запись уходит в те же viewset
+catalog_urls = []
+for prefix, viewset in (('list', TourViewSet), ('categories', TourCategoryViewSet), ('locations', LocationViewSet)):
+    catalog_urls += [
+        re_path(rf'^{prefix}/$', AsyncReadView.as_view(viewset=viewset, action='list')),
+        re_path(rf'^{prefix}/(?P<pk>[0-9]+)/$', AsyncReadView.as_view(viewset=viewset, action='retrieve')),
+    ]
+
+urlpatterns = catalog_urls + router.urls
@@ -1,14 +1,33 @@
+import datetime
+from calendar import monthrange
+
+from django.utils import timezone
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.parsers import MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.openapi import AutoSchema
-
+from drf_spectacular.utils import extend_schema
+
+from common.cache import PublicCacheMixin
+from common.conditional import ConditionalGetMixin
+from common.facets import FacetMixin
+from common.fieldsets import SparseFieldsetMixin
+from common.values import ValuesListMixin
+from common.importing import decode_lines, detect_format, read_rows
+from common.mixins import EagerLoadingMixin
 from common.permissions import IsOwnerOrReadOnly
 
-from .models import Tour, TourCategory, Location, Booking, Review, Favorite
-from .serializers import TourSerializer, TourCategorySerializer, LocationSerializer, BookingSerializer, ReviewSerializer, FavoriteSerializer
+from .filters import TourFilter, BookingFilter
+from .geo import TourProximityFilter
+from .importer import TourImporter
+from .search import TourSearchFilter
+
+from .models import Tour, TourCategory, Location, Booking, Review, Favorite, TourInventory
+from .serializers import TourSerializer, TourCategorySerializer, LocationSerializer, BookingSerializer, CheckoutSerializer, ReviewSerializer, FavoriteSerializer
 
 class TourCategoryViewSet(viewsets.ModelViewSet):
     queryset = TourCategory.objects.all()
@@ -20,6 +39,7 @@ class TourCategoryViewSet(viewsets.ModelViewSet):
     filterset_fields = ['id', 'name']
     search_fields = ['name']
     ordering_fields = ['id', 'name']
+    pagination_class = None
 
     
 class LocationViewSet(viewsets.ModelViewSet):
@@ -32,47 +52,125 @@ class LocationViewSet(viewsets.ModelViewSet):
     filterset_fields = ['id', 'country', 'city']
     search_fields = ['country', 'city']
     ordering_fields = ['id', 'country', 'city']
+    pagination_class = None
 
 
-class TourViewSet(viewsets.ModelViewSet):
+class TourViewSet(ValuesListMixin, SparseFieldsetMixin, ConditionalGetMixin, FacetMixin, PublicCacheMixin, viewsets.ModelViewSet):
     serializer_class = TourSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     schema = AutoSchema()
     
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = [
-    'id', 'category', 'location', 'guide', 'price', 'duration', 'start_datetime',
-    'end_datetime', 'max_people', 'available_slots', 'is_active', 'created_at'
-    ]
-    search_fields = [
-        'title', 'description', 'location__city', 'location__country', 'category__name', 'guide__first_name'
-    ]
-    ordering_fields = [
-        'id', 'price', 'duration', 'start_datetime', 'end_datetime',
-        'max_people', 'available_slots', 'created_at'
-    ]
+    filter_backends = [DjangoFilterBackend, TourSearchFilter, TourProximityFilter, OrderingFilter]
+    filterset_class = TourFilter
+    cache_models = [Tour, TourCategory, Location, Booking, Review]
+    calendar_max_tours = 50
+    facet_ignored_params = (*FacetMixin.facet_ignored_params, 'fields', 'omit')
+    facet_groups = {
+        'category': {'id': 'category_id', 'name': 'category__name'},
+        'location': {'id': 'location_id', 'country': 'location__country', 'city': 'location__city'},
+    }
+    facet_ranges = {
+        'price': ('price', [50, 100, 200, 500]),
+        'duration': ('duration', [datetime.timedelta(hours=hours) for hours in (2, 4, 8, 24)]),
+    }
+
+    @property
+    def ordering_fields(self):
+        fields = [
+            'id', 'price', 'duration', 'start_datetime', 'end_datetime',
+            'max_people', 'created_at', 'avg_rating', 'review_count'
+        ]
+        # distance аннотирует только фильтр ?near=
+        request = getattr(self, 'request', None)
+        if request and request.query_params.get(TourProximityFilter.near_param):
+            fields.append('distance')
+        return fields
+
+    @property
+    def ordering(self):
+        # При поиске по умолчанию сортируем по релевантности, рядом с точкой — по расстоянию
+        request = getattr(self, 'request', None)
+        if request and request.query_params.get(TourSearchFilter.search_param):
+            return ['-search_rank']
+        if request and request.query_params.get(TourProximityFilter.near_param):
+            return ['distance']
+        # Диапазон по индексированному полю задает сортировку по тому же индексу
+        field = request and TourFilter.get_range_field(request.query_params)
+        if field and field != 'created_at':
+            return [field]
+        return ['-created_at']
     
     def get_queryset(self):
-        queryset = Tour.objects.filter(is_active=True)
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category__name=category)
-        return queryset
+        return Tour.objects.filter(is_active=True)
 
     def perform_create(self, serializer):
         serializer.save(guide=self.request.user)
 
-
-class BookingViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_tours(self, request):
+        """Массовый импорт туров текущего гида из CSV/JSONL-файла (поле file)"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Файл не передан."}, status=400)
+        fmt = detect_format(upload.name, request.data.get('format'))
+        if fmt is None:
+            return Response({"detail": "Поддерживаются файлы CSV и JSONL."}, status=400)
+        report = TourImporter(request.user).run(read_rows(decode_lines(upload), fmt))
+        return Response(report, status=201 if report['created'] else 400)
+
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        """Свободные места тура по дням месяца (?month=ГГГГ-ММ, по умолчанию текущий)"""
+        return self.cached_response(self.tour_calendar, request)
+
+    @extend_schema(operation_id='tour_list_calendars')
+    @action(detail=False, methods=['get'], url_path='calendar')
+    def calendars(self, request):
+        """Свободные места нескольких туров по дням месяца (?tours=1,2,3&month=ГГГГ-ММ)"""
+        return self.cached_response(self.tours_calendar, request)
+
+    def tour_calendar(self, request):
+        first, last = self.get_month(request)
+        tour = self.get_object()
+        days = TourInventory.objects.calendar([tour], first, last)[tour.pk]
+        return Response({'tour': tour.pk, 'month': first.strftime('%Y-%m'), 'days': days})
+
+    def tours_calendar(self, request):
+        first, last = self.get_month(request)
+        try:
+            ids = {int(value) for value in request.query_params.get('tours', '').split(',') if value}
+        except ValueError:
+            raise ValidationError({'tours': ["Ожидается список id через запятую."]})
+        if not 0 < len(ids) <= self.calendar_max_tours:
+            raise ValidationError({'tours': [f"Укажите от 1 до {self.calendar_max_tours} туров."]})
+        tours = list(Tour.objects.filter(is_active=True, pk__in=ids).only('id', 'max_people').order_by('id'))
+        calendars = TourInventory.objects.calendar(tours, first, last)
+        return Response({'month': first.strftime('%Y-%m'), 'tours': {str(pk): days for pk, days in calendars.items()}})
+
+    @staticmethod
+    def get_month(request):
+        value = request.query_params.get('month')
+        if value:
+            try:
+                first = datetime.date.fromisoformat(f'{value}-01')
+            except ValueError:
+                raise ValidationError({'month': ["Ожидается month=ГГГГ-ММ."]})
+        else:
+            first = timezone.localdate().replace(day=1)
+        return first, first.replace(day=monthrange(first.year, first.month)[1])
+
+
+class BookingViewSet(ValuesListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated] 
     schema = AutoSchema()
     
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['id', 'tour', 'booking_date', 'status', 'created_at']
+    filterset_class = BookingFilter
     search_fields = ['tour__title', 'status']
     ordering_fields = ['booking_date', 'created_at']
+    ordering = ['-created_at']
 
 
     def perform_create(self, serializer):
@@ -99,20 +197,29 @@ class BookingViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
         booking = self.get_object()
-        if booking.status == 'confirmed':
-            return Response({"detail": "Это бронирование уже подтверждено."}, status=400)
-        booking.confirm_booking()
+        if not booking.confirm_booking():
+            if booking.status == 'confirmed':
+                return Response({"detail": "Это бронирование уже подтверждено."}, status=400)
+            return Response({"detail": "Недостаточно мест на выбранную дату."}, status=400)
         return Response({"detail": "Бронирование подтверждено."})
 
+    @action(detail=False, methods=['post'], serializer_class=CheckoutSerializer)
+    def checkout(self, request):
+        """Оформляет несколько бронирований одним запросом и одной транзакцией"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save(user=request.user)
+        data = BookingSerializer(bookings, many=True, context=self.get_serializer_context()).data
+        return Response({"results": data}, status=201)
+
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         booking = self.get_object()
-        if booking.status == 'cancelled':
+        if not booking.cancel_booking():
             return Response({"detail": "Это бронирование уже отменено."}, status=400)
-        booking.cancel_booking()
         return Response({"detail": "Бронирование отменено."})   
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsOwnerOrReadOnly]
@@ -122,13 +229,14 @@ class ReviewViewSet(viewsets.ModelViewSet):
     filterset_fields = ['id', 'tour', 'rating', 'created_at']
     search_fields = ['tour__title']
     ordering_fields = ['rating', 'created_at']
+    ordering = ['-created_at']
 
 
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
     schema = AutoSchema()
@@ -137,6 +245,7 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     filterset_fields = ['id', 'tour', 'added_at']
     search_fields = ['tour__title']
     ordering_fields = ['added_at']
+    ordering = ['-added_at']
 
     def get_queryset(self):
         return Favorite.objects.filter(user=self.request.user)
\ No newline at end of file
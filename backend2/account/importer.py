@@ -0,0 +1,174 @@
+import contextlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework import serializers
+
+from .authentication import user_cache
+from .models import User
+from .serializers import UserImportSerializer
+
+DUPLICATE_MODES = ('skip', 'merge')
+STATS = ('rows', 'created', 'updated', 'skipped', 'errors')
+
+
+def load_checkpoint(path):
+    """Счетчики прерванного переноса или None, если начинать сначала"""
+    try:
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, stats):
+    # Запись через временный файл: прерывание не оставит битый checkpoint
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as checkpoint:
+        json.dump(stats, checkpoint)
+    os.replace(f'{path}.tmp', path)
+
+
+class UserImporter:
+    """
+    Перенос пользователей пакетами bulk_create. Email нормализуется как в
+    create_user и служит ключом: существующие пользователи пропускаются
+    или дополняются (merge). Готовые хеши сохраняются как есть, открытые
+    пароли хешируются в пуле процессов.
+
+    После каждого пакета вызывается progress(stats, errors); stats['rows'] —
+    номер последней обработанной строки, с него можно продолжить перенос.
+    """
+
+    def __init__(self, batch_size=1000, on_duplicate='skip', workers=None, progress=None):
+        self.batch_size = batch_size
+        self.on_duplicate = on_duplicate
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.progress = progress
+        self.stats = dict.fromkeys(STATS, 0)
+        self.errors = []
+        self.pool = None
+
+    def run(self, rows, resume=None):
+        if resume:
+            self.stats.update({key: resume[key] for key in STATS})
+        start = self.stats['rows']
+        # Один экземпляр на весь перенос: поля сериализатора копируются один раз
+        validator = UserImportSerializer()
+        batch = {}
+        with self.make_pool() as self.pool:
+            for number, row in enumerate(itertools.islice(rows, start, None), start + 1):
+                self.stats['rows'] = number
+                if isinstance(row, Exception):
+                    self.add_error(number, {'non_field_errors': [str(row)]})
+                    continue
+                if not isinstance(row, dict):
+                    self.add_error(number, {'non_field_errors': ["Ожидался объект."]})
+                    continue
+                try:
+                    data = validator.run_validation(row)
+                except serializers.ValidationError as exc:
+                    self.add_error(number, serializers.as_serializer_error(exc))
+                    continue
+                self.collect(batch, data)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = {}
+            if batch or self.errors:
+                self.flush(batch)
+        return self.stats
+
+    def make_pool(self):
+        if not self.workers:
+            return contextlib.nullcontext()
+        # django.setup нужен дочерним процессам при запуске через spawn (Windows)
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+
+    def add_error(self, number, errors):
+        self.stats['errors'] += 1
+        self.errors.append({'row': number, 'errors': errors})
+
+    def collect(self, batch, data):
+        """Повтор email внутри пакета: skip оставляет первую строку, merge дополняет ее"""
+        email = data.pop('email')
+        if email not in batch:
+            batch[email] = data
+        elif self.on_duplicate == 'merge':
+            if 'password' in data or 'password_hash' in data:
+                batch[email].pop('password', None)
+                batch[email].pop('password_hash', None)
+            batch[email].update(data)
+        else:
+            self.stats['skipped'] += 1
+
+    def flush(self, batch):
+        if self.on_duplicate == 'merge':
+            existing = User.objects.in_bulk(list(batch), field_name='email')
+        else:
+            existing = set(User.objects.filter(email__in=list(batch)).values_list('email', flat=True))
+
+        new, merged = [], []
+        for email, data in batch.items():
+            if email not in existing:
+                new.append((email, data))
+            elif self.on_duplicate == 'merge':
+                merged.append((existing[email], data))
+            else:
+                self.stats['skipped'] += 1
+        self.hash_passwords([data for _, data in new] + [data for _, data in merged])
+
+        users = [User(email=email, **{'password': make_password(None), **data}) for email, data in new]
+        fields = set()
+        for user, data in merged:
+            for field, value in data.items():
+                setattr(user, field, value)
+            fields.update(data)
+
+        with transaction.atomic():
+            # ignore_conflicts: строку, добавленную параллельно, просто пропускаем
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            created = self.count_created(users)
+            if merged:
+                User.objects.bulk_update([user for user, _ in merged], sorted(fields))
+        # bulk_update не отправляет post_save
+        for user, _ in merged:
+            user_cache.forget(user.pk)
+
+        self.stats['created'] += created
+        self.stats['skipped'] += len(users) - created
+        self.stats['updated'] += len(merged)
+        if self.progress is not None:
+            self.progress(dict(self.stats), self.errors)
+        self.errors = []
+
+    def count_created(self, users):
+        """
+        Сколько строк bulk_create действительно вставил. Пропущенную строку
+        выдает чужой пароль: у наших он с солью или случайный make_password(None).
+        """
+        if not users:
+            return 0
+        stored = dict(User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'password'))
+        return sum(stored.get(user.email) == user.password for user in users)
+
+    def hash_passwords(self, rows):
+        """Готовый хеш переносится в password, открытый пароль хешируется"""
+        raw = []
+        for data in rows:
+            if 'password_hash' in data:
+                data['password'] = data.pop('password_hash')
+            elif 'password' in data:
+                raw.append(data)
+        if not raw:
+            return
+        passwords = [data['password'] for data in raw]
+        if self.pool is None:
+            hashes = map(make_password, passwords)
+        else:
+            hashes = self.pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (self.workers * 4)))
+        for data, encoded in zip(raw, hashes):
+            data['password'] = encoded
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+
+from account.hashers import THREAD_NAME_PREFIX, TunedArgon2PasswordHasher
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = "Сколько проверок пароля (входов) в секунду выдерживает ядро при разных настройках хеширования"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help="Длительность замера одного варианта")
+        parser.add_argument('--time-cost', type=int, help="Проверить argon2 с этим time_cost")
+        parser.add_argument('--memory-cost', type=int, help="Проверить argon2 с этим memory_cost, КиБ")
+        parser.add_argument('--parallelism', type=int, help="Проверить argon2 с этим parallelism")
+        parser.add_argument('--workers', type=int, help="Потоков пула; по умолчанию PASSWORD_HASH_WORKERS")
+
+    def handle(self, *args, **options):
+        tuned = TunedArgon2PasswordHasher()
+        candidates = [
+            ("PBKDF2, Django по умолчанию", PBKDF2PasswordHasher()),
+            ("argon2, Django по умолчанию", Argon2PasswordHasher()),
+            ("argon2, ARGON2_PARAMS", tuned),
+        ]
+        overrides = {
+            name: options[name] for name in ('time_cost', 'memory_cost', 'parallelism')
+            if options[name] is not None
+        }
+        if overrides:
+            custom = TunedArgon2PasswordHasher()
+            for name, value in overrides.items():
+                setattr(custom, name, value)
+            candidates.append(("argon2, параметры из командной строки", custom))
+
+        for label, hasher in candidates:
+            rate = self.measure(hasher, options['seconds'])
+            self.stdout.write(f"{label} ({self.describe(hasher)}): {rate:.1f} входов/с на ядро")
+
+        workers = options['workers'] or getattr(settings, 'PASSWORD_HASH_WORKERS', None) or 1
+        rate = self.measure(tuned, options['seconds'], workers)
+        self.stdout.write(self.style.SUCCESS(
+            f"argon2, ARGON2_PARAMS в пуле из {workers} потоков: {rate:.1f} входов/с"
+        ))
+
+    @staticmethod
+    def describe(hasher):
+        if isinstance(hasher, Argon2PasswordHasher):
+            return f"time_cost={hasher.time_cost}, memory_cost={hasher.memory_cost}, parallelism={hasher.parallelism}"
+        return f"iterations={hasher.iterations}"
+
+    @staticmethod
+    def measure(hasher, seconds, workers=1):
+        def verify_for(deadline):
+            count = 0
+            while time.perf_counter() < deadline:
+                hasher.verify(PASSWORD, encoded)
+                count += 1
+            return count
+
+        # Потоки замера считаются потоками пула хеширования: хеши считаются
+        # в них, а не в общем пуле, ограниченном PASSWORD_HASH_WORKERS
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=THREAD_NAME_PREFIX) as pool:
+            encoded = pool.submit(hasher.encode, PASSWORD, hasher.salt()).result()
+            started = time.perf_counter()
+            total = sum(pool.map(verify_for, [started + seconds] * workers))
+        return total / (time.perf_counter() - started)
@@ -24,3 +24,21 @@ class User(AbstractUser):
     
     def __str__(self):
         return self.email
+
+
+class ClaimsUser(User):
+    """
+    Пользователь, собранный из claims JWT (account.authentication.build_user).
+    Значения полей могут отставать от БД на CLAIMS_MAX_AGE, а остальные поля
+    отложены, поэтому сохранить или удалить его нельзя: для записи нужна
+    строка из БД, User.objects.get(pk=user.pk).
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise ValueError("Пользователь из claims токена только для чтения")
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Пользователь из claims токена только для чтения")
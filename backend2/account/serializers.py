@@ -1,6 +1,7 @@
+from django.contrib.auth.hashers import identify_hasher
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import ClaimsRefreshToken
 from .models import User
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -35,7 +36,7 @@ class LoginSerializer(serializers.Serializer):
             user = authenticate(email=email, password=password)
             if user:
                 if user.is_active:
-                    refresh = RefreshToken.for_user(user)
+                    refresh = ClaimsRefreshToken.for_user(user)
                     return {
                         'user_id': user.id,
                         'email': user.email,
@@ -50,3 +51,30 @@ class LoginSerializer(serializers.Serializer):
                 raise serializers.ValidationError('Неверные учетные данные')
         else:
             raise serializers.ValidationError('Необходимо указать email и пароль')
+
+
+class UserImportSerializer(serializers.Serializer):
+    """Строка переноса пользователей: открытый пароль или готовый хеш"""
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=30, required=False)
+    last_name = serializers.CharField(max_length=30, required=False)
+    phone = serializers.CharField(max_length=20, required=False)
+    is_active = serializers.BooleanField(required=False)
+    password = serializers.CharField(required=False, trim_whitespace=False)
+    password_hash = serializers.CharField(required=False)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_password_hash(self, value):
+        # Хеш должен разбираться одним из PASSWORD_HASHERS
+        try:
+            identify_hasher(value).decode(value)
+        except ValueError:
+            raise serializers.ValidationError("Неподдерживаемый формат хеша пароля.")
+        return value
+
+    def validate(self, data):
+        if 'password' in data and 'password_hash' in data:
+            raise serializers.ValidationError("Укажите либо password, либо password_hash.")
+        return data
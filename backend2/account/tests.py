@@ -1,3 +1,240 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import Argon2PasswordHasher, make_password
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CLAIMS_ISSUED_AT, CLAIMS_MAX_AGE, ClaimsRefreshToken, build_user, user_cache
+from .hashers import THREAD_NAME_PREFIX
+from .importer import UserImporter, save_checkpoint
+from .models import User
+from .views import LoginView, RegisterView
+
+
+class PasswordHashingTests(TestCase):
+    """Вход и регистрация через пул хеширования, пересчет старых хешей"""
+
+    def test_hashing_runs_in_pool(self):
+        self.assertIs(resolve('/api/auth/login/').func.view_class, LoginView)
+        self.assertIs(resolve('/api/auth/register/').func.view_class, RegisterView)
+
+        threads = []
+        verify = Argon2PasswordHasher.verify
+
+        def record(hasher, password, encoded):
+            threads.append(threading.current_thread().name)
+            return verify(hasher, password, encoded)
+
+        User.objects.create_user('user@example.com', 'secret-pass', first_name='Иван', last_name='Тестов')
+        with mock.patch.object(Argon2PasswordHasher, 'verify', record):
+            response = self.client.post('/api/auth/login/', {'email': 'user@example.com', 'password': 'secret-pass'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith(THREAD_NAME_PREFIX), threads)
+
+    def test_bench_uses_own_threads(self):
+        stdout = StringIO()
+        with mock.patch('account.hashers._executor') as executor:
+            call_command('bench_login', seconds=0.01, workers=3, stdout=stdout)
+        executor.submit.assert_not_called()
+        self.assertIn('в пуле из 3 потоков', stdout.getvalue())
+
+    def test_login_upgrades_hash(self):
+        with self.settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher']):
+            user = User.objects.create_user('old@example.com', 'secret-pass', first_name='Иван', last_name='Тестов')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        response = self.client.post('/api/auth/login/', {'email': 'old@example.com', 'password': 'secret-pass'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$v=19$m=19456,t=2,p=1$'))
+        self.assertTrue(user.check_password('secret-pass'))
+
+    def test_login_errors(self):
+        User.objects.create_user('user@example.com', 'secret-pass', first_name='Иван', last_name='Тестов')
+        for payload in ({'email': 'user@example.com', 'password': 'wrong'}, {'email': 'nobody@example.com', 'password': 'x'}):
+            response = self.client.post('/api/auth/login/', payload, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Неверные учетные данные']})
+        response = self.client.post('/api/auth/login/', {'email': 'user'}, content_type='application/json')
+        self.assertEqual(set(response.json()), {'email', 'password'})
+
+    def test_register(self):
+        payload = {'email': 'new@example.com', 'password': 'secret-pass', 'password_confirm': 'secret-pass',
+                   'first_name': 'Иван', 'last_name': 'Тестов'}
+        response = self.client.post('/api/auth/register/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['email'], 'new@example.com')
+        self.assertTrue(User.objects.get(email='new@example.com').check_password('secret-pass'))
+
+        response = self.client.post('/api/auth/register/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+
+class UserImportTests(TestCase):
+    """Перенос пользователей: готовые хеши, дубликаты email, продолжение"""
+
+    def setUp(self):
+        self.feed = tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False)
+        self.addCleanup(os.remove, self.feed.name)
+
+    def run_import(self, rows, **options):
+        with open(self.feed.name, 'w', encoding='utf-8') as feed:
+            for row in rows:
+                feed.write((row if isinstance(row, str) else json.dumps(row)) + '\n')
+        stdout, stderr = StringIO(), StringIO()
+        options = {'batch_size': 2, 'workers': 0, **options}
+        call_command('import_users', self.feed.name, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import(self):
+        User.objects.create_user('old@example.com', 'old-pass', first_name='Старый', last_name='Клиент')
+        legacy_hash = make_password('legacy-pass', hasher='pbkdf2_sha256')
+        stdout, stderr = self.run_import([
+            {'email': 'Anna@Example.COM', 'password_hash': legacy_hash, 'first_name': 'Анна'},
+            {'email': 'boris@example.com', 'password': 'plain-pass', 'last_name': 'Борисов'},
+            {'email': 'Anna@example.com', 'password': 'other'},
+            {'email': 'old@example.com', 'first_name': 'Новый'},
+            {'email': 'bad@example.com', 'password_hash': 'md5$broken'},
+            '{"email": ',
+            {'email': 'nopass@example.com'},
+        ])
+        self.assertIn('Строк: 7, создано: 3, обновлено: 0, пропущено: 2, ошибок: 2', stdout)
+        self.assertIn('Строка 5', stderr)
+        self.assertIn('Строка 6', stderr)
+
+        anna = User.objects.get(email='Anna@example.com')
+        self.assertEqual((anna.first_name, anna.password), ('Анна', legacy_hash))
+        self.assertTrue(anna.check_password('legacy-pass'))
+        self.assertTrue(User.objects.get(email='boris@example.com').check_password('plain-pass'))
+        self.assertFalse(User.objects.get(email='nopass@example.com').has_usable_password())
+        self.assertEqual(User.objects.get(email='old@example.com').first_name, 'Старый')
+        self.assertFalse(os.path.exists(f'{self.feed.name}.progress'))
+
+    def test_merge(self):
+        user = User.objects.create_user('old@example.com', 'old-pass', first_name='Старый', last_name='Клиент')
+        stdout, _ = self.run_import([
+            {'email': 'old@example.com', 'first_name': 'Новый'},
+            {'email': 'old@example.com', 'phone': '+996555000000'},
+        ], on_duplicate='merge')
+        self.assertIn('обновлено: 1', stdout)
+        user.refresh_from_db()
+        self.assertEqual((user.first_name, user.last_name, user.phone), ('Новый', 'Клиент', '+996555000000'))
+        self.assertTrue(user.check_password('old-pass'))
+
+    def test_resume(self):
+        legacy_hash = make_password('legacy-pass', hasher='pbkdf2_sha256')
+        rows = [{'email': f'user{i}@example.com', 'password_hash': legacy_hash} for i in range(5)]
+        save_checkpoint(f'{self.feed.name}.progress', {'rows': 2, 'created': 2, 'updated': 0, 'skipped': 0, 'errors': 0})
+        stdout, _ = self.run_import(rows)
+        self.assertIn('Продолжение со строки 3', stdout)
+        self.assertIn('Строк: 5, создано: 5', stdout)
+        self.assertEqual(
+            sorted(User.objects.values_list('email', flat=True)),
+            ['user2@example.com', 'user3@example.com', 'user4@example.com'],
+        )
+
+    def test_process_pool(self):
+        self.run_import([{'email': f'user{i}@example.com', 'password': f'pass-{i}'} for i in range(3)], workers=2)
+        self.assertTrue(User.objects.get(email='user2@example.com').check_password('pass-2'))
+
+    def test_concurrent_insert(self):
+        hash_passwords = UserImporter.hash_passwords
+
+        def insert_first(importer, rows):
+            # Строку вставляет параллельный процесс между проверкой и bulk_create
+            User.objects.get_or_create(email='user0@example.com')
+            return hash_passwords(importer, rows)
+
+        with mock.patch.object(UserImporter, 'hash_passwords', insert_first):
+            stdout, _ = self.run_import([{'email': f'user{i}@example.com', 'password': f'pass-{i}'} for i in range(3)])
+        self.assertIn('Строк: 3, создано: 2, обновлено: 0, пропущено: 1', stdout)
+        self.assertFalse(User.objects.get(email='user0@example.com').check_password('pass-0'))
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """Аутентификация по claims токена без SELECT пользователя"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов', )
+
+    def setUp(self):
+        user_cache.rows.clear()
+        user_cache.revoked.clear()
+
+    def get(self, token, url='/api/tour/bookings/'):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        user_queries = [query for query in queries if 'FROM "account_user"' in query['sql']]
+        return response, user_queries
+
+    def test_fresh_claims(self):
+        response, user_queries = self.get(ClaimsRefreshToken.for_user(self.user).access_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+
+    def test_claims_user(self):
+        user = build_user({'id': self.user.pk, 'email': 'user@example.com',
+                           'is_staff': False, 'is_superuser': True, 'is_active': True})
+        self.assertEqual(
+            (user.pk, user.email, user.is_staff, user.is_superuser),
+            (self.user.pk, 'user@example.com', False, True),
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, 'Иван')
+
+        # Claims могут отставать от БД: записать их обратно нельзя
+        for write in (user.save, user.delete):
+            with self.assertRaises(ValueError):
+                write()
+        self.assertEqual(user, self.user)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_superuser)
+
+    def test_deactivation_revokes_claims(self):
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get(token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_stale_claims_use_cache(self):
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        token[CLAIMS_ISSUED_AT] = time.time() - CLAIMS_MAX_AGE - 1
+        response, user_queries = self.get(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_queries), 1)
+        response, user_queries = self.get(token)
+        self.assertEqual(user_queries, [])
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with mock.patch('account.authentication.time.monotonic', return_value=time.monotonic() + user_cache.ttl + 1):
+            response, _ = self.get(token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_plain_token(self):
+        # Токены, выданные до появления claims, проверяются по строке пользователя
+        response, user_queries = self.get(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_queries), 1)
 
-# Create your tests here.
+    def test_login_issues_claims(self):
+        response = APIClient().post('/api/auth/login/', {'email': 'user@example.com', 'password': 'pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response, user_queries = self.get(response.json()['access'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
@@ -0,0 +1,114 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+
+CACHE_PREFIX = 'catalog'
+
+
+def version_key(model):
+    return f'{CACHE_PREFIX}:version:{model._meta.label_lower}'
+
+
+def get_versions(models):
+    """
+    Текущие версии моделей одним запросом к кэшу. Вытесненная версия
+    заменяется новой уникальной, чтобы не вернуть устаревшие записи.
+    """
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(models):
+    """get_versions для async-представлений: обращения к кэшу не блокируют цикл событий"""
+    keys = [version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """Инвалидирует все закэшированные ответы, зависящие от модели"""
+    key = version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def normalize_query(query_params):
+    """Параметры запроса в каноническом виде: без пустых значений, отсортированные"""
+    items = []
+    for name, values in sorted(query_params.lists()):
+        values = sorted(value for value in values if value != '')
+        if values:
+            items.append(f'{name}={",".join(values)}')
+    return '&'.join(items)
+
+
+class PublicCacheMixin:
+    """
+    Общий кэш ответов list/retrieve для анонимных GET-запросов.
+    Ключ строится из пути, нормализованных параметров и версий моделей
+    из cache_models; сигналы post_save/post_delete повышают версии.
+
+    Ответы с Authorization в кэш не попадают и из него не берутся, поэтому
+    list/retrieve отдают Vary: Authorization для кэшей за приложением.
+    """
+    cache_models = ()
+    cache_timeout = 60
+    vary_headers = ('Authorization',)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.action in ('list', 'retrieve'):
+            patch_vary_headers(response, self.vary_headers)
+        return response
+
+    def is_cacheable(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and 'HTTP_AUTHORIZATION' not in request.META
+            and not request.user.is_authenticated
+        )
+
+    def get_cache_key(self, request):
+        return self.make_cache_key(request, get_versions(self.cache_models))
+
+    async def aget_cache_key(self, request):
+        return self.make_cache_key(request, await aget_versions(self.cache_models))
+
+    def make_cache_key(self, request, versions):
+        versions = ':'.join(str(version) for version in versions)
+        raw = f'{request.get_host()}|{request.path}|{normalize_query(request.query_params)}|{versions}'
+        return f'{CACHE_PREFIX}:response:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
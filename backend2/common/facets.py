@@ -0,0 +1,96 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.duration import duration_string
+
+from .cache import CACHE_PREFIX, aget_versions, get_versions, normalize_query
+
+
+class FacetMixin:
+    """
+    ?facets=1 добавляет к странице списка счетчики по текущему фильтру.
+    facet_groups — имя -> {ключ ответа: поле}, по одному GROUP BY на группу;
+    facet_ranges — имя -> (поле, границы), все диапазоны одним запросом
+    с условными COUNT. Счетчики кэшируются по нормализованным параметрам
+    фильтра (без курсора и сортировки) и версиям cache_models.
+    """
+    facets_param = 'facets'
+    facet_groups = {}
+    facet_ranges = {}
+    facet_timeout = 60
+    # Параметры, которые не меняют набор строк
+    facet_ignored_params = ('cursor', 'page_size', 'ordering', 'format')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response.data, dict) and self.wants_facets(request):
+            key = self.get_facets_key(request)
+            facets = cache.get(key)
+            if facets is None:
+                facets = self.count_facets(self.filter_queryset(self.get_queryset()))
+                cache.set(key, facets, self.facet_timeout)
+            response.data['facets'] = facets
+        return response
+
+    def wants_facets(self, request):
+        return request.query_params.get(self.facets_param) in ('1', 'true')
+
+    def get_facets_key(self, request):
+        return self.make_facets_key(request, get_versions(self.cache_models))
+
+    async def aget_facets_key(self, request):
+        return self.make_facets_key(request, await aget_versions(self.cache_models))
+
+    def make_facets_key(self, request, versions):
+        params = request.query_params.copy()
+        for name in (self.facets_param, *self.facet_ignored_params):
+            params.pop(name, None)
+        versions = ':'.join(str(version) for version in versions)
+        raw = f'{request.path}|{normalize_query(params)}|{versions}'
+        return f'{CACHE_PREFIX}:facets:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+    def get_group_queries(self, queryset):
+        queryset = queryset.order_by().prefetch_related(None)
+        return {
+            name: queryset.values(*fields.values()).annotate(count=Count('pk')).order_by('-count', *fields.values())
+            for name, fields in self.facet_groups.items()
+        }
+
+    def get_range_aggregates(self):
+        aggregates = {}
+        for name, (field, bounds) in self.facet_ranges.items():
+            for index, (low, high) in enumerate(zip([None, *bounds], [*bounds, None])):
+                condition = Q()
+                if low is not None:
+                    condition &= Q(**{f'{field}__gte': low})
+                if high is not None:
+                    condition &= Q(**{f'{field}__lt': high})
+                aggregates[f'{name}_{index}'] = Count('pk', filter=condition)
+        return aggregates
+
+    def build_facets(self, groups, ranges):
+        facets = {
+            name: [{key: row[field] for key, field in self.facet_groups[name].items()} | {'count': row['count']} for row in rows]
+            for name, rows in groups.items()
+        }
+        for name, (field, bounds) in self.facet_ranges.items():
+            edges = [_bound(value) for value in (None, *bounds, None)]
+            facets[name] = [
+                {'min': low, 'max': high, 'count': ranges[f'{name}_{index}']}
+                for index, (low, high) in enumerate(zip(edges, edges[1:]))
+            ]
+        return facets
+
+    def count_facets(self, queryset):
+        groups = {name: list(query) for name, query in self.get_group_queries(queryset).items()}
+        return self.build_facets(groups, queryset.order_by().aggregate(**self.get_range_aggregates()))
+
+    async def acount_facets(self, queryset):
+        groups = {name: [row async for row in query] for name, query in self.get_group_queries(queryset).items()}
+        return self.build_facets(groups, await queryset.order_by().aaggregate(**self.get_range_aggregates()))
+
+
+def _bound(value):
+    # Границы длительности отдаются в формате DurationField сериализатора
+    return duration_string(value) if hasattr(value, 'total_seconds') else value
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -80,16 +81,33 @@ DATABASES = {
     }
 }
 
+# Cache
+# Для нескольких воркеров используйте общий бэкенд, например
+# django.core.cache.backends.redis.RedisCache или FileBasedCache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nomado',
+    }
+}
+
 #REST
 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        'rest_framework.renderers.JSONRenderer',
+        'common.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'common.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'common.pagination.KeysetPagination',
     'DATETIME_FORMAT': "%Y-%m-%dT%H:%M:%S.%fZ",
     'DEFAULT_TIME_ZONE': 'Asia/Bishkek',
 }
@@ -161,6 +179,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Хеширование паролей: argon2id с параметрами ARGON2_PARAMS (замер: manage.py bench_login).
+# Хеши PBKDF2 проверяются и пересчитываются в argon2 при следующем входе.
+PASSWORD_HASHERS = [
+    'account.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+ARGON2_PARAMS = {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}
+# Потоков пула хеширования: больше хешей одновременно не считается
+PASSWORD_HASH_WORKERS = os.cpu_count() or 1
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -0,0 +1,17 @@
+import django_filters
+
+from .models import Tour
+
+
+class TourFilter(django_filters.FilterSet):
+    """
+    Фильтры туров, включая аннотированное количество свободных мест.
+    Категория фильтруется по id без проверочного запроса к БД, поэтому
+    фильтр строится и в асинхронном представлении.
+    """
+    category = django_filters.NumberFilter(field_name='category_id')
+    min_slots = django_filters.NumberFilter(field_name='available_slots', lookup_expr='gte')
+
+    class Meta:
+        model = Tour
+        fields = ['category', 'city', 'country', 'price']
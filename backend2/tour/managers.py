@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class TourQuerySet(models.QuerySet):
+    def with_available_slots(self):
+        """Аннотирует туры количеством свободных мест без подзапросов к бронированиям"""
+        return self.annotate(
+            available_slots=models.F('max_people') - models.F('booked_seats')
+        )
+
+    def claim_seats(self, pk, count):
+        """Занимает места одним условным UPDATE; False, если мест не хватает"""
+        claimed = self.filter(
+            pk=pk,
+            is_active=True,
+            booked_seats__lte=models.F('max_people') - count,
+        ).update(booked_seats=models.F('booked_seats') + count)
+        return claimed == 1
+
+    def release_seats(self, pk, count):
+        """Возвращает места тура в продажу"""
+        self.filter(pk=pk).update(booked_seats=models.F('booked_seats') - count)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+def fill_booked_seats(apps, schema_editor):
+    Tour = apps.get_model('tour', 'Tour')
+    Booking = apps.get_model('tour', 'Booking')
+    totals = (
+        Booking.objects.filter(status='confirmed')
+        .values('tour_id')
+        .annotate(total=models.Sum('people_count'))
+    )
+    for row in totals:
+        Tour.objects.filter(pk=row['tour_id']).update(booked_seats=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour', '0002_alter_booking_options_alter_tour_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='booked_seats',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Забронировано мест'),
+        ),
+        migrations.RunPython(fill_booked_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+def recount_booked_seats(apps, schema_editor):
+    Tour = apps.get_model('tour', 'Tour')
+    Booking = apps.get_model('tour', 'Booking')
+    Tour.objects.update(booked_seats=0)
+    totals = (
+        Booking.objects.exclude(status='cancelled')
+        .values('tour_id')
+        .annotate(total=models.Sum('people_count'))
+    )
+    for row in totals:
+        Tour.objects.filter(pk=row['tour_id']).update(booked_seats=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour', '0003_tour_booked_seats'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_booked_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tour', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['country', 'city'], name='tour_active_city_idx'),
+        ),
+    ]
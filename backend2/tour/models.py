@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import transaction
+
+from common.cache import bump_version
+
+from .managers import TourQuerySet
 
 User = get_user_model()
 
@@ -33,13 +38,28 @@ class Tour(models.Model):
     start_date = models.DateField('Дата начала')
     end_date = models.DateField('Дата окончания')
     max_people = models.PositiveIntegerField('Максимум людей', default=10)
+    booked_seats = models.PositiveIntegerField('Забронировано мест', default=0, editable=False)
     is_active = models.BooleanField('Активен', default=True)
     created_at = models.DateTimeField('Создан', auto_now_add=True)
+
+    objects = TourQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Тур'
         verbose_name_plural = 'Туры'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True), name='tour_active_created_idx'),
+            models.Index(fields=['start_date', 'id'], condition=models.Q(is_active=True), name='tour_active_start_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True), name='tour_active_price_idx'),
+            # Счетчики городов (?facets=1) группируются по этому индексу
+            models.Index(fields=['country', 'city'], condition=models.Q(is_active=True), name='tour_active_city_idx'),
+            models.Index(
+                models.F('max_people') - models.F('booked_seats'), 'id',
+                condition=models.Q(is_active=True),
+                name='tour_active_slots_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -82,6 +102,11 @@ class Booking(models.Model):
         verbose_name = 'Бронирование'
         verbose_name_plural = 'Бронирования'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            models.Index(fields=['tour', 'status'], name='booking_tour_status_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         """Автоматический расчет общей стоимости при сохранении"""
@@ -91,3 +116,40 @@ class Booking(models.Model):
     
     def __str__(self):
         return f'{self.user.get_full_name()} - {self.tour.title}'
+
+    # Статус меняется условным UPDATE по строке в БД, а не по загруженному
+    # экземпляру: из двух параллельных запросов переход выполнит один.
+    # После UPDATE строка заблокирована, места берутся из нее же
+
+    def held_seats(self):
+        return Booking.objects.filter(pk=self.pk).values_list('tour_id', 'people_count').get()
+
+    def confirm(self):
+        """
+        Подтверждение бронирования; отмененное бронирование заново занимает
+        места. False, если мест не хватает или бронирование уже подтверждено
+        (тогда status == 'confirmed').
+        """
+        bookings = Booking.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            if not bookings.filter(status='pending').update(status='confirmed'):
+                if not bookings.filter(status='cancelled').update(status='confirmed'):
+                    self.status = 'confirmed'
+                    return False
+                if not Tour.objects.claim_seats(*self.held_seats()):
+                    bookings.update(status='cancelled')
+                    self.status = 'cancelled'
+                    return False
+        bump_version(Booking)
+        self.status = 'confirmed'
+        return True
+
+    def cancel(self):
+        """Отмена бронирования с освобождением мест; False, если оно уже отменено"""
+        with transaction.atomic():
+            cancelled = Booking.objects.filter(pk=self.pk).exclude(status='cancelled').update(status='cancelled')
+            if cancelled:
+                Tour.objects.release_seats(*self.held_seats())
+                bump_version(Booking)
+        self.status = 'cancelled'
+        return bool(cancelled)
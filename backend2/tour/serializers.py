@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import transaction
 from .models import Tour, TourCategory, Booking
 
 User = get_user_model()
@@ -25,13 +25,16 @@ class TourSerializer(serializers.ModelSerializer):
             'max_people', 'available_slots', 'is_active', 'created_at'
         ]
         read_only_fields = ['created_at', 'available_slots', 'category_name']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('category')
     
     def get_available_slots(self, obj):
-        """Подсчет доступных мест"""
-        confirmed_bookings = obj.bookings.filter(status='confirmed').aggregate(
-            total=models.Sum('people_count')
-        )['total'] or 0
-        return obj.max_people - confirmed_bookings
+        """Доступные места из аннотации queryset или счетчика тура"""
+        if hasattr(obj, 'available_slots'):
+            return obj.available_slots
+        return obj.max_people - obj.booked_seats
 
 class BookingSerializer(serializers.ModelSerializer):
     """Сериализатор для бронирований"""
@@ -46,33 +49,49 @@ class BookingSerializer(serializers.ModelSerializer):
             'people_count', 'total_price', 'status', 'created_at'
         ]
         read_only_fields = ['user_name', 'tour_title', 'tour_price', 'total_price', 'created_at', 'status']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('user', 'tour')
     
     def validate(self, data):
         """Валидация бронирования"""
         tour = data['tour']
-        people_count = data['people_count']
         
         if not tour.is_active:
             raise serializers.ValidationError("Тур неактивен")
         
-        # Проверка доступных мест
-        confirmed_bookings = tour.bookings.filter(status='confirmed').aggregate(
-            total=models.Sum('people_count')
-        )['total'] or 0
-        
-        available_slots = tour.max_people - confirmed_bookings
-        
-        if people_count > available_slots:
-            raise serializers.ValidationError(
-                f"Недостаточно мест. Доступно: {available_slots}"
-            )
-        
         return data
+
+    def _sold_out(self, tour):
+        tour.refresh_from_db(fields=['max_people', 'booked_seats'])
+        available_slots = max(tour.max_people - tour.booked_seats, 0)
+        return serializers.ValidationError(
+            f"Недостаточно мест. Доступно: {available_slots}"
+        )
     
     def create(self, validated_data):
-        """Создание бронирования с автоматическим расчетом стоимости"""
+        """Создание бронирования с атомарным захватом мест и расчетом стоимости"""
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        tour = validated_data['tour']
+        with transaction.atomic():
+            if not Tour.objects.claim_seats(tour.pk, validated_data['people_count']):
+                raise self._sold_out(tour)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """Перенос занятых мест при изменении тура или количества людей"""
+        with transaction.atomic():
+            # Статус и места читаются под блокировкой строки: параллельная отмена ждет
+            current = Booking.objects.select_for_update().only('status', 'tour', 'people_count').get(pk=instance.pk)
+            if current.status != 'cancelled':
+                tour = validated_data.get('tour', instance.tour)
+                Tour.objects.release_seats(current.tour_id, current.people_count)
+                if not Tour.objects.claim_seats(tour.pk, validated_data.get('people_count', current.people_count)):
+                    raise self._sold_out(tour)
+            # save() пишет все поля: статус из экземпляра мог устареть
+            instance.status = current.status
+            return super().update(instance, validated_data)
 
 class BookingListSerializer(serializers.ModelSerializer):
     """Упрощенный сериализатор для списка бронирований"""
@@ -81,3 +100,7 @@ class BookingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ['id', 'tour_title', 'people_count', 'total_price', 'status', 'created_at']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('tour')
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from common.cache import bump_version
+
+from .models import Tour, TourCategory, Booking
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+@receiver(post_save, sender=TourCategory)
+@receiver(post_delete, sender=TourCategory)
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(pre_delete, sender=Booking)
+def release_booking_seats(sender, instance, **kwargs):
+    """Удаление бронирования, в том числе каскадом от тура или пользователя, освобождает места"""
+    instance.cancel()
@@ -1,3 +1,535 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import threading
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.urls import resolve
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from account.models import User
+from common.parsers import FastJSONParser
+from common.renderers import FastJSONRenderer
+from .models import Tour, TourCategory, Booking
+from .views import TourViewSet
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсор проходит список вперед и назад без пропусков и повторов"""
+    url = '/api/tour/tours/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        category = TourCategory.objects.create(name='Поход')
+        today = datetime.date.today()
+        for price in (300, 100, 200, 100, 100, 200, 50):
+            Tour.objects.create(
+                title=f'Тур {price}', description='Описание', category=category, city='Бишкек',
+                country='Кыргызстан', price=price, start_date=today, end_date=today,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            page = self.get(url)
+            pages.append([tour['id'] for tour in page['results']])
+            url = page[link]
+        return pages
+
+    def test_round_trip(self):
+        expected = list(Tour.objects.order_by('price', 'id').values_list('id', flat=True))
+        forward = self.walk(f'{self.url}?ordering=price&page_size=2', 'next')
+        self.assertEqual([len(page) for page in forward], [2, 2, 2, 1])
+        # Равные цены идут по id: строки с одинаковым ключом не теряются и не повторяются
+        self.assertEqual(sum(forward, []), expected)
+
+        last = self.get(f'{self.url}?ordering=price&page_size=2')
+        while last['next']:
+            last = self.get(last['next'])
+        self.assertEqual(self.walk(last['previous'], 'previous'), forward[-2::-1])
+        self.assertIsNone(self.get(f'{self.url}?ordering=price&page_size=2')['previous'])
+
+    def test_descending(self):
+        expected = list(Tour.objects.order_by('-price', '-id').values_list('id', flat=True))
+        self.assertEqual(sum(self.walk(f'{self.url}?ordering=-price&page_size=3', 'next'), []), expected)
+
+    def test_invalid_cursor(self):
+        # Не base64, не тот размер ключа, значение не того типа, нет ключа v
+        for cursor in ('not-base64', 'eyJ2IjogWzFdfQ==', 'eyJ2IjogWyJ4IiwgMV19', 'eyJ4IjogMX0='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'{self.url}?ordering=price&cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Неверный курсор'})
+
+
+@skipUnless(connection.vendor == 'sqlite', "План запроса проверяется через EXPLAIN QUERY PLAN SQLite")
+class QueryPlanTests(TestCase):
+    """Основной запрос каждого списка должен идти по индексу, без полного сканирования"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        cls.staff = User.objects.create_user('staff@example.com', 'pass', first_name='Админ', last_name='Тестов', is_staff=True)
+        category = TourCategory.objects.create(name='Поход')
+        today = datetime.date.today()
+        for i in range(30):
+            tour = Tour.objects.create(
+                title=f'Тур {i}', description='Описание', category=category, city='Бишкек',
+                country='Кыргызстан', price=100 + i, start_date=today, end_date=today, is_active=i % 3 != 0,
+            )
+            Booking.objects.create(user=cls.user, tour=tour, people_count=1)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def main_query_plan(self, url, table):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        sql, params = next(
+            (sql, params) for sql, params in statements
+            if sql.startswith('SELECT') and f'FROM "{table}"' in sql
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexed(self, url, table):
+        plan = self.main_query_plan(url, table)
+        full_scans = [step for step in plan if step.split()[:2] == ['SCAN', table] and 'INDEX' not in step]
+        self.assertFalse(full_scans, f'{url}: {plan}')
+        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], f'{url}: {plan}')
+
+    def test_tour_list(self):
+        orderings = ('-created_at', 'created_at', 'start_date', '-start_date', 'price', '-price', 'available_slots')
+        for ordering in orderings:
+            with self.subTest(ordering=ordering):
+                self.assertIndexed(f'/api/tour/tours/?ordering={ordering}', 'tour_tour')
+
+    def test_booking_list(self):
+        self.client.force_authenticate(self.user)
+        self.assertIndexed('/api/tour/bookings/', 'tour_booking')
+        self.client.force_authenticate(self.staff)
+        self.assertIndexed('/api/tour/bookings/', 'tour_booking')
+
+
+class ListQueryCountTests(TestCase):
+    """Число запросов на страницу списка не зависит от ее размера"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        today = datetime.date.today()
+        for i in range(20):
+            category = TourCategory.objects.create(name=f'Категория {i}')
+            tour = Tour.objects.create(
+                title=f'Тур {i}', description='Описание', category=category, city='Бишкек',
+                country='Кыргызстан', price=100, start_date=today, end_date=today,
+            )
+            Booking.objects.create(user=cls.user, tour=tour, people_count=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+
+    def test_constant_queries(self):
+        for url in ('/api/tour/bookings/', '/api/tour/tours/'):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(f'{url}?page_size=2'),
+                    self.count_queries(f'{url}?page_size=20'),
+                )
+
+    async def test_async_catalog(self):
+        # Анонимное чтение идет через async ORM, с Authorization — через синхронный viewset
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for url in ('/api/tour/tours/?ordering=price&page_size=5', '/api/tour/categories/'):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                expected = await sync_to_async(client.get)(url, HTTP_AUTHORIZATION='Bearer test')
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_cache_off_event_loop(self):
+        await cache.aclear()
+        on_loop = []
+
+        def off_loop(method):
+            def wrapper(cache, *args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(method.__name__)
+                except RuntimeError:
+                    pass
+                return method(cache, *args, **kwargs)
+            return wrapper
+
+        backend = type(caches['default'])
+        patches = {name: off_loop(getattr(backend, name)) for name in ('get', 'set', 'add', 'get_many')}
+        with mock.patch.multiple(backend, **patches):
+            for url in ('/api/tour/tours/', '/api/tour/tours/?facets=1', '/api/tour/tours/?facets=1'):
+                self.assertEqual((await self.async_client.get(url)).status_code, 200)
+        self.assertEqual(on_loop, [])
+
+    async def test_async_head(self):
+        view = resolve('/api/tour/tours/').func
+        get = await view(AsyncRequestFactory().get('/api/tour/tours/'))
+        head = await view(AsyncRequestFactory().head('/api/tour/tours/'))
+        self.assertEqual(head.status_code, 200)
+        self.assertEqual(head.content, b'')
+        self.assertEqual(head['Content-Length'], str(len(get.content)))
+
+    def test_booking_detail(self):
+        booking = Booking.objects.first()
+        self.assertEqual(self.count_queries(f'/api/tour/bookings/{booking.pk}/'), 1)
+
+
+class PublicCacheTests(TestCase):
+    """Общий кэш только для анонимных ответов, сброс по версиям моделей"""
+    prefix = '/api/tour/tours/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        cls.category = TourCategory.objects.create(name='Поход')
+        today = datetime.date.today()
+        cls.tour = Tour.objects.create(
+            title='Тур', description='Описание', category=cls.category, city='Бишкек',
+            country='Кыргызстан', price=100, start_date=today, end_date=today,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = f'{self.prefix}{self.tour.pk}/'
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.user)
+
+    def retitle(self, title):
+        # update() не отправляет сигналов: версия модели не меняется
+        Tour.objects.filter(pk=self.tour.pk).update(title=title)
+
+    def title(self, response):
+        self.assertEqual(response.status_code, 200)
+        return response.json()['title']
+
+    def sync_retrieve(self, user=None):
+        request = APIRequestFactory().get(self.url)
+        if user is not None:
+            force_authenticate(request, user)
+        return TourViewSet.as_view({'get': 'retrieve'})(request, pk=self.tour.pk).data['title']
+
+    def test_hit_and_version_bump(self):
+        self.assertEqual(self.title(self.client.get(self.url)), 'Тур')
+        self.retitle('Изменен')
+        self.assertEqual(self.title(self.client.get(self.url)), 'Тур')
+        # Синхронный viewset читает ту же запись кэша
+        self.assertEqual(self.sync_retrieve(), 'Тур')
+        Tour.objects.get(pk=self.tour.pk).save()
+        self.assertEqual(self.title(self.client.get(self.url)), 'Изменен')
+        self.retitle('Снова')
+        self.category.save()
+        self.assertEqual(self.title(self.client.get(self.url)), 'Снова')
+
+    def test_authenticated_bypass(self):
+        self.client.get(self.url)
+        self.retitle('Для пользователя')
+        # Ни с Authorization (синхронный viewset), ни без него ответ не берется из кэша
+        self.assertEqual(self.title(self.authenticated.get(self.url, HTTP_AUTHORIZATION='Bearer test')), 'Для пользователя')
+        self.assertEqual(self.title(self.authenticated.get(self.url)), 'Для пользователя')
+        self.assertEqual(self.sync_retrieve(self.user), 'Для пользователя')
+
+        # И не попадает в него
+        cache.clear()
+        self.authenticated.get(self.url, HTTP_AUTHORIZATION='Bearer test')
+        self.authenticated.get(self.url)
+        self.sync_retrieve(self.user)
+        self.retitle('Общее')
+        self.assertEqual(self.title(self.client.get(self.url)), 'Общее')
+
+    def test_headers(self):
+        miss, hit = self.client.get(self.url), self.client.get(self.url)
+        authenticated = self.authenticated.get(self.url, HTTP_AUTHORIZATION='Bearer test')
+        self.assertIn('Authorization', miss['Vary'])
+        self.assertEqual(
+            {name: value for name, value in hit.items() if name != 'Date'},
+            {name: value for name, value in miss.items() if name != 'Date'},
+        )
+        self.assertEqual(authenticated['Vary'], miss['Vary'])
+
+
+class SeatCounterTests(TestCase):
+    """Свободные места считаются из booked_seats без подзапросов к бронированиям"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        category = TourCategory.objects.create(name='Поход')
+        today = datetime.date.today()
+        cls.tours = [
+            Tour.objects.create(
+                title=f'Тур {max_people}', description='Описание', category=category, city='Бишкек',
+                country='Кыргызстан', price=100, start_date=today, end_date=today, max_people=max_people,
+            )
+            for max_people in (2, 5, 8)
+        ]
+
+    def book(self, tour, people_count):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post('/api/tour/bookings/', {'tour': tour.pk, 'people_count': people_count}, format='json')
+
+    def test_counter(self):
+        small, medium, large = self.tours
+        self.assertEqual(self.book(medium, 3).status_code, 201)
+        self.assertEqual(self.book(large, 2).status_code, 201)
+        self.assertEqual(self.book(large, 1).status_code, 201)
+        response = self.book(small, 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Доступно: 2", str(response.json()))
+
+        tours = Tour.objects.with_available_slots().in_bulk()
+        self.assertEqual(
+            [(tours[tour.pk].booked_seats, tours[tour.pk].available_slots) for tour in self.tours],
+            [(0, 2), (3, 2), (3, 5)],
+        )
+        response = self.client.get(f'/api/tour/tours/{medium.pk}/')
+        self.assertEqual(response.json()['available_slots'], 2)
+
+    def test_min_slots_filter(self):
+        small, medium, large = self.tours
+        self.book(medium, 4)
+        self.book(large, 4)
+        response = self.client.get('/api/tour/tours/?min_slots=2&ordering=-available_slots')
+        self.assertEqual(
+            [(tour['id'], tour['available_slots']) for tour in response.json()['results']],
+            [(large.pk, 4), (small.pk, 2)],
+        )
+        response = self.client.get('/api/tour/tours/?min_slots=5')
+        self.assertEqual(response.json()['results'], [])
+
+
+class BookingTransitionTests(TestCase):
+    """Отмена, подтверждение и удаление меняют booked_seats ровно один раз"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        cls.staff = User.objects.create_user('staff@example.com', 'pass', first_name='Админ', last_name='Тестов', is_staff=True)
+        today = datetime.date.today()
+        cls.tour = Tour.objects.create(
+            title='Тур', description='Описание', category=TourCategory.objects.create(name='Поход'),
+            city='Бишкек', country='Кыргызстан', price=100, start_date=today, end_date=today, max_people=5,
+        )
+
+    def book(self, people_count, user=None):
+        Tour.objects.claim_seats(self.tour.pk, people_count)
+        return Booking.objects.create(user=user or self.user, tour=self.tour, people_count=people_count)
+
+    def booked_seats(self):
+        return Tour.objects.values_list('booked_seats', flat=True).get(pk=self.tour.pk)
+
+    def test_stale_cancel(self):
+        booking = self.book(3)
+        # Оба экземпляра загружены до отмены, как в двух параллельных запросах
+        first, second = Booking.objects.get(pk=booking.pk), Booking.objects.get(pk=booking.pk)
+        self.assertTrue(first.cancel())
+        self.assertFalse(second.cancel())
+        self.assertEqual(self.booked_seats(), 0)
+        second.delete()
+        self.assertEqual(self.booked_seats(), 0)
+
+    def test_stale_confirm(self):
+        booking = self.book(3)
+        booking.cancel()
+        first, second = Booking.objects.get(pk=booking.pk), Booking.objects.get(pk=booking.pk)
+        self.assertTrue(first.confirm())
+        self.assertFalse(second.confirm())
+        self.assertEqual(second.status, 'confirmed')
+        self.assertEqual(self.booked_seats(), 3)
+
+        booking.cancel()
+        self.book(4)
+        self.assertFalse(booking.confirm())
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'cancelled')
+        self.assertEqual(self.booked_seats(), 4)
+
+    def test_views(self):
+        booking = self.book(2)
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        self.assertEqual(client.post(f'/api/tour/bookings/{booking.pk}/confirm/').status_code, 200)
+        response = client.post(f'/api/tour/bookings/{booking.pk}/confirm/')
+        self.assertEqual(response.json(), {'detail': "Бронирование уже подтверждено"})
+        self.assertEqual(client.post(f'/api/tour/bookings/{booking.pk}/cancel/').status_code, 200)
+        self.assertEqual(client.post(f'/api/tour/bookings/{booking.pk}/cancel/').status_code, 400)
+        self.assertEqual(self.booked_seats(), 0)
+
+    def test_stale_update(self):
+        booking = self.book(2)
+        Booking.objects.get(pk=booking.pk).cancel()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('tour.views.BookingViewSet.get_object', return_value=booking):
+            response = client.put(f'/api/tour/bookings/{booking.pk}/', {'tour': self.tour.pk, 'people_count': 4}, format='json')
+        self.assertEqual(response.json()['status'], 'cancelled')
+        self.assertEqual(self.booked_seats(), 0)
+
+    def test_cascade_delete(self):
+        other = User.objects.create_user('other@example.com', 'pass', first_name='Петр', last_name='Тестов')
+        self.book(1)
+        self.book(2, user=other)
+        self.book(1, user=other).cancel()
+        self.assertEqual(self.booked_seats(), 3)
+        other.delete()
+        self.assertEqual(self.booked_seats(), 1)
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    """Параллельные отмены из разных соединений, как из нескольких воркеров gunicorn"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Общая база SQLite в памяти блокирует таблицу вместо ожидания записи")
+
+    def test_concurrent_cancel(self):
+        user = User.objects.create_user('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        today = datetime.date.today()
+        tour = Tour.objects.create(
+            title='Тур', description='Описание', category=TourCategory.objects.create(name='Поход'),
+            city='Бишкек', country='Кыргызстан', price=100, start_date=today, end_date=today, max_people=10,
+        )
+        Tour.objects.claim_seats(tour.pk, 6)
+        booking = Booking.objects.create(user=user, tour=tour, people_count=6)
+        barrier = threading.Barrier(4)
+        results = []
+
+        def cancel():
+            try:
+                instance = Booking.objects.get(pk=booking.pk)
+                barrier.wait()
+                results.append(instance.cancel())
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=cancel) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [False, False, False, True])
+        self.assertEqual(Tour.objects.values_list('booked_seats', flat=True).get(pk=tour.pk), 0)
+
+
+class FacetTests(TestCase):
+    """Счетчики по категориям, городам, цене и длительности для текущего фильтра"""
+
+    @classmethod
+    def setUpTestData(cls):
+        hiking, rafting = TourCategory.objects.create(name='Поход'), TourCategory.objects.create(name='Рафтинг')
+        today = datetime.date.today()
+        for category, city, country, price, hours in (
+            (hiking, 'Бишкек', 'Кыргызстан', 40, 3), (hiking, 'Бишкек', 'Кыргызстан', 150, 5),
+            (hiking, 'Алматы', 'Казахстан', 600, 30), (rafting, 'Алматы', 'Казахстан', 90, 1),
+        ):
+            Tour.objects.create(
+                title=f'Тур {price}', description='Описание', category=category, city=city, country=country,
+                price=price, duration_hours=hours, start_date=today, end_date=today,
+            )
+
+    async def test_facets(self):
+        # Анонимный запрос идет через async ORM, с Authorization — через синхронный viewset
+        user = await sync_to_async(User.objects.create_user)('user@example.com', 'pass', first_name='Иван', last_name='Тестов')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = await self.async_client.get('/api/tour/tours/?facets=1&page_size=1')
+        facets = response.json()['facets']
+        expected = await sync_to_async(client.get)('/api/tour/tours/?facets=1', HTTP_AUTHORIZATION='Bearer test')
+        self.assertEqual(expected.json()['facets'], facets)
+
+        self.assertEqual([(row['name'], row['count']) for row in facets['category']], [('Поход', 3), ('Рафтинг', 1)])
+        self.assertEqual(facets['city'], [
+            {'country': 'Казахстан', 'city': 'Алматы', 'count': 2},
+            {'country': 'Кыргызстан', 'city': 'Бишкек', 'count': 2},
+        ])
+        self.assertEqual([row['count'] for row in facets['price']], [1, 1, 1, 0, 1])
+        self.assertEqual(facets['duration_hours'][-1], {'min': 24, 'max': None, 'count': 1})
+
+        response = await self.async_client.get('/api/tour/tours/?facets=1&city=Бишкек')
+        self.assertEqual(response.json()['facets']['category'], [{'id': facets['category'][0]['id'], 'name': 'Поход', 'count': 2}])
+        response = await self.async_client.get('/api/tour/tours/')
+        self.assertNotIn('facets', response.json())
+
+
+class FastJSONTests(TestCase):
+    """FastJSONRenderer и FastJSONParser совпадают с JSONRenderer и JSONParser"""
+    payload = {
+        'price': Decimal('99.50'),
+        'start': datetime.datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2025, 1, 2),
+        'time': datetime.time(3, 4, 5),
+        'duration': datetime.timedelta(hours=2, minutes=30),
+        'detail': gettext_lazy('Not found.'),
+        'text': 'Тур\u2028по\u2029горам "в" \\ \n\x00',
+        'counts': {1: 2, None: 3},
+        'items': (1, 2.5, None, True),
+    }
+
+    def test_same_bytes(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        indent = 'application/json; indent=2'
+        self.assertEqual(FastJSONRenderer().render(self.payload, indent), JSONRenderer().render(self.payload, indent))
+        with mock.patch('common.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+
+    def test_parse(self):
+        for body in (b'{"title": "\xd0\xa2\xd1\x83\xd1\x80", "price": 99.5, "tags": [1, null]}', b'[1e400]', b'18446744073709551615'):
+            with self.subTest(body=body):
+                self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        for body in (b'{"price": NaN}', b'{"title": }'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    JSONParser().parse(BytesIO(body))
+                with self.assertRaises(ParseError) as actual:
+                    FastJSONParser().parse(BytesIO(body))
+                self.assertEqual(str(actual.exception), str(expected.exception))
@@ -1,5 +1,7 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
+
+from common.async_views import AsyncReadView
 from .views import TourViewSet, TourCategoryViewSet, BookingViewSet
 
 router = DefaultRouter()
@@ -7,6 +9,14 @@ router.register(r'tours', TourViewSet)
 router.register(r'categories', TourCategoryViewSet)
 router.register(r'bookings', BookingViewSet, basename='booking')
 
-urlpatterns = [
+# Чтение каталога — асинхронно, запись уходит в те же viewset
+catalog_urls = []
+for prefix, viewset in (('tours', TourViewSet), ('categories', TourCategoryViewSet)):
+    catalog_urls += [
+        re_path(rf'^{prefix}/$', AsyncReadView.as_view(viewset=viewset, action='list')),
+        re_path(rf'^{prefix}/(?P<pk>[0-9]+)/$', AsyncReadView.as_view(viewset=viewset, action='retrieve')),
+    ]
+
+urlpatterns = catalog_urls + [
     path('', include(router.urls)),
 ]
@@ -6,6 +6,11 @@ from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse
 from drf_spectacular.openapi import OpenApiTypes
 
+from common.cache import PublicCacheMixin
+from common.facets import FacetMixin
+from common.mixins import EagerLoadingMixin
+
+from .filters import TourFilter
 from .models import Tour, TourCategory, Booking
 from .serializers import TourSerializer, TourCategorySerializer, BookingSerializer, BookingListSerializer
 
@@ -36,11 +41,13 @@ from .serializers import TourSerializer, TourCategorySerializer, BookingSerializ
         responses={204: None}
     )
 )
-class TourCategoryViewSet(viewsets.ModelViewSet):
+class TourCategoryViewSet(PublicCacheMixin, viewsets.ModelViewSet):
     """ViewSet для управления категориями туров"""
     queryset = TourCategory.objects.all()
     serializer_class = TourCategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = None
+    cache_models = [TourCategory]
 
 @extend_schema_view(
     list=extend_schema(
@@ -81,7 +88,19 @@ class TourCategoryViewSet(viewsets.ModelViewSet):
                 name='ordering',
                 type=OpenApiTypes.STR,
                 location=OpenApiParameter.QUERY,
-                description='Сортировка: price, -price, created_at, -created_at, start_date, -start_date'
+                description='Сортировка: price, -price, created_at, -created_at, start_date, -start_date, available_slots, -available_slots'
+            ),
+            OpenApiParameter(
+                name='min_slots',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Минимальное количество свободных мест'
+            ),
+            OpenApiParameter(
+                name='facets',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description='Добавить к ответу счетчики по категориям, городам, цене и длительности'
             ),
         ],
         responses={200: TourSerializer(many=True)}
@@ -107,17 +126,26 @@ class TourCategoryViewSet(viewsets.ModelViewSet):
         responses={204: None}
     )
 )
-class TourViewSet(viewsets.ModelViewSet):
+class TourViewSet(EagerLoadingMixin, FacetMixin, PublicCacheMixin, viewsets.ModelViewSet):
     """ViewSet для управления турами"""
-    queryset = Tour.objects.filter(is_active=True)
+    queryset = Tour.objects.filter(is_active=True).with_available_slots()
     serializer_class = TourSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['category', 'city', 'country', 'price']
+    filterset_class = TourFilter
     search_fields = ['title', 'description', 'city', 'country']
-    ordering_fields = ['price', 'created_at', 'start_date']
+    ordering_fields = ['price', 'created_at', 'start_date', 'available_slots']
     ordering = ['-created_at']
+    cache_models = [Tour, TourCategory, Booking]
+    facet_groups = {
+        'category': {'id': 'category_id', 'name': 'category__name'},
+        'city': {'country': 'country', 'city': 'city'},
+    }
+    facet_ranges = {
+        'price': ('price', [50, 100, 200, 500]),
+        'duration_hours': ('duration_hours', [2, 4, 8, 24]),
+    }
 
 @extend_schema_view(
     list=extend_schema(
@@ -163,7 +191,7 @@ class TourViewSet(viewsets.ModelViewSet):
         responses={204: None}
     )
 )
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet для управления бронированиями"""
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -192,7 +220,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         responses={
             200: OpenApiResponse(description="Бронирование подтверждено"),
             403: OpenApiResponse(description="Недостаточно прав"),
-            400: OpenApiResponse(description="Бронирование уже подтверждено")
+            400: OpenApiResponse(description="Бронирование уже подтверждено или мест не осталось")
         }
     )
     @action(detail=True, methods=['post'])
@@ -203,13 +231,16 @@ class BookingViewSet(viewsets.ModelViewSet):
                 {"detail": "Только администратор может подтверждать бронирования"}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-        if booking.status == 'confirmed':
+        if not booking.confirm():
+            if booking.status == 'confirmed':
+                return Response(
+                    {"detail": "Бронирование уже подтверждено"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
-                {"detail": "Бронирование уже подтверждено"}, 
+                {"detail": "Недостаточно мест для подтверждения бронирования"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        booking.status = 'confirmed'
-        booking.save()
         return Response({"detail": "Бронирование подтверждено"})
 
     @extend_schema(
@@ -223,11 +254,9 @@ class BookingViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         booking = self.get_object()
-        if booking.status == 'cancelled':
+        if not booking.cancel():
             return Response(
                 {"detail": "Бронирование уже отменено"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        booking.status = 'cancelled'
-        booking.save()
         return Response({"detail": "Бронирование отменено"})
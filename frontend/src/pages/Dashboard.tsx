@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from "react"
 import { useAuth } from "../contexts/AuthContext"
-import { bookingsAPI } from "../services/api"
+import { bookingsAPI, getPage, type Paginated } from "../services/api"
 import { Calendar, Users, DollarSign, CheckCircle, XCircle, Clock } from "lucide-react"
 import toast from "react-hot-toast"
 
@@ -18,6 +18,7 @@ interface Booking {
 const Dashboard = () => {
     const { user } = useAuth()
     const [bookings, setBookings] = useState<Booking[]>([])
+    const [nextPage, setNextPage] = useState<string | null>(null)
     const [loading, setLoading] = useState(true)
 
     useEffect(() => {
@@ -26,8 +27,9 @@ const Dashboard = () => {
 
     const fetchBookings = async () => {
         try {
-            const data = await bookingsAPI.getBookings()
-            setBookings(data)
+            const data: Paginated<Booking> = await bookingsAPI.getBookings()
+            setBookings(data.results)
+            setNextPage(data.next)
         } catch (error: any) {
             toast.error("Failed to load bookings")
         } finally {
@@ -35,6 +37,17 @@ const Dashboard = () => {
         }
     }
 
+    const loadMoreBookings = async () => {
+        if (!nextPage) return
+        try {
+            const data: Paginated<Booking> = await getPage(nextPage)
+            setBookings((prev) => [...prev, ...data.results])
+            setNextPage(data.next)
+        } catch (error: any) {
+            toast.error("Failed to load bookings")
+        }
+    }
+
     const handleCancelBooking = async (bookingId: number) => {
         if (!confirm("Are you sure you want to cancel this booking?")) return
 
@@ -204,6 +217,16 @@ const Dashboard = () => {
                                     </div>
                                 </div>
                             ))}
+                            {nextPage && (
+                                <div className="p-6 text-center">
+                                    <button
+                                        onClick={loadMoreBookings}
+                                        className="bg-green-600 text-white px-4 py-2 rounded-md hover:bg-green-700 transition-colors"
+                                    >
+                                        Load more
+                                    </button>
+                                </div>
+                            )}
                         </div>
                     )}
                 </div>
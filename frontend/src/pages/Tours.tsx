@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from "react"
 import { Link } from "react-router-dom"
-import { toursAPI } from "../services/api"
+import { toursAPI, getPage, type Paginated } from "../services/api"
 import { Search, MapPin, Clock, Users } from "lucide-react"
 import toast from "react-hot-toast"
 
@@ -29,9 +29,17 @@ interface Category {
     name: string
 }
 
+// Counts for the current filter, returned by the list endpoint with ?facets=1
+interface TourFacets {
+    category: { id: number; name: string; count: number }[]
+    city: { country: string; city: string; count: number }[]
+}
+
 const Tours = () => {
     const [tours, setTours] = useState<Tour[]>([])
+    const [nextPage, setNextPage] = useState<string | null>(null)
     const [categories, setCategories] = useState<Category[]>([])
+    const [facets, setFacets] = useState<TourFacets | null>(null)
     const [loading, setLoading] = useState(true)
     const [searchTerm, setSearchTerm] = useState("")
     const [selectedCategory, setSelectedCategory] = useState("")
@@ -48,8 +56,13 @@ const Tours = () => {
 
     const fetchData = async () => {
         try {
-            const [toursData, categoriesData] = await Promise.all([toursAPI.getTours(), toursAPI.getCategories()])
-            setTours(toursData)
+            const [toursData, categoriesData] = await Promise.all([
+                toursAPI.getTours(new URLSearchParams({ facets: "1" })),
+                toursAPI.getCategories(),
+            ])
+            setTours(toursData.results)
+            setNextPage(toursData.next)
+            setFacets(toursData.facets)
             setCategories(categoriesData)
         } catch (error: any) {
             toast.error("Failed to load data")
@@ -65,15 +78,33 @@ const Tours = () => {
             if (selectedCategory) params.append("category", selectedCategory)
             if (selectedCity) params.append("city", selectedCity)
             if (sortBy) params.append("ordering", sortBy)
+            params.append("facets", "1")
+
+            const data: Paginated<Tour> & { facets: TourFacets } = await toursAPI.getTours(params)
+            setTours(data.results)
+            setNextPage(data.next)
+            setFacets(data.facets)
+        } catch (error: any) {
+            toast.error("Failed to load tours")
+        }
+    }
 
-            const data = await toursAPI.getTours(params)
-            setTours(data)
+    const loadMoreTours = async () => {
+        if (!nextPage) return
+        try {
+            const data: Paginated<Tour> = await getPage(nextPage)
+            setTours((prev) => [...prev, ...data.results])
+            setNextPage(data.next)
         } catch (error: any) {
             toast.error("Failed to load tours")
         }
     }
 
-    const uniqueCities = [...new Set(tours.map((tour) => tour.city))]
+    const categoryCounts = new Map(facets?.category.map((row) => [row.id, row.count]))
+    // Counts cover every page, not just the loaded one; keep the selected city even if it has no tours left
+    const cityCounts = new Map<string, number>()
+    facets?.city.forEach((row) => cityCounts.set(row.city, (cityCounts.get(row.city) ?? 0) + row.count))
+    if (selectedCity && !cityCounts.has(selectedCity)) cityCounts.set(selectedCity, 0)
 
     if (loading) {
         return (
@@ -116,7 +147,7 @@ const Tours = () => {
                                     <option value="">All Categories</option>
                                     {categories.map((category) => (
                                         <option key={category.id} value={category.id}>
-                                            {category.name}
+                                            {category.name} ({categoryCounts.get(category.id) ?? 0})
                                         </option>
                                     ))}
                                 </select>
@@ -130,9 +161,9 @@ const Tours = () => {
                                     className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-green-500 focus:border-green-500"
                                 >
                                     <option value="">All Cities</option>
-                                    {uniqueCities.map((city) => (
+                                    {[...cityCounts].map(([city, count]) => (
                                         <option key={city} value={city}>
-                                            {city}
+                                            {city} ({count})
                                         </option>
                                     ))}
                                 </select>
@@ -200,6 +231,17 @@ const Tours = () => {
                         ))}
                     </div>
 
+                    {nextPage && (
+                        <div className="text-center mt-8">
+                            <button
+                                onClick={loadMoreTours}
+                                className="bg-green-600 text-white py-2 px-6 rounded-md hover:bg-green-700 transition-colors"
+                            >
+                                Load more
+                            </button>
+                        </div>
+                    )}
+
                     {tours.length === 0 && (
                         <div className="text-center py-12">
                             <p className="text-gray-500 text-lg">No tours found matching your criteria.</p>
@@ -10,6 +10,12 @@ class APIError extends Error {
     }
 }
 
+export interface Paginated<T> {
+    next: string | null
+    previous: string | null
+    results: T[]
+}
+
 const getAuthHeaders = (): Record<string, string> => {
     const token = localStorage.getItem("token")
     return token ? { Authorization: `JWT ${token}` } : {}
@@ -24,6 +30,16 @@ const handleResponse = async (response: Response) => {
     return response.json()
 }
 
+// Follows a next/previous cursor link returned by a paginated list
+export const getPage = async (url: string) => {
+    const response = await fetch(url, {
+        headers: {
+            ...getAuthHeaders(),
+        },
+    })
+    return handleResponse(response)
+}
+
 // Auth API
 export const authAPI = {
     login: async (credentials: { email: string; password: string }) => {